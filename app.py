@@ -2,22 +2,29 @@
 Flask Web Application for Face Attendance System with SQLite Database
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, session
+from flask import Blueprint, Flask, Response, g, render_template, request, jsonify, redirect, send_file, session, stream_with_context
 from flask_cors import CORS
-from models import db, User, Attendance, Dataset
+from models import db, User, Attendance, Dataset, ClassSection, ClassSchedule, Enrollment
+from passwords import PasswordHashingBusy, hash_password, hashing_pool, verify_password
+from database import DEFAULT_DATABASE_URL, configure_database, get_database_url, upgrade_schema
+from export_attendance import EXPORT_FORMATS, export_filename, parquet_available, parse_date, stream_export
+from snapshots import SNAPSHOT_DIR, thumbnail_relpath
+from preview import BOUNDARY, get_hub
+import attendance_archive
 import os
 from datetime import datetime, date
 import logging
 import re
 import subprocess
 import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import TimeoutError as HashingTimeout
 from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
 from functools import wraps
-
-app = Flask(__name__)
-app.secret_key = 'face-attendance-secret-key-2026'
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-app.config['SESSION_COOKIE_SECURE'] = False
+from werkzeug.utils import safe_join
 
 # Database Configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -26,23 +33,81 @@ DATASET_DIR = os.path.join(BASE_DIR, 'dataset')
 
 os.makedirs(DATA_DIR, exist_ok=True)
 
-DATABASE_URL = f'sqlite:///{os.path.join(DATA_DIR, "attendance.db")}'
-app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+DATABASE_URL = get_database_url(DEFAULT_DATABASE_URL)
 
-db.init_app(app)
+# All workers must share the same key to read each other's session cookies
+SECRET_KEY = os.getenv('SECRET_KEY', 'face-attendance-secret-key-2026')
 
 FRONTEND_ORIGIN = os.getenv('FRONTEND_ORIGIN', 'http://localhost:5173')
 
+# Authenticated users are cached per process for a short time so dashboard
+# polling doesn't hit the users table on every request. Admin changes
+# invalidate the entry; other workers pick them up within the TTL.
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 30))
+
+MAX_UPLOAD_MB = int(os.getenv('MAX_UPLOAD_MB', 32))
+
+# Snapshots never change once written, so browsers may keep them for a day
+SNAPSHOT_CACHE_MAX_AGE = int(os.getenv('SNAPSHOT_CACHE_MAX_AGE', 86400))
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# CORS Configuration
-CORS(app, 
-     supports_credentials=True, 
-     origins=['http://localhost:5173', 'http://localhost:5174', 'http://127.0.0.1:5173', 'http://127.0.0.1:5174'],
-     allow_headers=['Content-Type'],
-     methods=['GET', 'POST', 'OPTIONS', 'PUT', 'DELETE'])
+DEFAULT_USERS = [
+    # (username, password, role)
+    ('admin', 'admin123', 'admin'),
+    ('sarmad', 'demo123', 'teacher'),
+]
+
+main = Blueprint('main', __name__)
+
+class SessionUser(namedtuple('SessionUser', ['id', 'username', 'role'])):
+    """Snapshot of the logged-in user used for authorization checks"""
+    
+    def is_admin(self):
+        return self.role == 'admin'
+    
+    def is_teacher(self):
+        return self.role in ['admin', 'teacher']
+
+_user_cache = {}  # user_id -> (expires_at, SessionUser)
+_user_cache_lock = threading.Lock()
+
+def invalidate_user_cache(user_id):
+    """Drop a cached user after its role, password or existence changes"""
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+def get_current_user():
+    """Return the logged-in user, cached for the request and for USER_CACHE_TTL seconds"""
+    if 'current_user' in g:
+        return g.current_user
+    
+    user_id = session.get('user_id')
+    now = time.monotonic()
+    cached = None
+    if user_id is not None:
+        with _user_cache_lock:
+            entry = _user_cache.get(user_id)
+        if entry and entry[0] > now:
+            cached = entry[1]
+    
+    if cached is None:
+        # Sessions created before user ids were stored only carry the username
+        if user_id is not None:
+            user = db.session.get(User, user_id)
+        else:
+            user = User.query.filter_by(username=session.get('username')).first()
+        if user and user.username == session.get('username'):
+            cached = SessionUser(user.id, user.username, user.role)
+            if user_id is None:
+                # Writing the session re-issues the cookie: only upgrade old sessions
+                session['user_id'] = user.id
+            with _user_cache_lock:
+                _user_cache[user.id] = (now + USER_CACHE_TTL, cached)
+    
+    g.current_user = cached
+    return cached
 
 # Authorization Decorators
 def login_required(f):
@@ -60,7 +125,7 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if 'username' not in session:
             return jsonify({'error': 'Not logged in'}), 401
-        user = User.query.filter_by(username=session['username']).first()
+        user = get_current_user()
         if not user or not user.is_admin():
             return jsonify({'error': 'Admin access required'}), 403
         return f(*args, **kwargs)
@@ -72,7 +137,7 @@ def teacher_required(f):
     def decorated_function(*args, **kwargs):
         if 'username' not in session:
             return jsonify({'error': 'Not logged in'}), 401
-        user = User.query.filter_by(username=session['username']).first()
+        user = get_current_user()
         if not user or not user.is_teacher():
             return jsonify({'error': 'Teacher access required'}), 403
         return f(*args, **kwargs)
@@ -105,37 +170,72 @@ def get_dataset_info():
     
     return faces
 
-def init_db():
-    """Initialize database"""
+def create_app(database_url=None):
+    """Create and configure the Flask application"""
+    app = Flask(__name__)
+    app.secret_key = SECRET_KEY
+    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+    app.config['SESSION_COOKIE_SECURE'] = False
+    app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_MB * 1024 * 1024
+    
+    configure_database(app, database_url or DATABASE_URL)
+    
+    # CORS Configuration
+    CORS(app, 
+         supports_credentials=True, 
+         origins=['http://localhost:5173', 'http://localhost:5174', 'http://127.0.0.1:5173', 'http://127.0.0.1:5174'],
+         allow_headers=['Content-Type'],
+         methods=['GET', 'POST', 'OPTIONS', 'PUT', 'DELETE'])
+    
+    app.register_blueprint(main)
+    return app
+
+def init_db(app):
+    """Create tables and seed default users
+    
+    Idempotent and safe to run from several workers at once: a lost race
+    on CREATE TABLE or on inserting a seed user is treated as success.
+    """
     with app.app_context():
-        db.create_all()
+        try:
+            db.create_all()
+        except (OperationalError, ProgrammingError) as e:
+            # Another worker created the tables between our check and CREATE
+            db.session.rollback()
+            logger.debug(f"Concurrent schema creation: {e}")
+            db.create_all()
+        try:
+            upgrade_schema(db.engine)
+        except (OperationalError, ProgrammingError) as e:
+            # Another worker upgraded the table first
+            logger.debug(f"Concurrent schema upgrade: {e}")
         logger.info("Database initialized")
         
-        # Create admin user if doesn't exist
-        if not User.query.filter_by(username='admin').first():
-            admin_user = User(username='admin', role='admin')
-            admin_user.set_password('admin123')
-            db.session.add(admin_user)
-            db.session.commit()
-            logger.info("Admin user created: admin/admin123")
+        # Create default users if they don't exist
+        for username, password, role in DEFAULT_USERS:
+            if User.query.filter_by(username=username).first():
+                continue
+            user = User(username=username, role=role)
+            user.set_password(password)
+            db.session.add(user)
+            try:
+                db.session.commit()
+                logger.info(f"Default {role} created: {username}/{password}")
+            except IntegrityError:
+                db.session.rollback()
         
-        # Create demo teacher if doesn't exist
-        if not User.query.filter_by(username='sarmad').first():
-            demo_user = User(username='sarmad', role='teacher')
-            demo_user.set_password('demo123')
-            db.session.add(demo_user)
-            db.session.commit()
-            logger.info("Demo teacher created: sarmad/demo123")
+        # Don't hand pooled connections to forked workers
+        db.engine.dispose()
 
 # Routes
-@app.route('/')
+@main.route('/')
 def index():
     """Home page"""
     if 'username' in session:
         return redirect('/dashboard')
     return redirect('/login')
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     """Login page"""
     if request.method == 'POST':
@@ -148,10 +248,21 @@ def login():
         
         try:
             user = User.query.filter_by(username=username).first()
-            if user and user.check_password(password):
+            # Pool threads only see strings: a timed-out task must not touch the ORM object
+            if user and hashing_pool.run(verify_password, password, user.password_hash):
+                # Upgrade hashes made with an older bcrypt cost
+                if user.password_needs_rehash():
+                    user.password_hash = hashing_pool.run(hash_password, password)
+                    db.session.commit()
+                    logger.info(f"Password rehashed for {username}")
                 session['username'] = username
+                session['user_id'] = user.id
                 logger.info(f"Login successful: {username}")
                 return jsonify({'success': True, 'message': 'Login successful'})
+        except (PasswordHashingBusy, HashingTimeout):
+            db.session.rollback()
+            logger.warning(f"Login rejected, password hashing queue full or timed out: {username}")
+            return jsonify({'success': False, 'message': 'Server busy, please try again'}), 503
         except Exception as e:
             logger.error(f"Login error: {e}")
             return jsonify({'success': False, 'message': f'Login error: {e}'})
@@ -161,7 +272,7 @@ def login():
     
     return render_template('login.html')
 
-@app.route('/register', methods=['POST'])
+@main.route('/register', methods=['POST'])
 def register():
     """Register new teacher"""
     data = request.get_json()
@@ -176,19 +287,20 @@ def register():
         if User.query.filter_by(username=username).first():
             return jsonify({'success': False, 'message': 'Username already exists'})
         
-        new_user = User(username=username)
-        new_user.set_password(password)
+        new_user = User(username=username, password_hash=hashing_pool.run(hash_password, password))
         db.session.add(new_user)
         db.session.commit()
         
         logger.info(f"New registration: {username}")
         return jsonify({'success': True, 'message': 'Registration successful! You can now login.'})
+    except (PasswordHashingBusy, HashingTimeout):
+        return jsonify({'success': False, 'message': 'Server busy, please try again'}), 503
     except Exception as e:
         db.session.rollback()
         logger.error(f"Registration error: {e}")
         return jsonify({'success': False, 'message': f'Registration error: {e}'})
 
-@app.route('/dashboard')
+@main.route('/dashboard')
 def dashboard():
     """Dashboard page"""
     if 'username' not in session:
@@ -202,7 +314,7 @@ def dashboard():
                          attendance_records=[r.to_dict() for r in records],
                          dataset_info=dataset_info)
 
-@app.route('/api/attendance')
+@main.route('/api/attendance')
 @login_required
 def api_attendance():
     """API endpoint to get attendance data"""
@@ -221,25 +333,232 @@ def api_attendance():
         'stats': stats
     })
 
-@app.route('/api/stats')
+@main.route('/api/attendance/export')
+@teacher_required
+def api_attendance_export():
+    """Stream attendance records as CSV or Parquet, filtered by date range and name"""
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unsupported format: {fmt}"}), 400
+    if fmt == 'parquet' and not parquet_available():
+        return jsonify({'error': 'Parquet export is not available on this server'}), 501
+    
+    try:
+        start = parse_date(request.args.get('start'))
+        end = parse_date(request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+    name = request.args.get('name', '').strip() or None
+    
+    mimetype = EXPORT_FORMATS[fmt][0]
+    response = Response(stream_with_context(stream_export(fmt, start, end, name)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{export_filename(fmt, start, end, name)}"'
+    return response
+
+@main.route('/api/attendance/<int:record_id>/photo')
+@teacher_required
+def api_attendance_photo(record_id):
+    """Serve the snapshot (or ?size=thumb thumbnail) taken when a record was marked"""
+    record = db.session.get(Attendance, record_id)
+    if record is None or not record.photo_path:
+        return jsonify({'error': 'No photo for this record'}), 404
+    
+    photo_path = record.photo_path
+    if request.args.get('size') == 'thumb':
+        photo_path = thumbnail_relpath(photo_path)
+    path = safe_join(SNAPSHOT_DIR, photo_path)
+    if path is None or not os.path.isfile(path):
+        return jsonify({'error': 'Photo file not found'}), 404
+    
+    response = send_file(path, mimetype='image/jpeg', conditional=True, etag=True, max_age=SNAPSHOT_CACHE_MAX_AGE)
+    # Faces are personal data: only the logged-in browser may cache them, not shared proxies
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.vary.add('Cookie')
+    return response
+
+@main.route('/api/recognize', methods=['POST'])
+@teacher_required
+def api_recognize():
+    """Identify faces in one or more uploaded images (repeat the 'image' form field)
+    
+    Images from concurrent requests are batched together; pass ?batch=0 to
+    process this request on its own.
+    """
+    # Imported here so the web server only loads recognition code when used
+    from recognition_service import (RECOGNIZE_MAX_IMAGES, GalleryNotReady, RecognitionBusy, decode_image,
+                                     get_batcher, recognition_available)
+    
+    if not recognition_available():
+        return jsonify({'error': 'Face recognition is not available on this server'}), 501
+    files = request.files.getlist('image')
+    if not files:
+        return jsonify({'error': "Upload at least one image in the 'image' field"}), 400
+    if len(files) > RECOGNIZE_MAX_IMAGES:
+        return jsonify({'error': f'At most {RECOGNIZE_MAX_IMAGES} images per request'}), 413
+    
+    try:
+        images = [decode_image(f.stream) for f in files]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    batcher = get_batcher()
+    try:
+        if request.args.get('batch', '1') == '0':
+            results = batcher.recognize_direct(images)
+        else:
+            results = batcher.recognize(images)
+    except RecognitionBusy:
+        return jsonify({'error': 'Server busy, please try again'}), 503
+    except GalleryNotReady:
+        return jsonify({'error': 'Face gallery is being built, please try again shortly'}), 503
+    except TimeoutError:
+        return jsonify({'error': 'Recognition timed out'}), 504
+    return jsonify({'results': results})
+
+@main.route('/api/recognize/stats', methods=['GET'])
+@admin_required
+def api_recognize_stats():
+    """Batching and stage latency metrics for this worker (admin only)"""
+    from recognition_service import get_batcher
+    return jsonify(get_batcher().stats())
+
+@main.route('/api/admin/profile', methods=['POST'])
+@admin_required
+def admin_start_profile():
+    """Sample stacks of the camera worker or this web worker for N seconds (admin only)"""
+    from profiler import PROFILE_SECONDS, ProfilerBusy, get_profiler, signal_profile
+    from recognition_service import get_batcher
+    
+    data = request.get_json(silent=True) or {}
+    target = data.get('target', 'camera')
+    try:
+        seconds = float(data.get('seconds', PROFILE_SECONDS))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'seconds must be a number'}), 400
+    
+    if target == 'web':
+        try:
+            prefix = get_profiler('web', stage_timer=get_batcher().stage_timer).start(seconds)
+        except ProfilerBusy as e:
+            return jsonify({'error': str(e)}), 409
+        return jsonify({'target': 'web', 'pid': os.getpid(), 'seconds': seconds,
+                        'folded': os.path.basename(prefix) + '.folded'}), 202
+    if target == 'camera':
+        try:
+            pid = signal_profile('camera', seconds)
+        except LookupError as e:
+            return jsonify({'error': str(e)}), 404
+        except NotImplementedError as e:
+            return jsonify({'error': str(e)}), 501
+        return jsonify({'target': 'camera', 'pid': pid, 'seconds': seconds}), 202
+    return jsonify({'error': f'Unknown target: {target}'}), 400
+
+@main.route('/api/admin/profiles', methods=['GET'])
+@admin_required
+def admin_list_profiles():
+    """Finished profile files, newest first (admin only)"""
+    from profiler import list_profiles
+    return jsonify({'profiles': list_profiles()})
+
+@main.route('/api/admin/profiles/<name>', methods=['GET'])
+@admin_required
+def admin_get_profile(name):
+    """Download a .folded or .json profile file (admin only)"""
+    from profiler import PROFILE_DIR
+    path = safe_join(PROFILE_DIR, name)
+    if path is None or not name.endswith(('.folded', '.json')) or not os.path.isfile(path):
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(path, mimetype='application/json' if name.endswith('.json') else 'text/plain',
+                     as_attachment=name.endswith('.folded'))
+
+CLUSTER_ID_RE = re.compile(r'^[0-9a-f]{12}$')
+PERSON_NAME_RE = re.compile(r'^[A-Za-z0-9_][A-Za-z0-9_ .-]{0,119}$')
+
+@main.route('/api/admin/unknown-faces', methods=['GET'])
+@admin_required
+def admin_unknown_faces():
+    """Clusters of unrecognized faces seen by the camera, with sample crops (admin only)"""
+    from unknown_faces import UNKNOWN_DIR, load_clusters, sample_files
+    clusters = []
+    for cluster in load_clusters():
+        samples = sample_files(UNKNOWN_DIR, cluster['id'])
+        if not samples:
+            continue
+        clusters.append(dict(cluster, samples=[f"/api/admin/unknown-faces/{cluster['id']}/{s}" for s in samples]))
+    return jsonify({'clusters': clusters})
+
+@main.route('/api/admin/unknown-faces/<cluster_id>/<sample>', methods=['GET'])
+@admin_required
+def admin_unknown_face_sample(cluster_id, sample):
+    """One saved crop of an unknown face cluster (admin only)"""
+    from unknown_faces import UNKNOWN_DIR
+    path = safe_join(UNKNOWN_DIR, cluster_id, sample) if CLUSTER_ID_RE.match(cluster_id) else None
+    if path is None or not sample.endswith('.jpg') or not os.path.isfile(path):
+        return jsonify({'error': 'Sample not found'}), 404
+    response = send_file(path, mimetype='image/jpeg', conditional=True, etag=True, max_age=SNAPSHOT_CACHE_MAX_AGE)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+@main.route('/api/admin/unknown-faces/enroll', methods=['POST'])
+@admin_required
+def admin_enroll_unknown_faces():
+    """Add the crops of unknown face clusters to dataset/ under the given names (admin only)
+    
+    Body: {"assignments": {"<cluster id>": "<name>", ...}}. Several clusters may
+    share a name. The gallery includes them after its next rebuild.
+    """
+    from unknown_faces import enroll_clusters
+    assignments = (request.get_json(silent=True) or {}).get('assignments') or {}
+    if not isinstance(assignments, dict) or not assignments:
+        return jsonify({'success': False, 'message': 'No clusters to enroll'}), 400
+    for cluster_id, name in assignments.items():
+        if not CLUSTER_ID_RE.match(cluster_id):
+            return jsonify({'success': False, 'message': f'Invalid cluster id: {cluster_id}'}), 400
+        if not isinstance(name, str) or not PERSON_NAME_RE.match(name.strip()):
+            return jsonify({'success': False, 'message': f'Invalid name for cluster {cluster_id}'}), 400
+    
+    copied = enroll_clusters({cid: name.strip() for cid, name in assignments.items()}, DATASET_DIR)
+    logger.info(f"Admin enrolled {len(copied)} unknown face clusters ({sum(copied.values())} images)")
+    return jsonify({'success': True, 'copied': copied})
+
+@main.route('/api/admin/unknown-faces/dismiss', methods=['POST'])
+@admin_required
+def admin_dismiss_unknown_faces():
+    """Delete unknown face clusters without enrolling them (admin only)"""
+    from unknown_faces import resolve_clusters
+    cluster_ids = (request.get_json(silent=True) or {}).get('clusters') or []
+    if not isinstance(cluster_ids, list) or not all(isinstance(c, str) and CLUSTER_ID_RE.match(c) for c in cluster_ids):
+        return jsonify({'success': False, 'message': 'clusters must be a list of cluster ids'}), 400
+    resolve_clusters(cluster_ids)
+    return jsonify({'success': True, 'dismissed': len(cluster_ids)})
+
+@main.route('/api/stats')
 @login_required
 def api_stats():
     """API endpoint to get system statistics"""
-    records = Attendance.query.all()
+    total_records = Attendance.query.count()
     dataset_info = get_dataset_info()
     today = date.today()
     today_attendance = Attendance.query.filter_by(date=today).all()
-    unique_people = db.session.query(func.count(func.distinct(Attendance.name))).scalar()
+    if attendance_archive.reaches_archive():
+        # All-time figures include archived months
+        total_records += attendance_archive.archived_total()
+        names = {n for (n,) in db.session.query(Attendance.name).distinct()}
+        unique_people = len(names | attendance_archive.archived_names())
+    else:
+        unique_people = db.session.query(func.count(func.distinct(Attendance.name))).scalar()
     
     return jsonify({
         'total_faces_in_dataset': len(dataset_info),
-        'total_attendance_records': len(records),
+        'total_attendance_records': total_records,
         'unique_people': unique_people or 0,
         'today_attendance': len(today_attendance),
         'dataset_faces': dataset_info
     })
 
-@app.route('/api/analytics', methods=['GET'])
+@main.route('/api/analytics', methods=['GET'])
 @teacher_required
 def api_analytics():
     """Advanced analytics endpoint with trends and insights"""
@@ -266,6 +585,22 @@ def api_analytics():
     
     attendance_by_person = [{'name': p.name, 'count': p.count} for p in person_query]
     
+    # Older months live in the archive; only consult it when the range reaches back that far
+    archived_daily = {}
+    archived_hourly = {}
+    if attendance_archive.reaches_archive(start_date):
+        archived_daily = attendance_archive.archived_daily_counts(start_date)
+        archived_hourly = attendance_archive.archived_hourly_counts(start_date)
+        daily_counts = {d['date']: d['count'] for d in daily_trend}
+        for day, count in archived_daily.items():
+            daily_counts[str(day)] = daily_counts.get(str(day), 0) + count
+        daily_trend = [{'date': d, 'count': c} for d, c in sorted(daily_counts.items())]
+        person_counts = {p['name']: p['count'] for p in attendance_by_person}
+        for name, count in attendance_archive.archived_person_counts(start_date).items():
+            person_counts[name] = person_counts.get(name, 0) + count
+        attendance_by_person = [{'name': n, 'count': c}
+                                for n, c in sorted(person_counts.items(), key=lambda item: (-item[1], item[0]))]
+    
     # Weekly summary (last 4 weeks)
     weekly_data = []
     for week in range(4):
@@ -275,6 +610,7 @@ def api_analytics():
             Attendance.date >= week_start,
             Attendance.date < week_end
         ).count()
+        week_count += sum(c for d, c in archived_daily.items() if week_start <= d < week_end)
         weekly_data.append({
             'week': f'Week {4-week}',
             'count': week_count,
@@ -293,7 +629,10 @@ def api_analytics():
         func.count(Attendance.id).label('count')
     ).filter(Attendance.date >= start_date).group_by('hour').order_by('hour').all()
     
-    peak_times = [{'hour': int(t.hour), 'count': t.count} for t in time_query]
+    hour_counts = {int(t.hour): t.count for t in time_query}
+    for hour, count in archived_hourly.items():
+        hour_counts[hour] = hour_counts.get(hour, 0) + count
+    peak_times = [{'hour': h, 'count': c} for h, c in sorted(hour_counts.items())]
     
     return jsonify({
         'daily_trend': daily_trend,
@@ -309,37 +648,72 @@ def api_analytics():
         }
     })
 
-@app.route('/api/start-camera', methods=['POST'])
+@main.route('/api/start-camera', methods=['POST'])
 @teacher_required
 def api_start_camera():
-    """Start face_attendance camera script"""
+    """Start face_attendance camera script, optionally for one class"""
+    data = request.get_json(silent=True) or {}
+    env = dict(os.environ)
+    class_code = (data.get('class_code') or '').strip()
+    if class_code:
+        if not ClassSection.query.filter_by(code=class_code).first():
+            return jsonify({'success': False, 'message': f'Unknown class: {class_code}'}), 404
+        env['CLASS_CODE'] = class_code
+    headless = bool(data.get('headless'))
+    if headless:
+        env['CAMERA_HEADLESS'] = '1'
     try:
         camera_script = os.path.join(BASE_DIR, 'face_attendance.py')
-        subprocess.Popen([sys.executable, camera_script])
+        subprocess.Popen([sys.executable, camera_script], env=env)
+        if headless:
+            return jsonify({'success': True, 'message': 'Camera started without a window; watch it at /api/camera/stream.'})
         return jsonify({'success': True, 'message': 'Camera started. A window should appear; press q to quit.'})
     except Exception as e:
         logger.error(f"Failed to start camera: {e}")
         return jsonify({'success': False, 'message': f'Failed to start camera: {e}'})
 
-@app.route('/logout')
+@main.route('/api/camera/stream')
+@teacher_required
+def api_camera_stream():
+    """Live annotated camera view as an MJPEG stream (use as an <img> src)"""
+    hub = get_hub()
+    if not hub.live():
+        return jsonify({'error': 'Camera is not running'}), 503
+    if not hub.acquire_viewer():
+        return jsonify({'error': 'Too many preview viewers, try again later'}), 503
+
+    response = Response(hub.frames(), mimetype=f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+    # Runs when the stream ends or the viewer disconnects, even before the first frame
+    response.call_on_close(hub.release_viewer)
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    return response
+
+@main.route('/api/camera/stream/stats')
+@admin_required
+def api_camera_stream_stats():
+    """Preview frames received and sent, and current viewers in this worker"""
+    return jsonify(get_hub().stats())
+
+@main.route('/logout')
 def logout():
     """Logout user"""
     session.clear()
     logger.info("User logged out")
     return redirect('/login')
 
-@app.route('/api/logout', methods=['POST'])
+@main.route('/api/logout', methods=['POST'])
 def api_logout():
     """API logout for React frontend"""
     session.clear()
     logger.info("User logged out (API)")
     return jsonify({'success': True})
 
-@app.route('/api/session', methods=['GET'])
+@main.route('/api/session', methods=['GET'])
 def api_session():
     """Return current session user"""
     if 'username' in session:
-        user = User.query.filter_by(username=session['username']).first()
+        user = get_current_user()
         return jsonify({
             'authenticated': True, 
             'username': session['username'],
@@ -349,14 +723,14 @@ def api_session():
     return jsonify({'authenticated': False}), 401
 
 # Admin Panel Routes
-@app.route('/api/admin/users', methods=['GET'])
+@main.route('/api/admin/users', methods=['GET'])
 @admin_required
 def admin_get_users():
     """Get all users (admin only)"""
     users = User.query.all()
     return jsonify({'users': [u.to_dict() for u in users]})
 
-@app.route('/api/admin/users', methods=['POST'])
+@main.route('/api/admin/users', methods=['POST'])
 @admin_required
 def admin_create_user():
     """Create new user (admin only)"""
@@ -376,19 +750,20 @@ def admin_create_user():
         if User.query.filter_by(username=username).first():
             return jsonify({'success': False, 'message': 'Username already exists'})
         
-        new_user = User(username=username, role=role)
-        new_user.set_password(password)
+        new_user = User(username=username, role=role, password_hash=hashing_pool.run(hash_password, password))
         db.session.add(new_user)
         db.session.commit()
         
         logger.info(f"Admin created user: {username} with role: {role}")
         return jsonify({'success': True, 'message': f'User created successfully', 'user': new_user.to_dict()})
+    except (PasswordHashingBusy, HashingTimeout):
+        return jsonify({'success': False, 'message': 'Server busy, please try again'}), 503
     except Exception as e:
         db.session.rollback()
         logger.error(f"User creation error: {e}")
         return jsonify({'success': False, 'message': f'Error: {e}'})
 
-@app.route('/api/admin/users/<int:user_id>', methods=['PUT'])
+@main.route('/api/admin/users/<int:user_id>', methods=['PUT'])
 @admin_required
 def admin_update_user(user_id):
     """Update user (admin only)"""
@@ -400,37 +775,184 @@ def admin_update_user(user_id):
             user.role = data['role']
         
         if 'password' in data and data['password']:
-            user.set_password(data['password'])
+            user.password_hash = hashing_pool.run(hash_password, data['password'])
         
         db.session.commit()
+        invalidate_user_cache(user.id)
         logger.info(f"Admin updated user: {user.username}")
         return jsonify({'success': True, 'message': 'User updated', 'user': user.to_dict()})
+    except (PasswordHashingBusy, HashingTimeout):
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Server busy, please try again'}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Error: {e}'})
 
-@app.route('/api/admin/users/<int:user_id>', methods=['DELETE'])
+@main.route('/api/admin/users/<int:user_id>', methods=['DELETE'])
 @admin_required
 def admin_delete_user(user_id):
     """Delete user (admin only)"""
     user = User.query.get_or_404(user_id)
     
     # Prevent deleting self
-    current_user = User.query.filter_by(username=session['username']).first()
+    current_user = get_current_user()
     if current_user.id == user_id:
         return jsonify({'success': False, 'message': 'Cannot delete your own account'})
     
     try:
         db.session.delete(user)
         db.session.commit()
+        invalidate_user_cache(user_id)
         logger.info(f"Admin deleted user: {user.username}")
         return jsonify({'success': True, 'message': 'User deleted'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Error: {e}'})
 
+def parse_schedules(items):
+    """Build ClassSchedule rows from [{'weekday', 'start_time', 'end_time', 'room'}]"""
+    schedules = []
+    for item in items:
+        weekday = int(item['weekday'])
+        start = datetime.strptime(item['start_time'], '%H:%M').time()
+        end = datetime.strptime(item['end_time'], '%H:%M').time()
+        if not 0 <= weekday <= 6 or end <= start:
+            raise ValueError(f"Invalid schedule: {item}")
+        schedules.append(ClassSchedule(weekday=weekday, start_time=start, end_time=end,
+                                       room=(item.get('room') or '').strip() or None))
+    return schedules
+
+def apply_class_data(section, data):
+    """Update a class from request JSON (roster and schedules are replaced)"""
+    if 'name' in data:
+        section.name = data['name'].strip()
+    if 'teacher_id' in data:
+        section.teacher_id = data['teacher_id']
+    if 'roster' in data:
+        roster = sorted({n.strip() for n in data['roster'] if n and n.strip()})
+        existing = {e.student_name: e for e in section.enrollments}
+        section.enrollments = [existing.get(n) or Enrollment(student_name=n) for n in roster]
+    if 'schedules' in data:
+        # Keep unchanged meetings so their recorded sessions stay attached
+        existing = {(s.weekday, s.start_time, s.end_time, s.room): s for s in section.schedules}
+        schedules = [existing.pop((s.weekday, s.start_time, s.end_time, s.room), s)
+                     for s in parse_schedules(data['schedules'])]
+        for removed in existing.values():
+            if removed.id and Attendance.query.filter_by(schedule_id=removed.id).first():
+                raise ValueError(f"schedule {removed.id} has recorded attendance and can't be removed")
+        section.schedules = schedules
+
+@main.route('/api/classes', methods=['GET'])
+@teacher_required
+def api_classes():
+    """List classes with their roster and weekly schedule"""
+    sections = ClassSection.query.order_by(ClassSection.code).all()
+    current = ClassSchedule.current()
+    return jsonify({
+        'classes': [s.to_dict() for s in sections],
+        'current_schedule_id': current.id if current else None
+    })
+
+@main.route('/api/classes/<int:section_id>/attendance', methods=['GET'])
+@teacher_required
+def api_class_attendance(section_id):
+    """Present/absent roster for each session of a class on one date"""
+    section = ClassSection.query.get_or_404(section_id)
+    try:
+        day = parse_date(request.args.get('date')) or date.today()
+    except ValueError:
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+    
+    roster = section.roster()
+    archived = []
+    if attendance_archive.reaches_archive(day):
+        archived = list(attendance_archive.iter_archived_records(day, day))
+    sessions = []
+    for schedule in section.schedules:
+        if schedule.weekday != day.weekday():
+            continue
+        records = Attendance.query.filter_by(schedule_id=schedule.id, date=day).all()
+        records += [r for r in archived if r.schedule_id == schedule.id]
+        present = {r.name: r.time.isoformat() for r in records}
+        sessions.append({
+            'schedule': schedule.to_dict(),
+            'present': present,
+            'absent': [n for n in roster if n not in present],
+        })
+    return jsonify({'class': section.code, 'date': day.isoformat(), 'roster': roster, 'sessions': sessions})
+
+@main.route('/api/admin/classes', methods=['POST'])
+@admin_required
+def admin_create_class():
+    """Create a class with its roster and schedule (admin only)"""
+    data = request.get_json() or {}
+    code = data.get('code', '').strip()
+    if not code or not data.get('name', '').strip():
+        return jsonify({'success': False, 'message': 'Class code and name are required'})
+    if ClassSection.query.filter_by(code=code).first():
+        return jsonify({'success': False, 'message': 'Class code already exists'})
+    
+    try:
+        section = ClassSection(code=code)
+        apply_class_data(section, data)
+        db.session.add(section)
+        db.session.commit()
+        logger.info(f"Admin created class: {code} ({len(section.enrollments)} students)")
+        return jsonify({'success': True, 'message': 'Class created', 'class': section.to_dict()})
+    except (KeyError, TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Invalid class data: {e}'})
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Class creation error: {e}")
+        return jsonify({'success': False, 'message': f'Error: {e}'})
+
+@main.route('/api/admin/classes/<int:section_id>', methods=['PUT'])
+@admin_required
+def admin_update_class(section_id):
+    """Update a class name, teacher, roster or schedule (admin only)"""
+    section = ClassSection.query.get_or_404(section_id)
+    data = request.get_json() or {}
+    
+    try:
+        apply_class_data(section, data)
+        db.session.commit()
+        logger.info(f"Admin updated class: {section.code}")
+        return jsonify({'success': True, 'message': 'Class updated', 'class': section.to_dict()})
+    except (KeyError, TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Invalid class data: {e}'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {e}'})
+
+@main.route('/api/admin/classes/<int:section_id>', methods=['DELETE'])
+@admin_required
+def admin_delete_class(section_id):
+    """Delete a class that has no recorded sessions (admin only)"""
+    section = ClassSection.query.get_or_404(section_id)
+    schedule_ids = [s.id for s in section.schedules]
+    if schedule_ids and Attendance.query.filter(Attendance.schedule_id.in_(schedule_ids)).first():
+        return jsonify({'success': False, 'message': 'Class has recorded attendance and cannot be deleted'})
+    
+    try:
+        db.session.delete(section)
+        db.session.commit()
+        logger.info(f"Admin deleted class: {section.code}")
+        return jsonify({'success': True, 'message': 'Class deleted'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {e}'})
+
+@main.route('/api/admin/password-hashing', methods=['GET'])
+@admin_required
+def admin_password_hashing_stats():
+    """Password hashing pool queue metrics for this worker (admin only)"""
+    return jsonify(hashing_pool.stats())
+
 if __name__ == '__main__':
-    init_db()
+    app = create_app()
+    init_db(app)
     print("\n" + "="*70)
     print("🚀 FACE ATTENDANCE SYSTEM - WEB APPLICATION")
     print("="*70)
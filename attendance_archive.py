@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Attendance Archival for Face Attendance System
+
+The attendance table only ever grows, and the dashboard queries scan more
+of it every year. Whole months older than ATTENDANCE_RETENTION_DAYS are
+moved out of it:
+
+- the rows are written to a gzip-compressed CSV per month under
+  data/archive/ (every column, so nothing is lost)
+- per day/hour and per person/month counts go into small rollup tables,
+  which answer the analytics queries for archived months
+- the rows are deleted from attendance and the month is registered in
+  attendance_archives, in one transaction
+
+Readers check attendance_archives first and only touch archived data when a
+requested date range reaches into an archived month; ranges that don't
+(like the default 30-day analytics) never see the archive. Exports and
+per-session lookups read the month files directly, so they return exactly
+the rows that were archived.
+
+Running the command again later only moves newer months, and rows imported
+into an already archived month are merged into its file (rows it already
+holds are dropped, so re-importing an old CSV doesn't count them twice).
+
+Usage:
+    python attendance_archive.py archive [--keep-days 365] [--dry-run] [--vacuum]
+    python attendance_archive.py info
+"""
+
+import os
+import csv
+import sys
+import gzip
+import time
+import argparse
+import logging
+from collections import Counter, namedtuple
+from datetime import date, datetime, timedelta, time as time_of_day
+from sqlalchemy import delete, func, select, text
+from models import db, Attendance, AttendanceArchive, AttendanceDailyRollup, AttendanceMonthlyRollup
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_DIR = os.getenv('ATTENDANCE_ARCHIVE_DIR', os.path.join(BASE_DIR, 'data', 'archive'))
+RETENTION_DAYS = int(os.getenv('ATTENDANCE_RETENTION_DAYS', 365))  # Kept in the attendance table
+ARCHIVE_COLUMNS = ['id', 'name', 'date', 'time', 'confidence', 'marked_by', 'photo_path', 'schedule_id', 'created_at']
+ARCHIVE_CHUNK_SIZE = 5000
+
+logger = logging.getLogger(__name__)
+
+ArchivedRecord = namedtuple('ArchivedRecord', ARCHIVE_COLUMNS)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def archive_cutoff(today=None, keep_days=RETENTION_DAYS):
+    """First day that stays in the attendance table: months before it are archived whole"""
+    today = today or date.today()
+    return month_start(today - timedelta(days=keep_days))
+
+
+def archive_filename(month):
+    # Versioned, so the registered file is never rewritten in place
+    return f"attendance-{month:%Y-%m}-{int(time.time() * 1000)}.csv.gz"
+
+
+def format_value(value):
+    if value is None:
+        return ''
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def parse_record(row):
+    """ArchivedRecord from one archive CSV row"""
+    id_, name, day, at, confidence, marked_by, photo_path, schedule_id, created_at = row
+    return ArchivedRecord(
+        int(id_), name, date.fromisoformat(day), time_of_day.fromisoformat(at),
+        float(confidence) if confidence else 0.0,
+        int(marked_by) if marked_by else None,
+        photo_path or None,
+        int(schedule_id) if schedule_id else None,
+        datetime.fromisoformat(created_at) if created_at else None,
+    )
+
+
+def read_archive_file(path):
+    """Yield ArchivedRecords from one month file"""
+    with gzip.open(path, 'rt', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Header
+        for row in reader:
+            yield parse_record(row)
+
+
+# Reading -----------------------------------------------------------------
+
+def archived_through():
+    """Last archived day, or None if nothing is archived"""
+    latest = db.session.query(func.max(AttendanceArchive.month)).scalar()
+    return next_month(latest) - timedelta(days=1) if latest else None
+
+
+def reaches_archive(start=None):
+    """True if a date range starting at `start` (None = the beginning) includes archived months"""
+    last = archived_through()
+    return last is not None and (start is None or start <= last)
+
+
+def archived_months(start=None, end=None):
+    """Archive registry rows overlapping [start, end], oldest first"""
+    query = AttendanceArchive.query
+    if start:
+        query = query.filter(AttendanceArchive.month >= month_start(start))
+    if end:
+        query = query.filter(AttendanceArchive.month <= end)
+    return query.order_by(AttendanceArchive.month).all()
+
+
+def iter_archived_records(start=None, end=None, name=None, archive_dir=None):
+    """Archived rows in [start, end], optionally for one person, in date order"""
+    archive_dir = archive_dir or ARCHIVE_DIR
+    for archive in archived_months(start, end):
+        for record in read_archive_file(os.path.join(archive_dir, archive.path)):
+            if (start and record.date < start) or (end and record.date > end):
+                continue
+            if name and record.name != name:
+                continue
+            yield record
+
+
+def iter_archive_chunks(columns, start=None, end=None, name=None, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """Archived rows as lists of tuples with the given columns, for streaming exports"""
+    if not reaches_archive(start):
+        return
+    chunk = []
+    for record in iter_archived_records(start, end, name):
+        chunk.append(tuple(getattr(record, c) for c in columns))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def archived_daily_counts(start=None, end=None):
+    """{date: records} for archived days in [start, end]"""
+    query = db.session.query(AttendanceDailyRollup.date, func.sum(AttendanceDailyRollup.count))
+    if start:
+        query = query.filter(AttendanceDailyRollup.date >= start)
+    if end:
+        query = query.filter(AttendanceDailyRollup.date <= end)
+    return {day: int(count) for day, count in query.group_by(AttendanceDailyRollup.date)}
+
+
+def archived_hourly_counts(start=None, end=None):
+    """{hour: records} for archived days in [start, end]"""
+    query = db.session.query(AttendanceDailyRollup.hour, func.sum(AttendanceDailyRollup.count))
+    if start:
+        query = query.filter(AttendanceDailyRollup.date >= start)
+    if end:
+        query = query.filter(AttendanceDailyRollup.date <= end)
+    return {hour: int(count) for hour, count in query.group_by(AttendanceDailyRollup.hour)}
+
+
+def archived_person_counts(start=None, end=None):
+    """{name: records} for archived days in [start, end]
+
+    Whole months come from the monthly rollup; a month only partly in the
+    range is counted from its archive file.
+    """
+    counts = Counter()
+    whole_months = []
+    for archive in archived_months(start, end):
+        last_day = next_month(archive.month) - timedelta(days=1)
+        if (start is None or start <= archive.month) and (end is None or end >= last_day):
+            whole_months.append(archive.month)
+        else:
+            bounded_start = max(start, archive.month) if start else archive.month
+            bounded_end = min(end, last_day) if end else last_day
+            counts.update(r.name for r in iter_archived_records(bounded_start, bounded_end))
+    if whole_months:
+        query = db.session.query(AttendanceMonthlyRollup.name, func.sum(AttendanceMonthlyRollup.count)) \
+            .filter(AttendanceMonthlyRollup.month.in_(whole_months)).group_by(AttendanceMonthlyRollup.name)
+        for name, count in query:
+            counts[name] += int(count)
+    return dict(counts)
+
+
+def archived_total():
+    return int(db.session.query(func.coalesce(func.sum(AttendanceArchive.row_count), 0)).scalar())
+
+
+def archived_names():
+    return {name for (name,) in db.session.query(AttendanceMonthlyRollup.name).distinct()}
+
+
+# Archiving ---------------------------------------------------------------
+
+def add_counts(model, key_columns, counts):
+    """Add counts to existing rollup rows, creating missing ones"""
+    for key, count in counts.items():
+        filters = dict(zip(key_columns, key))
+        row = model.query.filter_by(**filters).first()
+        if row is None:
+            db.session.add(model(count=count, **filters))
+        else:
+            row.count += count
+
+
+def archive_month(month, archive_dir=ARCHIVE_DIR, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """Move one month of attendance into its archive file and rollups; returns rows moved
+
+    Rows already in the month's archive (same name, date and schedule_id,
+    e.g. re-imported after archiving, when the unique indexes no longer see
+    the archived copy) are deleted without being written or counted again.
+    """
+    last_day = next_month(month) - timedelta(days=1)
+    existing = AttendanceArchive.query.filter_by(month=month).first()
+    os.makedirs(archive_dir, exist_ok=True)
+    filename = archive_filename(month)
+    path = os.path.join(archive_dir, filename)
+    tmp_path = f"{path}.tmp"
+
+    daily, monthly = Counter(), Counter()
+    archived_keys = set()
+    moved = carried = dropped = 0
+    max_id = old_path = None
+    query = select(*[getattr(Attendance, c) for c in ARCHIVE_COLUMNS]) \
+        .where(Attendance.date >= month, Attendance.date <= last_day) \
+        .order_by(Attendance.date, Attendance.time, Attendance.id)
+    try:
+        with gzip.open(tmp_path, 'wt', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(ARCHIVE_COLUMNS)
+            if existing:
+                # Late rows for an archived month: carry the old file over, then append
+                for record in read_archive_file(os.path.join(archive_dir, existing.path)):
+                    writer.writerow([format_value(v) for v in record])
+                    archived_keys.add((record.name, record.date, record.schedule_id))
+                    carried += 1
+            result = db.session.execute(query.execution_options(stream_results=True, yield_per=chunk_size))
+            for rows in result.partitions(chunk_size):
+                for row in rows:
+                    max_id = row.id if max_id is None else max(max_id, row.id)
+                    if (row.name, row.date, row.schedule_id) in archived_keys:
+                        dropped += 1
+                        continue
+                    writer.writerow([format_value(v) for v in row])
+                    daily[(row.date, row.time.hour)] += 1
+                    monthly[(month, row.name)] += 1
+                    moved += 1
+        if moved:
+            os.replace(tmp_path, path)
+        else:
+            os.remove(tmp_path)
+            if not dropped:
+                return 0
+
+        # Only delete what was scanned: rows added during the scan stay for the next run
+        db.session.execute(delete(Attendance).where(
+            Attendance.date >= month, Attendance.date <= last_day, Attendance.id <= max_id
+        ))
+        if moved:
+            add_counts(AttendanceDailyRollup, ('date', 'hour'), daily)
+            add_counts(AttendanceMonthlyRollup, ('month', 'name'), monthly)
+            old_path = existing.path if existing else None
+            archive = existing or AttendanceArchive(month=month)
+            archive.path = filename
+            archive.row_count = carried + moved
+            archive.size_bytes = os.path.getsize(path)
+            db.session.add(archive)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        for leftover in (tmp_path, path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+
+    if dropped:
+        logger.info(f"Dropped {dropped} records for {month:%Y-%m} that were already archived")
+    if old_path and os.path.exists(os.path.join(archive_dir, old_path)):
+        os.remove(os.path.join(archive_dir, old_path))
+    return moved
+
+
+def months_to_archive(cutoff):
+    """First days of the months with attendance rows before the cutoff"""
+    days = db.session.query(func.min(Attendance.date)).filter(Attendance.date < cutoff).scalar()
+    months = []
+    month = month_start(days) if days else None
+    while month and month < cutoff:
+        if db.session.query(Attendance.id).filter(Attendance.date >= month, Attendance.date < next_month(month)).first():
+            months.append(month)
+        month = next_month(month)
+    return months
+
+
+def archive_attendance(keep_days=RETENTION_DAYS, today=None, dry_run=False, archive_dir=ARCHIVE_DIR):
+    """Archive every whole month older than keep_days; returns {month: rows moved}"""
+    cutoff = archive_cutoff(today, keep_days)
+    moved = {}
+    for month in months_to_archive(cutoff):
+        if dry_run:
+            moved[month] = Attendance.query.filter(Attendance.date >= month, Attendance.date < next_month(month)).count()
+            continue
+        start = time.perf_counter()
+        moved[month] = archive_month(month, archive_dir)
+        logger.info(f"Archived {moved[month]} records for {month:%Y-%m} in {time.perf_counter() - start:.2f}s")
+    return moved
+
+
+def main():
+    from database import create_db_app, upgrade_schema
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Archive old attendance records by month')
+    sub = parser.add_subparsers(dest='command', required=True)
+    archive_parser = sub.add_parser('archive', help='Move whole months older than --keep-days to the archive')
+    archive_parser.add_argument('--keep-days', type=int, default=RETENTION_DAYS)
+    archive_parser.add_argument('--dry-run', action='store_true', help='Only report what would be moved')
+    archive_parser.add_argument('--vacuum', action='store_true', help='Reclaim the freed space (SQLite)')
+    sub.add_parser('info', help='List archived months')
+    args = parser.parse_args()
+
+    app = create_db_app()
+    with app.app_context():
+        db.create_all()
+        upgrade_schema(db.engine)  # Archive files carry schedule_id
+        if args.command == 'info':
+            archives = archived_months()
+            hot = Attendance.query.count()
+            print(f"Attendance table: {hot} records | Archived: {archived_total()} records in {len(archives)} months")
+            for archive in archives:
+                print(f"  {archive.month:%Y-%m}  {archive.row_count:8d} records  {archive.size_bytes / 1024:8.1f} KB  {archive.path}")
+            return 0
+
+        cutoff = archive_cutoff(keep_days=args.keep_days)
+        moved = archive_attendance(args.keep_days, dry_run=args.dry_run)
+        verb = 'Would move' if args.dry_run else 'Moved'
+        logger.info(f"{verb} {sum(moved.values())} records from {len(moved)} months before {cutoff}")
+        if args.vacuum and not args.dry_run and db.engine.dialect.name == 'sqlite':
+            with db.engine.connect() as conn:
+                conn.execution_options(isolation_level='AUTOCOMMIT').execute(text('VACUUM'))
+            logger.info("Database vacuumed")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
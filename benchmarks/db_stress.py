@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for the SQLite database layer
+
+Runs parallel writer processes (like camera windows marking attendance) and
+reader processes (like dashboard polling) against one database file, then
+reports throughput and fails if any "database is locked" error occurred.
+
+Usage:
+    python benchmarks/db_stress.py [--writers 4] [--readers 4] [--seconds 10]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing as mp
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError, OperationalError
+from models import db, Attendance
+from database import configure_database, display_url
+
+
+def make_app(database_url):
+    """Minimal Flask app bound to the tuned database layer"""
+    app = Flask(__name__)
+    configure_database(app, database_url)
+    return app
+
+
+def writer(database_url, worker_id, seconds, results):
+    """Insert one attendance row per commit, like the camera loop"""
+    app = make_app(database_url)
+    commits = locked = other = 0
+    with app.app_context():
+        deadline = time.perf_counter() + seconds
+        n = 0
+        while time.perf_counter() < deadline:
+            n += 1
+            db.session.add(Attendance(
+                name=f'writer{worker_id}_{n}',
+                date=date.today() - timedelta(days=n % 365),
+                time=datetime.now().time(),
+                confidence=0.5
+            ))
+            try:
+                db.session.commit()
+                commits += 1
+            except OperationalError as e:
+                db.session.rollback()
+                if 'locked' in str(e):
+                    locked += 1
+                else:
+                    other += 1
+            except IntegrityError:
+                db.session.rollback()
+                other += 1
+    results.put(('writer', commits, locked, other))
+
+
+def reader(database_url, worker_id, seconds, results):
+    """Run the dashboard's aggregate queries in a loop"""
+    app = make_app(database_url)
+    queries = locked = other = 0
+    with app.app_context():
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            try:
+                Attendance.query.filter_by(date=date.today()).count()
+                db.session.query(func.count(func.distinct(Attendance.name))).scalar()
+                db.session.query(Attendance.date, func.count(Attendance.id)).group_by(Attendance.date).all()
+                queries += 1
+            except OperationalError as e:
+                if 'locked' in str(e):
+                    locked += 1
+                else:
+                    other += 1
+            finally:
+                db.session.remove()
+    results.put(('reader', queries, locked, other))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite concurrency stress test')
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--database-url', help='Defaults to a temporary SQLite file')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    database_url = args.database_url
+    if not database_url:
+        tmp_dir = tempfile.TemporaryDirectory()
+        database_url = f'sqlite:///{os.path.join(tmp_dir.name, "stress.db")}'
+
+    app = make_app(database_url)
+    with app.app_context():
+        db.create_all()
+
+    print("\n" + "="*70)
+    print("🧪 DATABASE CONCURRENCY STRESS TEST")
+    print("="*70)
+    print(f"  Database: {display_url(database_url)}")
+    print(f"  Writers: {args.writers} | Readers: {args.readers} | Duration: {args.seconds}s\n")
+
+    results = mp.Queue()
+    procs = [mp.Process(target=writer, args=(database_url, i, args.seconds, results)) for i in range(args.writers)]
+    procs += [mp.Process(target=reader, args=(database_url, i, args.seconds, results)) for i in range(args.readers)]
+
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    totals = {'writer': [0, 0, 0], 'reader': [0, 0, 0]}
+    for _ in procs:
+        kind, ok, locked, other = results.get()
+        for i, v in enumerate((ok, locked, other)):
+            totals[kind][i] += v
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    w_ok, w_locked, w_other = totals['writer']
+    r_ok, r_locked, r_other = totals['reader']
+    print(f"  Writes committed:  {w_ok:8d}  ({w_ok / elapsed:8.1f} commits/sec)")
+    print(f"  Read iterations:   {r_ok:8d}  ({r_ok / elapsed:8.1f} iterations/sec)")
+    print(f"  Lock errors:       {w_locked + r_locked:8d}")
+    print(f"  Other errors:      {w_other + r_other:8d}")
+
+    if tmp_dir:
+        tmp_dir.cleanup()
+
+    if w_locked or r_locked or w_other or r_other:
+        print("\n❌ Stress test FAILED")
+        return 1
+    print("\n✅ No lock errors under concurrent load")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+HTTP load test for the dashboard API
+
+Logs in once, then hammers /api/attendance, /api/stats and /api/analytics
+from concurrent client threads and reports requests/sec and p50/p99
+latency per endpoint. Start the server first, e.g.:
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+    python benchmarks/load_test.py --url http://localhost:5000 --concurrency 16 --seconds 15
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from http.cookiejar import CookieJar
+
+ENDPOINTS = ['/api/attendance', '/api/stats', '/api/analytics']
+
+
+def login(base_url, username, password):
+    """Log in and return the session cookie header"""
+    jar = CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    req = urllib.request.Request(
+        f'{base_url}/login',
+        data=json.dumps({'username': username, 'password': password}).encode(),
+        headers={'Content-Type': 'application/json'},
+        method='POST'
+    )
+    with opener.open(req, timeout=30) as resp:
+        body = json.loads(resp.read())
+    if not body.get('success'):
+        raise RuntimeError(f"Login failed: {body.get('message')}")
+    return '; '.join(f'{c.name}={c.value}' for c in jar)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def client(base_url, cookie, deadline, offset, latencies, errors, lock):
+    """Cycle through the endpoints until the deadline"""
+    local = {path: [] for path in ENDPOINTS}
+    local_errors = 0
+    i = offset
+    while time.perf_counter() < deadline:
+        path = ENDPOINTS[i % len(ENDPOINTS)]
+        i += 1
+        req = urllib.request.Request(f'{base_url}{path}', headers={'Cookie': cookie})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                resp.read()
+            local[path].append(time.perf_counter() - start)
+        except (urllib.error.URLError, OSError):
+            local_errors += 1
+    with lock:
+        for path, values in local.items():
+            latencies[path].extend(values)
+        errors[0] += local_errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the dashboard API')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip('/')
+    cookie = login(base_url, args.username, args.password)
+
+    latencies = {path: [] for path in ENDPOINTS}
+    errors = [0]
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + args.seconds
+    threads = [
+        threading.Thread(target=client, args=(base_url, cookie, deadline, n, latencies, errors, lock))
+        for n in range(args.concurrency)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    print("\n" + "="*70)
+    print("📈 API LOAD TEST")
+    print("="*70)
+    print(f"  Target: {base_url} | Concurrency: {args.concurrency} | Duration: {elapsed:.1f}s\n")
+    print(f"  {'Endpoint':20} {'Requests':>9} {'Req/sec':>9} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    total = 0
+    for path in ENDPOINTS:
+        values = sorted(latencies[path])
+        total += len(values)
+        print(f"  {path:20} {len(values):9d} {len(values) / elapsed:9.1f} "
+              f"{percentile(values, 50) * 1000:10.1f} {percentile(values, 99) * 1000:10.1f}")
+    all_values = sorted(v for values in latencies.values() for v in values)
+    print(f"  {'TOTAL':20} {total:9d} {total / elapsed:9.1f} "
+          f"{percentile(all_values, 50) * 1000:10.1f} {percentile(all_values, 99) * 1000:10.1f}")
+    print(f"\n  Errors: {errors[0]}")
+    print("="*70 + "\n")
+    return 1 if errors[0] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Per-frame preprocessing benchmark: fresh allocations vs reused buffers
+
+Replays synthetic camera frames through the camera loop's preprocessing
+(read, downscale, BGR->RGB) the old way, where every step returns a new
+image, and through FramePreprocessor, which writes into the same buffers
+every frame. Reports latency per frame and the memory allocated per frame
+(tracemalloc peak above the steady state; NumPy and OpenCV output arrays
+are traced).
+
+The camera read is simulated by copying a stored frame, into a new array
+for the old path and into the reused frame buffer for the new one.
+
+Usage:
+    python benchmarks/preprocessing.py [--width 1920 --height 1080] [--frames 300]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocessing import FRAME_SCALE, FramePreprocessor
+
+
+class ReplayCapture:
+    """Minimal cv2.VideoCapture stand-in cycling through stored frames"""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.index = 0
+
+    def read(self, image=None):
+        source = self.frames[self.index % len(self.frames)]
+        self.index += 1
+        if image is None or image.shape != source.shape:
+            return True, source.copy()
+        np.copyto(image, source)
+        return True, image
+
+
+def allocating_step(cap, scale):
+    """The camera loop before buffer reuse"""
+    _, frame = cap.read()
+    small_frame = cv2.resize(frame, (0, 0), fx=1 / scale, fy=1 / scale)
+    return cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+
+
+def reusing_step(cap, preprocessor):
+    _, frame = preprocessor.read(cap)
+    return preprocessor.process(frame)
+
+
+def measure(step, frames):
+    """Per-frame latency (ms) and allocated bytes"""
+    step()  # First frame allocates the reused buffers
+    latencies = []
+    allocated = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        step()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    for _ in range(min(frames, 50)):
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        step()
+        allocated.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    return np.array(latencies), np.array(allocated)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare allocating and buffer-reusing frame preprocessing')
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--scale', type=int, default=FRAME_SCALE)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8) for _ in range(4)]
+
+    old_cap, new_cap = ReplayCapture(frames), ReplayCapture(frames)
+    preprocessor = FramePreprocessor(args.scale)
+    modes = {
+        'allocating': lambda: allocating_step(old_cap, args.scale),
+        'reused buffers': lambda: reusing_step(new_cap, preprocessor),
+    }
+
+    print("\n" + "="*70)
+    print("🖼️  FRAME PREPROCESSING")
+    print("="*70)
+    print(f"  {args.width}x{args.height} -> 1/{args.scale} | {args.frames} frames | read + resize + BGR->RGB")
+
+    results = {}
+    for mode, step in modes.items():
+        latencies, allocated = measure(step, args.frames)
+        results[mode] = latencies
+        print(f"\n  ▶ {mode}")
+        print(f"    Latency:  mean {latencies.mean():6.3f} ms | p50 {np.percentile(latencies, 50):6.3f} ms"
+              f" | p99 {np.percentile(latencies, 99):6.3f} ms")
+        print(f"    Allocated per frame: {np.median(allocated) / 1024:10.1f} KB"
+              f" ({np.median(allocated) * 30 / 1024 / 1024:.1f} MB/s at 30 FPS)")
+
+    same = np.array_equal(allocating_step(ReplayCapture(frames), args.scale),
+                          reusing_step(ReplayCapture(frames), FramePreprocessor(args.scale)))
+    speedup = results['allocating'].mean() / results['reused buffers'].mean()
+    print(f"\n  Speedup: {speedup:.2f}x | Identical output: {same}")
+    print("\n" + "="*70 + "\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Accuracy vs speed of quantized gallery search
+
+Compares the two-stage search (int8 or float16 scan, float32 re-rank of
+the top candidates) against the exact float32 matcher on:
+
+- the real gallery built from dataset/ (leave-one-out: every encoding is
+  matched against all the others), if face_recognition is installed or a
+  gallery has already been built
+- synthetic galleries of clustered 128-d encodings with the same scale as
+  dlib's (same person ~0.4 apart, different people ~1.0 apart), queried
+  with new samples of enrolled people and of strangers
+
+For each variant it reports query latency, bytes scanned per query, how
+often the nearest row and the accept/reject decision at the confidence
+threshold match the exact matcher, and the worst distance error.
+
+Usage:
+    python benchmarks/quantization.py [--sizes 10000,100000,500000] [--queries 200]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gallery import (DATASET_DIR, GALLERY_DIR, GALLERY_DTYPE, GALLERY_QUANTIZATION, RERANK_CANDIDATES,
+                     dataset_fingerprint, load_gallery, open_gallery, write_gallery)
+
+CONFIDENCE_THRESHOLD = 0.6  # Same as face_attendance.py
+VARIANTS = ('none', 'int8', 'float16')
+
+
+def synthetic_gallery(size, people, seed=0):
+    """Clustered encodings: per-person centres plus per-photo noise"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(scale=1.0 / np.sqrt(2 * 128), size=(people, 128)).astype(np.float32)
+    labels = rng.integers(0, people, size)
+    noise = rng.normal(scale=0.4 / np.sqrt(2 * 128), size=(size, 128)).astype(np.float32)
+    return centres, labels, centres[labels] + noise
+
+
+def synthetic_queries(centres, count, seed=1):
+    """Half new photos of enrolled people, half strangers"""
+    rng = np.random.default_rng(seed)
+    enrolled = centres[rng.integers(0, len(centres), count // 2)]
+    strangers = rng.normal(scale=1.0 / np.sqrt(2 * 128), size=(count - len(enrolled), 128))
+    queries = np.vstack([enrolled, strangers]).astype(np.float32)
+    return queries + rng.normal(scale=0.4 / np.sqrt(2 * 128), size=queries.shape).astype(np.float32)
+
+
+def build_variants(root, encodings, names):
+    """Write the same encodings once per quantization and open them"""
+    return {
+        variant: open_gallery(write_gallery(root, variant, encodings, names, 'float32', variant))
+        for variant in VARIANTS
+    }
+
+
+def nearest(gallery, query, exact, skip_self):
+    """Nearest row, optionally ignoring the query's own row (leave-one-out)"""
+    indices, distances = gallery.search(query, k=2 if skip_self else 1, exact=exact)
+    return int(indices[-1]), float(distances[-1])
+
+
+def compare(title, galleries, queries, skip_self=False):
+    """Print latency and agreement of every variant against the exact matcher"""
+    exact = galleries['none']
+    reference = [nearest(exact, q, True, skip_self) for q in queries]
+
+    print(f"\n  ▶ {title}: {len(exact)} encodings, {len(exact.names)} people, {len(queries)} queries")
+    print(f"    {'variant':9} {'ms/query':>9} {'scan MB':>8} {'same row':>9} {'same decision':>14} {'max dist err':>13}")
+    for variant, gallery in galleries.items():
+        # Warm the page cache so every variant is timed from memory
+        nearest(gallery, queries[0], variant == 'none', skip_self)
+        start = time.perf_counter()
+        results = [nearest(gallery, q, variant == 'none', skip_self) for q in queries]
+        ms = (time.perf_counter() - start) / len(queries) * 1000
+
+        same_row = same_decision = 0
+        max_error = 0.0
+        for (index, distance), (ref_index, ref_distance) in zip(results, reference):
+            same_row += index == ref_index
+            accepted = distance < CONFIDENCE_THRESHOLD
+            ref_accepted = ref_distance < CONFIDENCE_THRESHOLD
+            same_decision += accepted == ref_accepted and (
+                not accepted or gallery.name_at(index) == exact.name_at(ref_index))
+            max_error = max(max_error, abs(distance - ref_distance))
+        label = 'exact' if variant == 'none' else variant
+        print(f"    {label:9} {ms:9.3f} {gallery.scan_nbytes() / 1e6:8.1f} "
+              f"{same_row / len(queries):9.1%} {same_decision / len(queries):14.1%} {max_error:13.5f}")
+
+
+def dataset_gallery():
+    """The current dataset/ gallery, or None if it can't be built here"""
+    path = os.path.join(GALLERY_DIR, dataset_fingerprint(DATASET_DIR, dtype=GALLERY_DTYPE))
+    if os.path.isdir(path):
+        return open_gallery(path)
+    try:
+        import face_recognition  # noqa: F401
+    except ImportError:
+        return None
+    return load_gallery(DATASET_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare quantized gallery search against the exact matcher')
+    parser.add_argument('--sizes', default='10000,100000,500000', help='Synthetic gallery sizes')
+    parser.add_argument('--people-ratio', type=int, default=20, help='Encodings per synthetic person')
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print("🧮 GALLERY QUANTIZATION: ACCURACY VS SPEED")
+    print("="*70)
+    print(f"  Re-rank candidates: {RERANK_CANDIDATES} | Threshold: {CONFIDENCE_THRESHOLD} | "
+          f"Configured: GALLERY_QUANTIZATION={GALLERY_QUANTIZATION}")
+
+    with tempfile.TemporaryDirectory() as root:
+        real = dataset_gallery()
+        if real is None or len(real) < 2:
+            print("\n  ▶ dataset/: skipped (no gallery built and face_recognition not installed)")
+        else:
+            encodings = np.asarray(real.encodings, dtype=np.float32)
+            names = [real.name_at(i) for i in range(len(real))]
+            galleries = build_variants(os.path.join(root, 'dataset'), encodings, names)
+            compare("dataset/ (leave-one-out)", galleries, encodings, skip_self=True)
+
+        for size in (int(s) for s in args.sizes.split(',')):
+            centres, labels, encodings = synthetic_gallery(size, max(size // args.people_ratio, 1))
+            names = [f"person_{label}" for label in labels]
+            galleries = build_variants(os.path.join(root, f'synthetic_{size}'), encodings, names)
+            compare(f"synthetic {size}", galleries, synthetic_queries(centres, args.queries))
+            del galleries
+
+    print("\n" + "="*70 + "\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
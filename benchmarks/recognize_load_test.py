@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Load test for /api/recognize: batched vs per-request processing
+
+Logs in once, then posts images from dataset/ (or --images) to
+/api/recognize from concurrent client threads, first with ?batch=0
+(every request processed on its own) and then through the micro-batcher,
+and reports images/sec, p50/p99 latency and the average batch size for
+each mode. Start the server first, e.g.:
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+    python benchmarks/recognize_load_test.py --url http://localhost:5000 --concurrency 16 --seconds 20
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+import urllib.request
+import urllib.error
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import login, percentile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {'per-request': '?batch=0', 'batched': ''}
+
+
+def load_images(images_dir, limit):
+    """Read up to `limit` image files as (filename, bytes)"""
+    images = []
+    for root, _, files in os.walk(images_dir):
+        for name in sorted(files):
+            if name.lower().endswith(('.jpg', '.jpeg', '.png')):
+                with open(os.path.join(root, name), 'rb') as f:
+                    images.append((name, f.read()))
+                if len(images) >= limit:
+                    return images
+    return images
+
+
+def multipart_body(files):
+    """Encode [(filename, bytes)] as a multipart form with repeated 'image' fields"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for filename, data in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode() + data + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def client(url, cookie, bodies, deadline, offset, results, lock):
+    """Post requests until the deadline, recording latency and batch sizes"""
+    latencies, batch_sizes = [], []
+    images = errors = 0
+    i = offset
+    while time.perf_counter() < deadline:
+        body, content_type, count = bodies[i % len(bodies)]
+        i += 1
+        req = urllib.request.Request(url, data=body, method='POST',
+                                     headers={'Cookie': cookie, 'Content-Type': content_type})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                payload = json.loads(resp.read())
+            latencies.append(time.perf_counter() - start)
+            images += count
+            batch_sizes.extend(r['batch_size'] for r in payload['results'])
+        except (urllib.error.URLError, OSError, ValueError, KeyError):
+            errors += 1
+    with lock:
+        results['latencies'].extend(latencies)
+        results['batch_sizes'].extend(batch_sizes)
+        results['images'] += images
+        results['errors'] += errors
+
+
+def run_mode(url, cookie, bodies, concurrency, seconds):
+    results = {'latencies': [], 'batch_sizes': [], 'images': 0, 'errors': 0}
+    lock = threading.Lock()
+    started = time.perf_counter()
+    deadline = started + seconds
+    threads = [
+        threading.Thread(target=client, args=(url, cookie, bodies, deadline, i, results, lock))
+        for i in range(concurrency)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results['elapsed'] = time.perf_counter() - started
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare batched and per-request /api/recognize throughput')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--images', default=os.path.join(BASE_DIR, 'dataset'), help='Directory of test images')
+    parser.add_argument('--per-request', type=int, default=1, help='Images per request')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=15)
+    args = parser.parse_args()
+
+    images = load_images(args.images, 64)
+    if not images:
+        print(f"No images found in {args.images}")
+        return 1
+    bodies = []
+    for i in range(0, len(images), args.per_request):
+        chunk = images[i:i + args.per_request]
+        body, content_type = multipart_body(chunk)
+        bodies.append((body, content_type, len(chunk)))
+
+    cookie = login(args.url, args.username, args.password)
+
+    print("\n" + "="*70)
+    print("🧑‍🤝‍🧑 RECOGNITION LOAD TEST")
+    print("="*70)
+    print(f"  {args.url}/api/recognize | {args.concurrency} clients | {args.seconds:.0f}s per mode | "
+          f"{args.per_request} image(s) per request")
+
+    throughput = {}
+    for mode, query in MODES.items():
+        r = run_mode(f"{args.url}/api/recognize{query}", cookie, bodies, args.concurrency, args.seconds)
+        latencies = sorted(r['latencies'])
+        throughput[mode] = r['images'] / r['elapsed']
+        avg_batch = sum(r['batch_sizes']) / len(r['batch_sizes']) if r['batch_sizes'] else 0
+        print(f"\n  ▶ {mode}")
+        print(f"    Images/sec: {throughput[mode]:8.1f} | Requests: {len(latencies)} | Errors: {r['errors']}")
+        print(f"    p50: {percentile(latencies, 50) * 1000:8.1f} ms | p99: {percentile(latencies, 99) * 1000:8.1f} ms"
+              f" | Avg batch: {avg_batch:.1f}")
+
+    if throughput['per-request']:
+        print(f"\n  Batched throughput: {throughput['batched'] / throughput['per-request']:.2f}x per-request")
+    print("\n" + "="*70 + "\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the application entry points
+
+Imports each entry point in a fresh interpreter with `python -X importtime`
+and reports wall-clock import time, peak RSS, the slowest imports, and
+whether any module that entry point must never load slipped in (e.g. cv2
+in the web server, Flask routes in the camera worker).
+
+Usage:
+    python benchmarks/startup_time.py [--repeat 3] [--top 8]
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (code to run, modules that must not be loaded)
+ENTRY_POINTS = {
+    'web (wsgi app)': (
+        'from app import create_app; create_app()',
+        ['cv2', 'face_recognition', 'dlib', 'pyarrow'],
+    ),
+    'camera worker': (
+        'import face_attendance',
+        ['app', 'flask_cors'],
+    ),
+    'gui': (
+        'import gui',
+        ['cv2', 'face_recognition', 'dlib', 'app', 'flask_cors'],
+    ),
+}
+
+PROBE = '''
+import sys, time, json, resource
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == 'darwin':
+    rss_kb //= 1024
+print(json.dumps({{'elapsed': elapsed, 'rss_kb': rss_kb, 'modules': sorted(sys.modules)}}), file=sys.stdout)
+'''
+
+
+def run_probe(code):
+    """Import an entry point in a fresh interpreter, returning stats and importtime lines"""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE.format(code=code)],
+        cwd=BASE_DIR, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'unknown error'
+        return None, error
+    stats = json.loads(proc.stdout.strip().splitlines()[-1])
+    stats['importtime'] = parse_importtime(proc.stderr)
+    return stats, None
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into (cumulative_us, depth, module) for the first two levels"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        # Nested imports are indented two spaces per level below their importer
+        raw_module = parts[2][1:]
+        depth = (len(raw_module) - len(raw_module.lstrip())) // 2
+        if depth > 1:
+            continue
+        entries.append((int(parts[1]), depth, raw_module.strip()))
+    return sorted(entries, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure entry point cold-start time')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per entry point (median reported)')
+    parser.add_argument('--top', type=int, default=8, help='Slowest imports to list')
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print("⏱️  ENTRY POINT STARTUP BENCHMARK")
+    print("="*70)
+
+    failed = False
+    for name, (code, forbidden) in ENTRY_POINTS.items():
+        runs = []
+        error = None
+        for _ in range(args.repeat):
+            stats, error = run_probe(code)
+            if error:
+                break
+            runs.append(stats)
+
+        print(f"\n  ▶ {name}: {code}")
+        if error:
+            print(f"    ⚠️  Could not import: {error}")
+            continue
+
+        elapsed = statistics.median(r['elapsed'] for r in runs)
+        rss_mb = statistics.median(r['rss_kb'] for r in runs) / 1024
+        print(f"    Cold start: {elapsed:.3f}s | Peak RSS: {rss_mb:.1f} MB | Modules: {len(runs[-1]['modules'])}")
+        for cumulative_us, depth, module in runs[-1]['importtime'][:args.top]:
+            print(f"      {cumulative_us / 1e6:7.3f}s  {'  ' * depth}{module}")
+
+        leaked = [m for m in forbidden if m in runs[-1]['modules']]
+        if leaked:
+            failed = True
+            print(f"    ✗ Loaded modules it should not: {', '.join(leaked)}")
+        else:
+            print(f"    ✓ Does not load: {', '.join(forbidden)}")
+
+    print("\n" + "="*70 + "\n")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
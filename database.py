@@ -0,0 +1,228 @@
+"""
+Database Engine Configuration for Face Attendance System
+
+The web app and the camera process share the same SQLite file, so every
+connection is opened in WAL mode with a busy timeout: readers never block
+the camera's commits and a writer waits for the lock instead of failing
+with "database is locked".
+
+The backend is chosen with the DATABASE_URL environment variable; SQLite
+and PostgreSQL are supported.
+"""
+
+import os
+import sqlite3
+import logging
+from flask import Flask
+from sqlalchemy import event, inspect, make_url, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from models import db, Attendance
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+DEFAULT_DATABASE_URL = f'sqlite:///{os.path.join(DATA_DIR, "attendance.db")}'
+
+# SQLite tuning (overridable from the environment)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 10000))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 16384))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 3600))
+
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),  # Safe with WAL: only the last commits can be lost on power failure
+    ('busy_timeout', SQLITE_BUSY_TIMEOUT_MS),
+    ('cache_size', -SQLITE_CACHE_SIZE_KB),  # Negative value means KiB instead of pages
+    ('mmap_size', SQLITE_MMAP_SIZE),
+    ('temp_store', 'MEMORY'),
+)
+
+
+@event.listens_for(Engine, 'connect')
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply SQLite pragmas on every new pooled connection"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in SQLITE_PRAGMAS:
+            cursor.execute(f'PRAGMA {pragma}={value}')
+    finally:
+        cursor.close()
+
+
+def get_database_url(default):
+    """Read DATABASE_URL from the environment, falling back to a default"""
+    database_url = os.getenv('DATABASE_URL', default)
+    # Hosting providers often hand out the legacy "postgres://" scheme
+    if database_url.startswith('postgres://'):
+        database_url = 'postgresql://' + database_url[len('postgres://'):]
+    return database_url
+
+
+def is_sqlite(database_url):
+    """Check if a database URL points to SQLite"""
+    return database_url.startswith('sqlite')
+
+
+def engine_options(database_url):
+    """Build SQLAlchemy engine options for a database URL"""
+    if database_url in ('sqlite://', 'sqlite:///:memory:'):
+        # In-memory databases live in a single connection; keep SQLAlchemy's default pool
+        return {'connect_args': {'check_same_thread': False}}
+
+    options = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+    }
+    if is_sqlite(database_url):
+        # sqlite3's own timeout covers the window before the pragmas run;
+        # pooled connections may be handed to another thread
+        options['connect_args'] = {
+            'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000,
+            'check_same_thread': False,
+        }
+    return options
+
+
+def display_url(database_url):
+    """Database URL for logs and messages, with any password masked"""
+    return make_url(database_url).render_as_string(hide_password=True)
+
+
+def configure_database(app, database_url):
+    """Apply engine settings and bind the shared db to a Flask app"""
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url)
+    db.init_app(app)
+    logger.debug(f"Database configured: {display_url(database_url)}")
+
+
+def create_db_app(database_url=None):
+    """Create a bare Flask app bound to the database, without web routes
+
+    Used by the camera worker and CLI tools, which need an app context for
+    db.session but not the dashboard, CORS or export machinery.
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    app = Flask(__name__)
+    configure_database(app, database_url or get_database_url(DEFAULT_DATABASE_URL))
+    return app
+
+
+def insert_ignore(table, dialect_name):
+    """Build an INSERT that silently skips rows violating a unique constraint"""
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(table).on_conflict_do_nothing()
+
+
+def upgrade_schema(engine):
+    """Add per-session attendance to an attendance table created before it
+
+    Older databases have schedule_id missing and a plain UNIQUE(name, date)
+    constraint, which would allow only one class session per person per
+    day. PostgreSQL can alter the table in place; SQLite cannot drop a
+    constraint, so the table is rebuilt and its rows copied over.
+    """
+    inspector = inspect(engine)
+    if 'attendance' not in inspector.get_table_names():
+        return False
+    if 'schedule_id' in {c['name'] for c in inspector.get_columns('attendance')}:
+        return False
+
+    table = Attendance.__table__
+    old_indexes = [i['name'] for i in inspector.get_indexes('attendance') if i.get('name')]
+    with engine.begin() as conn:
+        if engine.dialect.name == 'sqlite':
+            conn.execute(text('ALTER TABLE attendance RENAME TO attendance_old'))
+            for index_name in old_indexes:
+                conn.execute(text(f'DROP INDEX IF EXISTS "{index_name}"'))
+            table.create(conn)
+            columns = ', '.join(c.name for c in table.columns if c.name != 'schedule_id')
+            conn.execute(text(f'INSERT INTO attendance ({columns}) SELECT {columns} FROM attendance_old'))
+            conn.execute(text('DROP TABLE attendance_old'))
+        else:
+            conn.execute(text('ALTER TABLE attendance ADD COLUMN schedule_id INTEGER REFERENCES class_schedules (id)'))
+            conn.execute(text('ALTER TABLE attendance DROP CONSTRAINT IF EXISTS unique_attendance_per_day'))
+            for index in table.indexes:
+                if index.name not in old_indexes:
+                    index.create(conn)
+    logger.info("Upgraded attendance table for per-session attendance")
+    return True
+
+
+def record_attendance(name, day, time, confidence=0.0, marked_by=None, schedule_id=None):
+    """Insert one attendance row unless the person is already marked
+
+    Without a schedule_id this is daily attendance (once per day); with one
+    it is attendance for that class session (once per meeting per day).
+    Relies on the unique indexes instead of a check-then-insert, so
+    concurrent camera processes cannot race. Returns the new row's id, or
+    None if the person was already marked.
+    """
+    values = {
+        'name': name,
+        'date': day,
+        'time': time,
+        'confidence': confidence,
+        'marked_by': marked_by,
+        'schedule_id': schedule_id,
+    }
+    stmt = insert_ignore(Attendance.__table__, db.engine.dialect.name)
+    try:
+        if stmt is None:
+            result = db.session.execute(Attendance.__table__.insert().values(**values))
+            record_id = result.inserted_primary_key[0]
+        else:
+            result = db.session.execute(stmt.values(**values).returning(Attendance.__table__.c.id))
+            record_id = result.scalar()
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    return record_id
+
+
+def bulk_insert_attendance(rows):
+    """Insert many attendance rows in one transaction, skipping duplicates
+
+    rows is a list of dicts with name/date/time (and optionally confidence,
+    marked_by, schedule_id). Rows that collide with a unique index, either in
+    the table or within the batch, are skipped. Returns the number inserted.
+    """
+    if not rows:
+        return 0
+    stmt = insert_ignore(Attendance.__table__, db.engine.dialect.name)
+    if stmt is None:
+        # No ON CONFLICT support: fall back to a savepoint per row
+        inserted = 0
+        for values in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(Attendance.__table__.insert().values(**values))
+                inserted += 1
+            except IntegrityError:
+                pass
+        db.session.commit()
+        return inserted
+    try:
+        result = db.session.execute(stmt.returning(Attendance.__table__.c.id), rows)
+        inserted = len(result.all())
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return inserted
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Recognition Evaluation for Face Attendance System
+
+Measures how CONFIDENCE_THRESHOLD behaves on the enrolled faces, offline
+and without re-encoding: the cached gallery encodings are evaluated with
+leave-one-out identification (every photo is matched against all the
+others, as if it were a camera frame of that person).
+
+The pairwise distance matrix is computed in row blocks with one matrix
+product per block, so memory stays at block_size x N while every pair is
+covered. Per photo only the nearest same-person and nearest other-person
+distances are kept, and all pair distances go into fixed histograms, so
+sweeping thresholds afterwards is instant.
+
+Reports, per threshold:
+- precision / recall of leave-one-out identification
+- FAR / FRR of pair verification (same person vs. different people)
+and per person at the chosen threshold.
+
+Usage:
+    python evaluate_recognition.py [--threshold 0.6] [--output sweep.csv]
+    python evaluate_recognition.py --synthetic 10000 --people 500
+"""
+
+import os
+import sys
+import csv
+import time
+import argparse
+import numpy as np
+
+from gallery import DATASET_DIR, GALLERY_DIR, dataset_fingerprint, load_gallery, open_gallery
+
+CONFIDENCE_THRESHOLD = 0.6  # Same as face_attendance.py
+BLOCK_SIZE = 1024
+HISTOGRAM_BINS = 2000
+HISTOGRAM_MAX = 2.0  # dlib encodings are never further apart than this in practice
+DEFAULT_THRESHOLDS = '0.30:0.90:0.02'
+
+
+def nearest_distances(encodings, labels, block_size=BLOCK_SIZE):
+    """Leave-one-out nearest distances plus pair distance histograms
+
+    Returns (nearest_same, nearest_other, genuine_hist, impostor_hist):
+    for each row the distance to the closest other photo of the same person
+    (inf if it is their only photo) and to the closest photo of anyone else,
+    and histograms over all unordered pairs of each kind.
+    """
+    encodings = np.asarray(encodings, dtype=np.float32)
+    labels = np.asarray(labels)
+    count = len(encodings)
+    squared_norms = np.einsum('ij,ij->i', encodings, encodings)
+    nearest_same = np.full(count, np.inf, dtype=np.float32)
+    nearest_other = np.full(count, np.inf, dtype=np.float32)
+    genuine_hist = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+    impostor_hist = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+    bin_scale = HISTOGRAM_BINS / HISTOGRAM_MAX
+
+    for start in range(0, count, block_size):
+        stop = min(start + block_size, count)
+        block = encodings[start:stop]
+        # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b, one GEMM per block
+        distances = squared_norms[start:stop, None] + squared_norms[None, :] - 2 * (block @ encodings.T)
+        np.maximum(distances, 0, out=distances)
+        np.sqrt(distances, out=distances)
+
+        rows = np.arange(stop - start)
+        same = labels[start:stop, None] == labels[None, :]
+        same[rows, rows + start] = False  # A photo is not its own match
+
+        nearest_same[start:stop] = np.where(same, distances, np.inf).min(axis=1)
+        distances[rows, rows + start] = np.inf
+        nearest_other[start:stop] = np.where(same, np.inf, distances).min(axis=1)
+
+        # Each unordered pair once: only columns to the right of the diagonal
+        upper = np.arange(count)[None, :] > (rows + start)[:, None]
+        for hist, mask in ((genuine_hist, upper & same), (impostor_hist, upper & ~same)):
+            bins = np.minimum((distances[mask] * bin_scale).astype(np.int64), HISTOGRAM_BINS - 1)
+            hist += np.bincount(bins, minlength=HISTOGRAM_BINS)
+
+    return nearest_same, nearest_other, genuine_hist, impostor_hist
+
+
+def identification_outcomes(nearest_same, nearest_other, threshold):
+    """Per photo: (correct, wrong_person, rejected) boolean arrays at a threshold"""
+    best = np.minimum(nearest_same, nearest_other)
+    accepted = best < threshold
+    correct = accepted & (nearest_same <= nearest_other)
+    return correct, accepted & ~correct, ~accepted
+
+
+def sweep(nearest_same, nearest_other, genuine_hist, impostor_hist, thresholds):
+    """Metrics for every threshold"""
+    enrolled = np.isfinite(nearest_same)  # Has another photo to be recognised from
+    genuine_total = max(int(genuine_hist.sum()), 1)
+    impostor_total = max(int(impostor_hist.sum()), 1)
+    genuine_cumulative = np.cumsum(genuine_hist)
+    impostor_cumulative = np.cumsum(impostor_hist)
+
+    results = []
+    for threshold in thresholds:
+        correct, wrong, _ = identification_outcomes(nearest_same, nearest_other, threshold)
+        accepted = int(correct.sum() + wrong.sum())
+        # Pairs with distance < threshold fall in bins strictly below it
+        below = int(round(threshold * HISTOGRAM_BINS / HISTOGRAM_MAX)) - 1
+        genuine_accepted = int(genuine_cumulative[below]) if below >= 0 else 0
+        impostor_accepted = int(impostor_cumulative[below]) if below >= 0 else 0
+        results.append({
+            'threshold': round(float(threshold), 4),
+            'precision': correct.sum() / accepted if accepted else 1.0,
+            'recall': (correct & enrolled).sum() / max(int(enrolled.sum()), 1),
+            'far': impostor_accepted / impostor_total,
+            'frr': 1 - genuine_accepted / genuine_total,
+        })
+    return results
+
+
+def per_person(labels, names, nearest_same, nearest_other, threshold):
+    """Identification results per person at one threshold"""
+    correct, wrong, rejected = identification_outcomes(nearest_same, nearest_other, threshold)
+    labels = np.asarray(labels)
+    report = []
+    for label in np.unique(labels):
+        rows = labels == label
+        genuine = nearest_same[rows]
+        genuine = genuine[np.isfinite(genuine)]
+        report.append({
+            'name': names[label],
+            'photos': int(rows.sum()),
+            'recognised': int(correct[rows].sum()),
+            'wrong_person': int(wrong[rows].sum()),
+            'rejected': int(rejected[rows].sum()),
+            'median_same': float(np.median(genuine)) if len(genuine) else None,
+            'closest_other': float(nearest_other[rows].min()),
+        })
+    return sorted(report, key=lambda r: (r['recognised'] / r['photos'], r['name']))
+
+
+def parse_thresholds(spec):
+    """'start:stop:step' (inclusive) or a comma separated list"""
+    if ':' in spec:
+        start, stop, step = (float(v) for v in spec.split(':'))
+        return np.round(np.arange(start, stop + step / 2, step), 4)
+    return [float(v) for v in spec.split(',')]
+
+
+def synthetic_encodings(count, people, seed=0):
+    """Clustered encodings at dlib's scale (same person ~0.45 apart, others ~1.0)
+
+    Photo quality varies, so each photo gets its own noise level and a few
+    are far enough off to be misidentified.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(scale=1.0 / np.sqrt(2 * 128), size=(people, 128)).astype(np.float32)
+    labels = rng.integers(0, people, count)
+    photo_noise = 0.45 * rng.lognormal(0, 0.35, size=(count, 1)) / np.sqrt(2 * 128)
+    noise = (rng.normal(size=(count, 128)) * photo_noise).astype(np.float32)
+    return centres[labels] + noise, labels, [f"person_{i}" for i in range(people)]
+
+
+def load_encodings(args):
+    """(encodings, labels, names) from the cached gallery or a synthetic set"""
+    if args.synthetic:
+        return synthetic_encodings(args.synthetic, args.people)
+    path = os.path.join(GALLERY_DIR, dataset_fingerprint(DATASET_DIR))
+    gallery = open_gallery(path) if os.path.isdir(path) else load_gallery(DATASET_DIR)
+    return np.asarray(gallery.encodings, dtype=np.float32), np.asarray(gallery.labels), gallery.names
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Leave-one-out recognition evaluation with a threshold sweep')
+    parser.add_argument('--threshold', type=float, default=CONFIDENCE_THRESHOLD, help='Threshold for the per-person report')
+    parser.add_argument('--thresholds', default=DEFAULT_THRESHOLDS, help='start:stop:step or a comma separated list')
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE)
+    parser.add_argument('--synthetic', type=int, default=0, help='Evaluate N synthetic encodings instead of dataset/')
+    parser.add_argument('--people', type=int, default=500, help='People in the synthetic set')
+    parser.add_argument('--worst', type=int, default=25, help='People listed in the per-person report')
+    parser.add_argument('--output', help='Write the threshold sweep to a CSV file')
+    args = parser.parse_args()
+
+    try:
+        encodings, labels, names = load_encodings(args)
+    except ImportError as e:
+        print(f"No cached gallery for the current dataset and it can't be built here ({e}).")
+        print("Run `python gallery.py build` where face_recognition is installed, or use --synthetic.")
+        return 1
+    if len(encodings) < 2:
+        print("Need at least two encodings to evaluate. Add photos to dataset/ first.")
+        return 1
+
+    start = time.perf_counter()
+    nearest_same, nearest_other, genuine_hist, impostor_hist = nearest_distances(encodings, labels, args.block_size)
+    elapsed = time.perf_counter() - start
+    pairs = len(encodings) * (len(encodings) - 1) // 2
+    results = sweep(nearest_same, nearest_other, genuine_hist, impostor_hist, parse_thresholds(args.thresholds))
+
+    print("\n" + "="*70)
+    print("🎯 RECOGNITION EVALUATION (leave-one-out)")
+    print("="*70)
+    print(f"  Photos: {len(encodings)} | People: {len(np.unique(labels))} | "
+          f"Pairs: {pairs:,} in {elapsed:.2f}s ({pairs / max(elapsed, 1e-9):,.0f} pairs/s)")
+    print(f"  Genuine pairs: {int(genuine_hist.sum()):,} | Impostor pairs: {int(impostor_hist.sum()):,}")
+
+    print(f"\n  {'threshold':>9} {'precision':>10} {'recall':>8} {'FAR':>9} {'FRR':>8}")
+    for r in results:
+        marker = '  ◀ current' if abs(r['threshold'] - CONFIDENCE_THRESHOLD) < 1e-6 else ''
+        print(f"  {r['threshold']:9.2f} {r['precision']:10.2%} {r['recall']:8.2%} {r['far']:9.4%} {r['frr']:8.2%}{marker}")
+
+    eer = min(results, key=lambda r: abs(r['far'] - r['frr']))
+    best_f1 = max(results, key=lambda r: 2 * r['precision'] * r['recall'] / max(r['precision'] + r['recall'], 1e-9))
+    print(f"\n  Equal error rate ≈ {(eer['far'] + eer['frr']) / 2:.2%} at threshold {eer['threshold']:.2f}")
+    print(f"  Best F1 (precision/recall balance) at threshold {best_f1['threshold']:.2f}")
+
+    report = per_person(labels, names, nearest_same, nearest_other, args.threshold)
+    print(f"\n  Per person at threshold {args.threshold:.2f} (worst {min(args.worst, len(report))} of {len(report)}):")
+    print(f"    {'name':20} {'photos':>6} {'ok':>5} {'wrong':>6} {'rejected':>8} {'median same':>12} {'closest other':>14}")
+    for p in report[:args.worst]:
+        median_same = f"{p['median_same']:.3f}" if p['median_same'] is not None else '-'
+        print(f"    {p['name'][:20]:20} {p['photos']:6d} {p['recognised']:5d} {p['wrong_person']:6d} "
+              f"{p['rejected']:8d} {median_same:>12} {p['closest_other']:14.3f}")
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['threshold', 'precision', 'recall', 'far', 'frr'])
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"\n  Sweep written to {args.output}")
+    print("\n" + "="*70 + "\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
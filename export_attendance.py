@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Streaming Attendance Export for Face Attendance System
+
+Reads attendance rows through a server-side cursor in fixed-size chunks and
+encodes each chunk as it arrives, so memory stays constant no matter how
+many records are exported. Used by /api/attendance/export and as a CLI.
+Months moved out by attendance_archive.py are read from their archive
+files when the requested range reaches into them.
+
+Formats:
+    csv      - plain CSV with a header row
+    parquet  - columnar Parquet, one row group per chunk (requires pyarrow)
+
+Usage:
+    python export_attendance.py -o attendance_2026.csv --start 2026-01-01 --end 2026-12-31
+    python export_attendance.py -o report.parquet --format parquet --name sarmad
+"""
+
+import io
+import csv
+import sys
+import argparse
+import itertools
+import logging
+import importlib.util
+from datetime import date
+from sqlalchemy import select
+from werkzeug.utils import secure_filename
+from models import db, Attendance
+from database import create_db_app
+from attendance_archive import iter_archive_chunks
+
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_COLUMNS = ['id', 'name', 'date', 'time', 'confidence', 'marked_by', 'photo_path']
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+logger = logging.getLogger(__name__)
+
+
+def parquet_available():
+    """Check for pyarrow without importing it (it is slow to import)"""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def parse_date(value):
+    """Parse an optional ISO date string, raising ValueError if malformed"""
+    if not value:
+        return None
+    return date.fromisoformat(value)
+
+
+def iter_attendance_chunks(start=None, end=None, name=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of attendance row tuples, chunk_size at a time"""
+    query = select(*[getattr(Attendance, c) for c in EXPORT_COLUMNS])
+    if start:
+        query = query.where(Attendance.date >= start)
+    if end:
+        query = query.where(Attendance.date <= end)
+    if name:
+        query = query.where(Attendance.name == name)
+    query = query.order_by(Attendance.date, Attendance.time, Attendance.id)
+
+    result = db.session.execute(query.execution_options(stream_results=True, yield_per=chunk_size))
+    try:
+        for partition in result.partitions(chunk_size):
+            yield partition
+    finally:
+        result.close()
+
+
+def stream_csv(chunks):
+    """Encode row chunks as CSV text, one string per chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in chunks:
+        for row in rows:
+            writer.writerow([
+                v.isoformat() if hasattr(v, 'isoformat') else ('' if v is None else v)
+                for v in row
+            ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class _ByteSink(io.RawIOBase):
+    """Write-only file object that hands out whatever was written since the last drain"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def parquet_schema():
+    """Arrow schema matching EXPORT_COLUMNS"""
+    import pyarrow as pa
+
+    return pa.schema([
+        ('id', pa.int64()),
+        ('name', pa.string()),
+        ('date', pa.date32()),
+        ('time', pa.time64('us')),
+        ('confidence', pa.float64()),
+        ('marked_by', pa.int64()),
+        ('photo_path', pa.string()),
+    ])
+
+
+def stream_parquet(chunks):
+    """Encode row chunks as Parquet bytes, one row group per chunk"""
+    if not parquet_available():
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+    # Imported on first Parquet export so CSV-only servers never pay for it
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = _ByteSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            table = pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema
+            )
+            writer.write_table(table)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream_export(fmt, start=None, end=None, name=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream an export in the given format (must run inside an app context)
+
+    Archived months are included when the range reaches into them.
+    """
+    chunks = itertools.chain(
+        iter_archive_chunks(EXPORT_COLUMNS, start, end, name, chunk_size),
+        iter_attendance_chunks(start, end, name, chunk_size),
+    )
+    if fmt == 'parquet':
+        return stream_parquet(chunks)
+    return stream_csv(chunks)
+
+
+def export_filename(fmt, start=None, end=None, name=None):
+    """Build a descriptive download filename (safe to quote in Content-Disposition)"""
+    parts = ['attendance']
+    # Names come from the request: drop quotes, slashes and anything non-ASCII
+    name = secure_filename(name or '')
+    if name:
+        parts.append(name)
+    if start or end:
+        parts.append(f"{start or 'begin'}_to_{end or 'today'}")
+    return '_'.join(parts) + '.' + EXPORT_FORMATS[fmt][1]
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Export attendance records')
+    parser.add_argument('-o', '--output', required=True, help="Output file ('-' for stdout, CSV only)")
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--start', help='First date (YYYY-MM-DD)')
+    parser.add_argument('--end', help='Last date (YYYY-MM-DD)')
+    parser.add_argument('--name', help='Only export this person')
+    parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    try:
+        start, end = parse_date(args.start), parse_date(args.end)
+    except ValueError as e:
+        logger.error(f"Invalid date: {e}")
+        return 1
+    if args.format == 'parquet' and args.output == '-':
+        logger.error("Parquet can't be written to stdout; pass a file with -o")
+        return 1
+    if args.format == 'parquet' and not parquet_available():
+        logger.error("Parquet export requires pyarrow (pip install pyarrow)")
+        return 1
+
+    app = create_db_app()
+
+    with app.app_context():
+        stream = stream_export(args.format, start, end, args.name, args.chunk_size)
+        if args.output == '-':
+            for part in stream:
+                sys.stdout.write(part)
+        else:
+            mode, encoding = ('w', 'utf-8') if args.format == 'csv' else ('wb', None)
+            with open(args.output, mode, encoding=encoding, newline='' if encoding else None) as f:
+                for part in stream:
+                    f.write(part)
+            logger.info(f"Exported attendance to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
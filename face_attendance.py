@@ -5,11 +5,22 @@ Face Recognition & Attendance Marking with SQLite Database
 import cv2
 import face_recognition
 import os
-import numpy as np
+import sys
+import signal
 from datetime import datetime, date
+import time
 import logging
-from models import db, Attendance
-from app import app
+from database import create_db_app, record_attendance
+from models import ClassSchedule, ClassSection
+from liveness import LIVE, BlinkLivenessDetector
+from face_quality import assess_face
+from metrics import StageTimer
+from gallery import load_gallery
+from snapshots import SNAPSHOT_ENABLED, SnapshotWriter, face_crop
+from preview import PREVIEW_ENABLED, PreviewPublisher
+from preprocessing import FRAME_SCALE, FramePreprocessor
+from profiler import SamplingProfiler, install_signal_handler, remove_pid_file
+from unknown_faces import UNKNOWN_ENABLED, UnknownFaceTracker
 
 # Configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -17,127 +28,329 @@ DATA_DIR = os.path.join(BASE_DIR, 'data')
 DATASET_DIR = os.path.join(BASE_DIR, 'dataset')
 CONFIDENCE_THRESHOLD = 0.6
 ATTENDANCE_CACHE = {}
+# Require a blink before marking a matched face (defeats printed photos)
+LIVENESS_ENABLED = os.getenv('LIVENESS_CHECK', '0') == '1'
+STATS_INTERVAL = 60  # Seconds between stage latency log lines
+# Scope matching to one class: whichever class meets now in CAMERA_ROOM, or a
+# fixed CLASS_CODE. Without either, everyone in dataset/ is matched and
+# attendance is daily.
+CAMERA_ROOM = os.getenv('CAMERA_ROOM') or None
+CLASS_CODE = os.getenv('CLASS_CODE') or None
+SESSION_REFRESH = 30  # Seconds between checks for the class in session
+# No local window: run as a service and watch the preview at /api/camera/stream
+CAMERA_HEADLESS = os.getenv('CAMERA_HEADLESS', '0') == '1'
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-known_encodings = []
-known_names = []
+gallery = None  # Set by load_known_faces()
+roster_gallery = None  # Enrolled students of the class in session, or None
+session_key = None  # (class id, schedule id) the roster was built for
+session_schedule_id = None  # Attendance is recorded against this meeting
 
-# Ensure data directory exists
-os.makedirs(DATA_DIR, exist_ok=True)
+# Bare database app: the camera worker never imports the web routes
+app = create_db_app()
 
-logger.info("Loading encodings...")
+stage_timer = StageTimer()
+liveness = BlinkLivenessDetector()
+snapshot_writer = SnapshotWriter(app)
+preview = PreviewPublisher() if PREVIEW_ENABLED else None
+unknown_faces = UnknownFaceTracker() if UNKNOWN_ENABLED else None
+stop_requested = False
 
-if not os.path.isdir(DATASET_DIR):
-    logger.warning(f"Dataset directory not found at {DATASET_DIR}. No faces loaded.")
-else:
-    for person_name in os.listdir(DATASET_DIR):
-        person_dir = os.path.join(DATASET_DIR, person_name)
-        if not os.path.isdir(person_dir):
-            continue
+def load_known_faces():
+    """Open the memory-mapped gallery, encoding the dataset only if it changed"""
+    global gallery
+    logger.info("Loading encodings...")
+    gallery = load_gallery(DATASET_DIR)
+    logger.info(f"Encodings loaded successfully. Total faces: {len(gallery)}")
 
-        for img_name in os.listdir(person_dir):
-            try:
-                img_path = os.path.join(person_dir, img_name)
-                image = face_recognition.load_image_file(img_path)
-                locations = face_recognition.face_locations(image)
+def refresh_session(now=None):
+    """Load the roster of the class in session, if scoping is enabled"""
+    global roster_gallery, session_key, session_schedule_id
+    if not (CAMERA_ROOM or CLASS_CODE):
+        return
+    try:
+        with app.app_context():
+            section = None
+            if CLASS_CODE:
+                section = ClassSection.query.filter_by(code=CLASS_CODE).first()
+                if section is None:
+                    logger.warning(f"Unknown class {CLASS_CODE}: matching everyone.")
+            schedule = ClassSchedule.current(now, room=CAMERA_ROOM, section_id=section.id if section else None)
+            if section is None and schedule is not None:
+                section = schedule.section
+
+            key = (section.id if section else None, schedule.id if schedule else None)
+            if key == session_key:
+                return
+            session_key = key
+            session_schedule_id = schedule.id if schedule else None
+            if section is None:
+                roster_gallery = None
+                logger.info("No class in session: matching everyone, daily attendance.")
+                return
+
+            roster = section.roster()
+            roster_gallery = gallery.subset(roster)
+            when = f"{schedule.start_time:%H:%M}-{schedule.end_time:%H:%M}" if schedule else "unscheduled, daily attendance"
+            logger.info(f"Class in session: {section.code} ({when}). Roster: {len(roster)} students, "
+                        f"{len(roster_gallery)} of {len(gallery)} encodings.")
+            missing = sorted(set(roster) - roster_gallery.people())
+            if missing:
+                logger.warning(f"No dataset photos for enrolled students: {', '.join(missing)}")
+    except Exception as e:
+        logger.error(f"Error loading class roster: {e}")
 
-                if len(locations) != 1:
-                    logger.warning(f"Skipping {img_name}: found {len(locations)} faces.")
-                    continue
+def identify(face_encoding):
+    """Return (name, distance, enrolled) for a face; name is None if unknown
 
-                encoding = face_recognition.face_encodings(image, known_face_locations=locations)[0]
-                known_encodings.append(encoding)
-                known_names.append(person_name)
-                logger.debug(f"Loaded: {person_name}/{img_name}")
-            except Exception as e:
-                logger.error(f"Error loading {img_name}: {e}")
+    With a class in session only the roster is searched first; faces that
+    don't match it fall back to the whole gallery so visitors from other
+    classes are named but not marked.
+    """
+    if roster_gallery is not None and len(roster_gallery):
+        index, distance = roster_gallery.best_match(face_encoding)
+        if distance < CONFIDENCE_THRESHOLD:
+            return roster_gallery.name_at(index), distance, True
+    index, distance = gallery.best_match(face_encoding)
+    if distance < CONFIDENCE_THRESHOLD:
+        return gallery.name_at(index), distance, roster_gallery is None
+    return None, distance, False
 
-logger.info(f"Encodings loaded successfully. Total faces: {len(known_encodings)}")
+def mark_attendance(name, confidence=0.0, schedule_id=None, crop=None):
+    """Mark attendance in database, preventing duplicates within the same day or class session
 
-def mark_attendance(name, confidence=0.0):
-    """Mark attendance in database, preventing duplicates within same day"""
+    crop is the face image to keep as evidence; it is stored in the background.
+    """
     try:
         today = date.today()
         
         # Check session cache first
-        if name in ATTENDANCE_CACHE and ATTENDANCE_CACHE[name] == today:
+        if already_marked_today(name, schedule_id):
             return False
         
-        # Check if already marked today
-        existing = Attendance.query.filter_by(name=name, date=today).first()
-        if existing:
-            logger.info(f"Attendance already marked for {name} today.")
-            return False
-        
-        # Mark new attendance
+        # Insert unless already marked (enforced by the unique indexes)
         with app.app_context():
-            new_record = Attendance(
-                name=name,
-                date=today,
-                time=datetime.now().time(),
-                confidence=confidence
-            )
-            db.session.add(new_record)
-            db.session.commit()
-            ATTENDANCE_CACHE[name] = today
-            logger.info(f"Attendance marked: {name} at {datetime.now().strftime('%H:%M:%S')} (confidence: {confidence:.2f})")
-            return True
+            now = datetime.now()
+            record_id = record_attendance(name, today, now.time(), float(confidence), schedule_id=schedule_id)
+            ATTENDANCE_CACHE[(name, schedule_id)] = today
+            if not record_id:
+                logger.info(f"Attendance already marked for {name} {'this session' if schedule_id else 'today'}.")
+                return False
+            logger.info(f"Attendance marked: {name} at {now.strftime('%H:%M:%S')} (confidence: {confidence:.2f})")
+        if SNAPSHOT_ENABLED:
+            snapshot_writer.submit(record_id, today, crop)
+        return True
     except Exception as e:
         logger.error(f"Error marking attendance: {e}")
         return False
 
-try:
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        logger.error("Failed to open camera. Check if webcam is connected.")
-        exit(1)
-    logger.info("Camera started. Press 'q' to quit.")
+def already_marked_today(name, schedule_id=None):
+    """Check the session cache without touching the database"""
+    return ATTENDANCE_CACHE.get((name, schedule_id)) == date.today()
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            logger.error("Failed to read from camera.")
-            break
+def eye_landmarks(frame, box):
+    """Face landmarks from the full-resolution crop (the 1/4 frame is too coarse for eyes)"""
+    top, right, bottom, left = box
+    height, width = frame.shape[:2]
+    top, left = max(top, 0), max(left, 0)
+    bottom, right = min(bottom, height), min(right, width)
+    if bottom <= top or right <= left:
+        return None
+    crop = cv2.cvtColor(frame[top:bottom, left:right], cv2.COLOR_BGR2RGB)
+    found = face_recognition.face_landmarks(crop, face_locations=[(0, right - left, bottom - top, 0)])
+    return found[0] if found else None
 
-        # Resize for faster processing
-        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-        rgb_small = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+def request_stop(signum, frame):
+    """Signal handler: finish the current frame and shut down cleanly"""
+    global stop_requested
+    stop_requested = True
 
+def process_frame(frame, preprocessor):
+    """Detect, match and mark the faces in one frame, drawing the results onto it
+
+    Returns the number of faces skipped as too low-quality to encode.
+    """
+    skipped_faces = 0
+
+    # Resize for faster processing
+    with stage_timer.stage('preprocess'):
+        rgb_small = preprocessor.process(frame)
+
+    with stage_timer.stage('detect'):
         face_locations = face_recognition.face_locations(rgb_small, model='hog')
-        face_encodings = face_recognition.face_encodings(rgb_small, face_locations)
 
-        for face_encoding, face_location in zip(face_encodings, face_locations):
-            face_distances = face_recognition.face_distance(known_encodings, face_encoding)
-            best_match_index = np.argmin(face_distances)
-            
-            # Apply confidence threshold
-            if face_distances[best_match_index] < CONFIDENCE_THRESHOLD:
-                name = known_names[best_match_index]
-                confidence = 1 - face_distances[best_match_index]
-                mark_attendance(name, confidence)
+    # Only encode faces that are big, sharp and frontal enough to match
+    with stage_timer.stage('quality'):
+        good_locations = []
+        low_quality_boxes = []
+        for face_location in face_locations:
+            box = tuple(v * FRAME_SCALE for v in face_location)
+            quality = assess_face(
+                frame, box,
+                get_landmarks=lambda: face_recognition.face_landmarks(rgb_small, [face_location], model='small')[0]
+            )
+            if quality.acceptable:
+                good_locations.append(face_location)
             else:
-                name = "Unknown"
-                confidence = 0
+                skipped_faces += 1
+                low_quality_boxes.append(box)
+
+    with stage_timer.stage('encode'):
+        face_encodings = face_recognition.face_encodings(rgb_small, good_locations)
+
+    # Thin grey box: detected but not worth encoding
+    for top, right, bottom, left in low_quality_boxes:
+        cv2.rectangle(frame, (left, top), (right, bottom), (128, 128, 128), 1)
+
+    for face_encoding, face_location in zip(face_encodings, good_locations):
+        top, right, bottom, left = [v * FRAME_SCALE for v in face_location]
+        name = "Unknown"
+        confidence = 0
+        pending = False
+        enrolled = True
+        if gallery is not None and len(gallery):
+            with stage_timer.stage('match'):
+                match_name, distance, in_roster = identify(face_encoding)
+            
+            if match_name is not None:
+                name = match_name
+                enrolled = in_roster
+                confidence = 1 - distance
+                schedule_id = session_schedule_id
+                if enrolled and not already_marked_today(name, schedule_id):
+                    # Liveness runs only for candidate matches not yet marked today
+                    status = LIVE
+                    if LIVENESS_ENABLED:
+                        with stage_timer.stage('liveness'):
+                            status = liveness.update(name, eye_landmarks(frame, (top, right, bottom, left)))
+                    if status == LIVE:
+                        with stage_timer.stage('db_write'):
+                            mark_attendance(name, confidence, schedule_id,
+                                            crop=face_crop(frame, (top, right, bottom, left)))
+                    else:
+                        pending = True
 
-            # Draw box and label with confidence score
-            top, right, bottom, left = [v * 4 for v in face_location]
+        seen_before = False
+        if name == "Unknown" and unknown_faces is not None:
+            # Cluster unknown visitors so admins can enroll them later
+            with stage_timer.stage('unknown'):
+                cluster = unknown_faces.observe(
+                    face_encoding, crop=lambda: face_crop(frame, (top, right, bottom, left)))
+            seen_before = cluster['visits'] > 1
+
+        # Draw box and label with confidence score
+        if pending:
+            color = (0, 165, 255)
+        elif not enrolled:
+            color = (0, 255, 255)
+        else:
             color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
-            cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-            cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
-            label = f"{name} ({confidence:.2f})" if name != "Unknown" else name
-            cv2.putText(frame, label, (left + 6, bottom - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-
-        cv2.imshow("Face Attendance System", frame)
-
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-except Exception as e:
-    logger.error(f"Camera error: {e}")
-finally:
-    cap.release()
-    cv2.destroyAllWindows()
-    logger.info("Camera released and all windows closed.")
+        cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+        cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
+        if pending:
+            label = f"{name}: please blink"
+        elif not enrolled:
+            label = f"{name} (not in class)"
+        elif name == "Unknown":
+            label = "Unknown (seen before)" if seen_before else name
+        else:
+            label = f"{name} ({confidence:.2f})"
+        cv2.putText(frame, label, (left + 6, bottom - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+    return skipped_faces
+
+def log_stats(skipped_faces):
+    """Log stage latencies and background worker stats, and prune per-face state"""
+    stage_timer.log_summary(logger)
+    logger.info(f"Low-quality faces skipped before encoding: {skipped_faces}")
+    if SNAPSHOT_ENABLED:
+        logger.info(f"Snapshots: {snapshot_writer.stats()}")
+    if preview is not None:
+        logger.info(f"Preview: {preview.stats()}")
+    if unknown_faces is not None:
+        logger.info(f"Unknown faces: {unknown_faces.compact()}")
+    liveness.prune()
+
+def close_outputs():
+    """Flush pending snapshots, the preview stream and unknown-face clusters"""
+    snapshot_writer.close()
+    if preview is not None:
+        preview.close()
+    if unknown_faces is not None:
+        unknown_faces.compact()
+    stage_timer.log_summary(logger)
+
+def run_camera():
+    """Recognize faces from the webcam and mark attendance until 'q' is pressed (or SIGTERM)"""
+    signal.signal(signal.SIGTERM, request_stop)
+    cap = cv2.VideoCapture(0)
+    try:
+        if not cap.isOpened():
+            logger.error("Failed to open camera. Check if webcam is connected.")
+            return 1
+        if CAMERA_HEADLESS:
+            logger.info("Camera started without a window. Stop with Ctrl+C or SIGTERM.")
+        else:
+            logger.info("Camera started. Press 'q' to quit.")
+        if LIVENESS_ENABLED:
+            logger.info("Liveness check enabled: matched faces must blink before attendance is marked.")
+        last_stats = time.monotonic()
+        last_session_check = time.monotonic()
+        skipped_faces = 0
+        preprocessor = FramePreprocessor(FRAME_SCALE)
+
+        while not stop_requested:
+            # Frame buffers are reused: copy anything kept past this iteration
+            ret, frame = preprocessor.read(cap)
+            if not ret:
+                logger.error("Failed to read from camera.")
+                break
+
+            if time.monotonic() - last_session_check > SESSION_REFRESH:
+                refresh_session()
+                last_session_check = time.monotonic()
+
+            skipped_faces += process_frame(frame, preprocessor)
+
+            # Encoded at PREVIEW_FPS at most, shared by every stream viewer
+            if preview is not None and preview.due():
+                with stage_timer.stage('preview'):
+                    preview.publish(frame)
+            if not CAMERA_HEADLESS:
+                cv2.imshow("Face Attendance System", frame)
+
+            if time.monotonic() - last_stats > STATS_INTERVAL:
+                log_stats(skipped_faces)
+                last_stats = time.monotonic()
+
+            if not CAMERA_HEADLESS and cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        logger.error(f"Camera error: {e}")
+    finally:
+        cap.release()
+        if not CAMERA_HEADLESS:
+            cv2.destroyAllWindows()
+        close_outputs()
+        logger.info("Camera released and all windows closed.")
+    return 0
+
+def main():
+    # kill -USR1 <pid> (or POST /api/admin/profile) samples the live loop into data/profiles/
+    profiler = SamplingProfiler('camera', stage_timer=stage_timer)
+    install_signal_handler(profiler)
+    try:
+        load_known_faces()
+        refresh_session()
+        return run_camera()
+    finally:
+        remove_pid_file('camera')
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Face Quality Scoring for Face Attendance System
+
+Computing a 128-d encoding is the most expensive step per face, and it is
+wasted on faces that are too small, blurred or turned away to ever match.
+assess_face() checks the cheap signals first and stops at the first
+failure: box size, sharpness (variance of the Laplacian on a normalised
+grayscale crop) and, only if those pass, head pose from the 5-point
+landmarks.
+
+Run as a script to rank the enrollment photos in dataset/:
+    python face_quality.py [dataset_dir]
+"""
+
+import os
+import sys
+import math
+from collections import namedtuple
+import cv2
+import numpy as np
+
+MIN_FACE_SIZE = int(os.getenv('MIN_FACE_SIZE', 80))         # Pixels at full resolution
+MIN_SHARPNESS = float(os.getenv('MIN_FACE_SHARPNESS', 60))  # Laplacian variance of a 96x96 crop
+MAX_YAW = float(os.getenv('MAX_FACE_YAW', 0.35))            # Nose offset / eye distance
+MAX_ROLL = float(os.getenv('MAX_FACE_ROLL', 25))            # Degrees
+SHARPNESS_CROP = 96
+# Camera frames are BGR (OpenCV); photos loaded with face_recognition are RGB
+GRAY_CONVERSIONS = {'BGR': cv2.COLOR_BGR2GRAY, 'RGB': cv2.COLOR_RGB2GRAY}
+
+
+class FaceQuality(namedtuple('FaceQuality', ['score', 'size', 'sharpness', 'yaw', 'roll', 'reason'])):
+    """Quality checks for one face; reason says why it was rejected, or None"""
+    __slots__ = ()
+    
+    @property
+    def acceptable(self):
+        return self.reason is None
+
+
+def face_size(box):
+    """Smaller side of a (top, right, bottom, left) box"""
+    top, right, bottom, left = box
+    return min(bottom - top, right - left)
+
+
+def face_sharpness(image, box, channels='BGR'):
+    """Variance of the Laplacian of the face crop, resized to a fixed size
+
+    channels is the colour order of a 3-channel image ('BGR' or 'RGB').
+    """
+    top, right, bottom, left = box
+    height, width = image.shape[:2]
+    crop = image[max(top, 0):min(bottom, height), max(left, 0):min(right, width)]
+    if crop.size == 0:
+        return 0.0
+    if crop.ndim == 3:
+        crop = cv2.cvtColor(crop, GRAY_CONVERSIONS[channels])
+    crop = cv2.resize(crop, (SHARPNESS_CROP, SHARPNESS_CROP), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(crop, cv2.CV_64F).var())
+
+
+def estimate_pose(landmarks):
+    """Approximate (yaw, roll) from 5-point landmarks
+
+    yaw is the horizontal offset of the nose tip from the midpoint between
+    the eyes, relative to the eye distance (0 = frontal). roll is the tilt
+    of the eye line in degrees.
+    """
+    left_eye = np.mean(landmarks['left_eye'], axis=0)
+    right_eye = np.mean(landmarks['right_eye'], axis=0)
+    nose = np.mean(landmarks['nose_tip'], axis=0)
+    eye_vector = right_eye - left_eye
+    eye_distance = float(np.linalg.norm(eye_vector))
+    if eye_distance == 0:
+        return 1.0, 0.0
+    midpoint = (left_eye + right_eye) / 2
+    # Project the nose offset onto the eye line so roll doesn't read as yaw
+    yaw = abs(float(np.dot(nose - midpoint, eye_vector / eye_distance))) / eye_distance
+    roll = math.degrees(math.atan2(eye_vector[1], eye_vector[0]))
+    if roll > 90:
+        roll -= 180
+    elif roll < -90:
+        roll += 180
+    return yaw, roll
+
+
+def assess_face(image, box, get_landmarks=None, channels='BGR', min_size=MIN_FACE_SIZE,
+                min_sharpness=MIN_SHARPNESS, max_yaw=MAX_YAW, max_roll=MAX_ROLL):
+    """Score a detected face, stopping at the first failed check
+
+    image/box should be at full resolution so size and sharpness are
+    comparable between the camera and enrollment photos; channels is the
+    image's colour order ('BGR' camera frames, 'RGB' photos loaded with
+    face_recognition) so both are graded on the same grayscale. get_landmarks is
+    an optional callable returning a 5-point landmarks dict; it is only
+    called when size and sharpness pass. Score is in [0, 1].
+    """
+    size = face_size(box)
+    if size < min_size:
+        return FaceQuality(0.0, size, None, None, None, f"face too small ({size}px)")
+
+    sharpness = face_sharpness(image, box, channels)
+    if sharpness < min_sharpness:
+        return FaceQuality(0.0, size, sharpness, None, None, f"too blurry (sharpness {sharpness:.0f})")
+
+    yaw = roll = None
+    pose_score = 1.0
+    landmarks = get_landmarks() if get_landmarks else None
+    if landmarks:
+        yaw, roll = estimate_pose(landmarks)
+        if yaw > max_yaw or abs(roll) > max_roll:
+            return FaceQuality(0.0, size, sharpness, yaw, roll, f"head turned (yaw {yaw:.2f}, roll {roll:.0f}°)")
+        pose_score = (1 - yaw / max_yaw) * (1 - abs(roll) / max_roll) ** 0.5
+
+    size_score = min(1.0, size / (2 * min_size))
+    sharpness_score = min(1.0, sharpness / (4 * min_sharpness))
+    score = size_score * sharpness_score * (0.5 + 0.5 * pose_score)
+    return FaceQuality(round(score, 4), size, sharpness, yaw, roll, None)
+
+
+def main():
+    import face_recognition
+
+    dataset_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dataset')
+    print("\n" + "="*70)
+    print("🔎 ENROLLMENT PHOTO QUALITY")
+    print("="*70)
+    for person_name in sorted(os.listdir(dataset_dir)):
+        person_dir = os.path.join(dataset_dir, person_name)
+        if not os.path.isdir(person_dir):
+            continue
+        results = []
+        for img_name in sorted(os.listdir(person_dir)):
+            image = face_recognition.load_image_file(os.path.join(person_dir, img_name))
+            locations = face_recognition.face_locations(image)
+            if len(locations) != 1:
+                results.append((0.0, img_name, f"found {len(locations)} faces"))
+                continue
+            quality = assess_face(
+                image, locations[0], channels='RGB',
+                get_landmarks=lambda: face_recognition.face_landmarks(image, locations, model='small')[0]
+            )
+            results.append((quality.score, img_name, quality.reason or "ok"))
+        print(f"\n  {person_name}")
+        for score, img_name, status in sorted(results, reverse=True):
+            print(f"    {score:5.2f}  {img_name:45} {status}")
+    print("\n" + "="*70 + "\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped Face Gallery for Face Attendance System
+
+Encoding the whole dataset takes minutes and every recognition process
+used to do it again and keep its own list of float64 arrays. The gallery
+is instead built once and stored as a compact directory:
+
+    data/gallery/<fingerprint>/
+        encodings.bin   N x 128 float32 (or float16), row-major
+        labels.bin      N int32 person ids
+        meta.json       format version, dtype, shape and the name table
+
+Processes open it with np.memmap, so they share the same physical pages
+through the OS page cache and startup is near-instant. The directory name
+is a fingerprint of the dataset files and enrollment settings; any change
+to dataset/ produces a new gallery, and a directory is only ever renamed
+into place once complete, so concurrent builders and readers never see a
+partial gallery.
+
+Usage:
+    python gallery.py build [--dtype float16] [--quantize int8] [--force]
+    python gallery.py info
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not serialized
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+DATASET_DIR = os.path.join(BASE_DIR, 'dataset')
+GALLERY_DIR = os.path.join(DATA_DIR, 'gallery')
+
+GALLERY_FORMAT_VERSION = 1
+GALLERY_DTYPE = os.getenv('GALLERY_DTYPE', 'float32')
+SUPPORTED_DTYPES = ('float32', 'float16')
+# Optional compact copy of the matrix scanned first; the top candidates are
+# then re-ranked exactly against encodings.bin
+GALLERY_QUANTIZATION = os.getenv('GALLERY_QUANTIZATION', 'none')
+QUANTIZATIONS = ('none', 'int8', 'float16')
+RERANK_CANDIDATES = int(os.getenv('GALLERY_RERANK_CANDIDATES', 32))
+SCAN_BLOCK_ROWS = 8192  # Rows widened to float32 at a time during the quantized scan
+ENCODING_DIM = 128
+MAX_IMAGES_PER_PERSON = int(os.getenv('MAX_IMAGES_PER_PERSON', 20))  # Best-quality photos kept per person
+STALE_BUILD_SECONDS = 3600  # Leftover temp dirs of failed builds older than this are removed
+
+logger = logging.getLogger(__name__)
+
+
+class Gallery:
+    """Known face encodings with a label id per row and a name table"""
+
+    def __init__(self, encodings, labels, names, path=None, codes=None, scale=None, code_norms=None,
+                 rerank_candidates=RERANK_CANDIDATES):
+        self.encodings = encodings
+        self.labels = labels
+        self.names = names
+        self.path = path
+        # Quantized copy for the first search stage (None = exact scan only)
+        self.codes = codes
+        self.scale = scale
+        self.code_norms = code_norms
+        self.rerank_candidates = rerank_candidates
+        self._row_norms = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    def name_at(self, index):
+        """Person name for a row"""
+        return self.names[self.labels[index]]
+
+    def distances(self, encoding):
+        """Euclidean distance from one encoding to every row"""
+        query = np.asarray(encoding, dtype=np.float32)
+        # float16 rows are promoted to float32 by the subtraction
+        return np.linalg.norm(self.encodings - query, axis=1)
+
+    def approx_sq_distances(self, encoding):
+        """Squared distances to every row computed from the quantized codes
+
+        Uses |q - x|^2 = |q|^2 + |x|^2 - 2 q.x with |x|^2 precomputed, and
+        widens the codes block by block so only 1-2 bytes per value are read.
+        """
+        query = np.asarray(encoding, dtype=np.float32)
+        scaled_query = query * self.scale
+        result = np.empty(len(self), dtype=np.float32)
+        buffer = np.empty((min(SCAN_BLOCK_ROWS, len(self)), self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(self), SCAN_BLOCK_ROWS):
+            block = self.codes[start:start + SCAN_BLOCK_ROWS]
+            rows = buffer[:len(block)]
+            np.copyto(rows, block)
+            np.dot(rows, scaled_query, out=result[start:start + len(block)])
+        result *= -2
+        result += self.code_norms
+        result += float(query @ query)
+        return result
+
+    def search(self, encoding, k=1, exact=False):
+        """Return (row indices, distances) of the k closest rows, nearest first
+
+        With quantized codes, the codes are scanned first and only the best
+        rerank_candidates rows are compared exactly in float32.
+        """
+        k = min(k, len(self))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        if exact or self.codes is None or len(self) <= max(self.rerank_candidates, k):
+            candidates = np.arange(len(self))
+            distances = self.distances(encoding)
+        else:
+            approx = self.approx_sq_distances(encoding)
+            count = max(self.rerank_candidates, k)
+            candidates = np.sort(np.argpartition(approx, count - 1)[:count])  # Sorted for sequential page reads
+            query = np.asarray(encoding, dtype=np.float32)
+            distances = np.linalg.norm(self.encodings[candidates].astype(np.float32) - query, axis=1)
+
+        order = np.argsort(distances, kind='stable')[:k]
+        return candidates[order], distances[order]
+
+    def best_match(self, encoding):
+        """Return (row index, distance) of the closest row, or (None, None) if empty"""
+        if len(self) == 0:
+            return None, None
+        indices, distances = self.search(encoding, k=1)
+        return int(indices[0]), float(distances[0])
+
+    def row_norms(self):
+        """Squared norm of every row, computed once"""
+        if self._row_norms is None:
+            norms = np.empty(len(self), dtype=np.float32)
+            for start in range(0, len(self), SCAN_BLOCK_ROWS):
+                block = np.asarray(self.encodings[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+                norms[start:start + len(block)] = np.einsum('ij,ij->i', block, block)
+            self._row_norms = norms
+        return self._row_norms
+
+    def best_matches(self, encodings):
+        """Closest row and distance for each of many encodings
+
+        One matrix product per block of rows covers every query at once,
+        instead of one full scan per query.
+        """
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        best_rows = np.zeros(len(queries), dtype=np.int64)
+        best_sq = np.full(len(queries), np.inf, dtype=np.float32)
+        if len(self) == 0 or len(queries) == 0:
+            return best_rows, best_sq
+        query_norms = np.einsum('ij,ij->i', queries, queries)
+        row_norms = self.row_norms()
+        for start in range(0, len(self), SCAN_BLOCK_ROWS):
+            block = np.asarray(self.encodings[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+            sq = row_norms[None, start:start + len(block)] - 2 * (queries @ block.T)
+            rows = sq.argmin(axis=1)
+            values = sq[np.arange(len(queries)), rows] + query_norms
+            better = values < best_sq
+            best_sq[better] = values[better]
+            best_rows[better] = rows[better] + start
+        return best_rows, np.sqrt(np.maximum(best_sq, 0))
+
+    def subset(self, names):
+        """Gallery restricted to the given people, copied into memory"""
+        wanted = set(names)
+        label_ids = [i for i, name in enumerate(self.names) if name in wanted]
+        rows = np.flatnonzero(np.isin(self.labels, label_ids))
+        codes = code_norms = None
+        if self.codes is not None:
+            codes, code_norms = np.asarray(self.codes[rows]), np.asarray(self.code_norms[rows])
+        return Gallery(np.asarray(self.encodings[rows]), np.asarray(self.labels[rows]), self.names, self.path,
+                       codes=codes, scale=self.scale, code_norms=code_norms,
+                       rerank_candidates=self.rerank_candidates)
+
+    def people(self):
+        """Names with at least one encoding"""
+        return {self.names[label] for label in np.unique(self.labels)}
+
+    def nbytes(self):
+        return self.encodings.nbytes + self.labels.nbytes
+
+    def scan_nbytes(self):
+        """Bytes read per query by the first search stage"""
+        if self.codes is None:
+            return self.encodings.nbytes
+        return self.codes.nbytes + self.code_norms.nbytes
+
+
+def quantize(matrix, method):
+    """Return (codes, per-dimension scale, squared norms of the dequantized rows)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if method == 'int8':
+        # Symmetric per-dimension scale so every dimension uses the full range
+        scale = np.abs(matrix).max(axis=0) / 127 if len(matrix) else np.ones(matrix.shape[1])
+        scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+        codes = np.clip(np.rint(matrix / scale), -127, 127).astype(np.int8)
+    elif method == 'float16':
+        scale = np.ones(matrix.shape[1], dtype=np.float32)
+        codes = matrix.astype(np.float16)
+    else:
+        raise ValueError(f"Unsupported quantization: {method}")
+    dequantized = codes.astype(np.float32) * scale
+    code_norms = np.einsum('ij,ij->i', dequantized, dequantized).astype(np.float32)
+    return codes, scale, code_norms
+
+
+def dataset_fingerprint(dataset_dir=DATASET_DIR, max_images_per_person=MAX_IMAGES_PER_PERSON, dtype=GALLERY_DTYPE,
+                        quantization=GALLERY_QUANTIZATION):
+    """Hash of every image's path, size and mtime plus the enrollment settings"""
+    digest = hashlib.sha1()
+    digest.update(f"v{GALLERY_FORMAT_VERSION}|{dtype}|{quantization}|max={max_images_per_person}".encode())
+    if os.path.isdir(dataset_dir):
+        for person_name in sorted(os.listdir(dataset_dir)):
+            person_dir = os.path.join(dataset_dir, person_name)
+            if not os.path.isdir(person_dir):
+                continue
+            for img_name in sorted(os.listdir(person_dir)):
+                stat = os.stat(os.path.join(person_dir, img_name))
+                digest.update(f"|{person_name}/{img_name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def write_gallery(gallery_root, fingerprint, encodings, row_names, dtype=GALLERY_DTYPE,
+                  quantization=GALLERY_QUANTIZATION, max_images_per_person=MAX_IMAGES_PER_PERSON):
+    """Write a gallery directory atomically and return its path"""
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported gallery dtype: {dtype}")
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unsupported quantization: {quantization}")
+
+    names = sorted(set(row_names))
+    name_ids = {name: i for i, name in enumerate(names)}
+    matrix = np.asarray(encodings, dtype=dtype).reshape(-1, ENCODING_DIM)
+    labels = np.asarray([name_ids[n] for n in row_names], dtype=np.int32)
+
+    os.makedirs(gallery_root, exist_ok=True)
+    final_path = os.path.join(gallery_root, fingerprint)
+    tmp_path = tempfile.mkdtemp(prefix=f'.{fingerprint}-', dir=gallery_root)
+    try:
+        matrix.tofile(os.path.join(tmp_path, 'encodings.bin'))
+        labels.tofile(os.path.join(tmp_path, 'labels.bin'))
+        scale = None
+        if quantization != 'none':
+            codes, scale, code_norms = quantize(matrix, quantization)
+            codes.tofile(os.path.join(tmp_path, 'codes.bin'))
+            code_norms.tofile(os.path.join(tmp_path, 'code_norms.bin'))
+        meta = {
+            'version': GALLERY_FORMAT_VERSION,
+            'dtype': dtype,
+            'quantization': quantization,
+            'max_images_per_person': max_images_per_person,
+            'scale': scale.tolist() if scale is not None else None,
+            'count': int(matrix.shape[0]),
+            'dim': ENCODING_DIM,
+            'names': names,
+            'fingerprint': fingerprint,
+            'created': datetime.now().isoformat(timespec='seconds'),
+        }
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        try:
+            os.rename(tmp_path, final_path)
+        except OSError:
+            # Another process published the same gallery first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    return final_path
+
+
+def open_gallery(path):
+    """Open a gallery directory with read-only memory maps"""
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('version') != GALLERY_FORMAT_VERSION:
+        raise ValueError(f"Unsupported gallery version {meta.get('version')} at {path}")
+
+    count, dim = meta['count'], meta['dim']
+    codes = scale = code_norms = None
+    if count == 0:
+        encodings = np.zeros((0, dim), dtype=meta['dtype'])
+        labels = np.zeros(0, dtype=np.int32)
+    else:
+        encodings = np.memmap(os.path.join(path, 'encodings.bin'), dtype=meta['dtype'], mode='r', shape=(count, dim))
+        labels = np.memmap(os.path.join(path, 'labels.bin'), dtype=np.int32, mode='r', shape=(count,))
+        quantization = meta.get('quantization', 'none')
+        if quantization != 'none':
+            code_dtype = np.int8 if quantization == 'int8' else np.float16
+            codes = np.memmap(os.path.join(path, 'codes.bin'), dtype=code_dtype, mode='r', shape=(count, dim))
+            code_norms = np.memmap(os.path.join(path, 'code_norms.bin'), dtype=np.float32, mode='r', shape=(count,))
+            scale = np.asarray(meta['scale'], dtype=np.float32)
+    return Gallery(encodings, labels, meta['names'], path=path, codes=codes, scale=scale, code_norms=code_norms)
+
+
+def encode_dataset(dataset_dir=DATASET_DIR, max_images_per_person=MAX_IMAGES_PER_PERSON):
+    """Encode the best photos of every person in the dataset directory
+
+    Returns (encodings, names) with one entry per kept photo.
+    """
+    encodings, names = [], []
+    if not os.path.isdir(dataset_dir):
+        logger.warning(f"Dataset directory not found at {dataset_dir}. No faces loaded.")
+        return encodings, names
+
+    # Only building needs dlib; opening a gallery is NumPy only
+    import face_recognition
+    from face_quality import assess_face
+
+    for person_name in sorted(os.listdir(dataset_dir)):
+        person_dir = os.path.join(dataset_dir, person_name)
+        if not os.path.isdir(person_dir):
+            continue
+
+        # Rank photos by quality first so only the best ones get encoded
+        candidates = []
+        for img_name in sorted(os.listdir(person_dir)):
+            try:
+                img_path = os.path.join(person_dir, img_name)
+                image = face_recognition.load_image_file(img_path)
+                locations = face_recognition.face_locations(image)
+
+                if len(locations) != 1:
+                    logger.warning(f"Skipping {img_name}: found {len(locations)} faces.")
+                    continue
+
+                quality = assess_face(
+                    image, locations[0], channels='RGB',
+                    get_landmarks=lambda: face_recognition.face_landmarks(image, locations, model='small')[0]
+                )
+                if not quality.acceptable:
+                    logger.warning(f"Skipping {img_name}: {quality.reason}.")
+                    continue
+                candidates.append((quality.score, img_name, img_path, locations))
+            except Exception as e:
+                logger.error(f"Error loading {img_name}: {e}")
+
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        for score, img_name, img_path, locations in candidates[:max_images_per_person]:
+            try:
+                image = face_recognition.load_image_file(img_path)
+                encodings.append(face_recognition.face_encodings(image, known_face_locations=locations)[0])
+                names.append(person_name)
+                logger.debug(f"Loaded: {person_name}/{img_name} (quality {score:.2f})")
+            except Exception as e:
+                logger.error(f"Error loading {img_name}: {e}")
+        if len(candidates) > max_images_per_person:
+            logger.info(f"{person_name}: kept {max_images_per_person} best of {len(candidates)} photos.")
+
+    return encodings, names
+
+
+def read_meta(path):
+    """A gallery directory's meta.json, or None if missing or unreadable"""
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def prune_galleries(gallery_root, keep, stale_after=STALE_BUILD_SECONDS):
+    """Delete galleries of older datasets built with the same settings as `keep`
+
+    Galleries with another dtype, quantization or photo limit belong to
+    processes configured differently and are left alone. Temp directories
+    of builds that died before publishing are removed once stale.
+    """
+    if not os.path.isdir(gallery_root):
+        return
+    keep_path = os.path.join(gallery_root, keep)
+    kept = read_meta(keep_path)
+    if kept is None:
+        return
+    settings = (kept['dtype'], kept.get('quantization', 'none'), kept.get('max_images_per_person'))
+    kept_mtime = os.path.getmtime(os.path.join(keep_path, 'meta.json'))
+    now = time.time()
+    for entry in os.listdir(gallery_root):
+        path = os.path.join(gallery_root, entry)
+        if entry == keep or not os.path.isdir(path):
+            continue
+        if entry.startswith('.'):
+            try:
+                if now - os.path.getmtime(path) > stale_after:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass  # Published or removed meanwhile
+            continue
+        meta = read_meta(path)
+        if meta is None:
+            continue
+        # Galleries written before the photo limit was recorded count as the same limit
+        if (meta['dtype'], meta.get('quantization', 'none'), meta.get('max_images_per_person', settings[2])) != settings:
+            continue
+        # Another process may have just published a newer dataset: only drop older ones
+        if os.path.getmtime(os.path.join(path, 'meta.json')) <= kept_mtime:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+@contextmanager
+def build_lock(gallery_root=GALLERY_DIR):
+    """Hold an exclusive lock while building; yields False if another process holds it"""
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(gallery_root, exist_ok=True)
+    with open(os.path.join(gallery_root, '.build.lock'), 'w') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load_gallery(dataset_dir=DATASET_DIR, gallery_root=GALLERY_DIR, dtype=GALLERY_DTYPE,
+                 max_images_per_person=MAX_IMAGES_PER_PERSON, rebuild=False, quantization=GALLERY_QUANTIZATION):
+    """Open the gallery for the current dataset, building it first if needed"""
+    fingerprint = dataset_fingerprint(dataset_dir, max_images_per_person, dtype, quantization)
+    path = os.path.join(gallery_root, fingerprint)
+    if rebuild and os.path.isdir(path):
+        shutil.rmtree(path)
+    if not os.path.isdir(path):
+        logger.info("Dataset changed or no gallery found, encoding faces...")
+        encodings, names = encode_dataset(dataset_dir, max_images_per_person)
+        path = write_gallery(gallery_root, fingerprint, encodings, names, dtype, quantization, max_images_per_person)
+        prune_galleries(gallery_root, keep=fingerprint)
+    gallery = open_gallery(path)
+    logger.info(f"Gallery loaded: {len(gallery)} encodings of {len(gallery.names)} people "
+                f"({gallery.encodings.dtype}, {gallery.nbytes() / 1024:.0f} KB, memory-mapped, "
+                f"quantization: {quantization})")
+    return gallery
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Build or inspect the face gallery')
+    parser.add_argument('command', choices=['build', 'info'])
+    parser.add_argument('--dtype', choices=SUPPORTED_DTYPES, default=GALLERY_DTYPE)
+    parser.add_argument('--quantize', choices=QUANTIZATIONS, default=GALLERY_QUANTIZATION,
+                        help='Also store a compact copy for a two-stage search')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if the dataset is unchanged')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        # Every web worker may ask for a build when dataset/ changes; one is enough
+        with build_lock() as acquired:
+            if not acquired:
+                logger.info("Another gallery build is already running")
+                return 0
+            load_gallery(dtype=args.dtype, rebuild=args.force, quantization=args.quantize)
+        return 0
+
+    fingerprint = dataset_fingerprint(dtype=args.dtype, quantization=args.quantize)
+    path = os.path.join(GALLERY_DIR, fingerprint)
+    if not os.path.isdir(path):
+        print(f"No up-to-date {args.dtype} gallery for the current dataset (fingerprint {fingerprint}).")
+        return 1
+    gallery = open_gallery(path)
+    print(f"Gallery: {path}")
+    print(f"  Encodings: {len(gallery)} x {gallery.encodings.shape[1]} {gallery.encodings.dtype}")
+    print(f"  Size:      {gallery.nbytes() / 1024:.1f} KB")
+    if gallery.codes is not None:
+        print(f"  Quantized: {args.quantize}, scanned {gallery.scan_nbytes() / 1024:.1f} KB per query, "
+              f"re-ranking top {gallery.rerank_candidates}")
+    for label, name in enumerate(gallery.names):
+        print(f"  {name:20} {int(np.count_nonzero(np.asarray(gallery.labels) == label)):4d} encodings")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,46 +1,56 @@
+"""
+Desktop App for Face Attendance System
+
+Teachers sign in against the same users table as the web dashboard and
+browse the same attendance records. "Start Camera" runs recognition on a
+background thread inside this process, so the gallery is loaded once and
+the window stays responsive:
+- recognition runs at most GUI_RECOGNITION_FPS; frames in between are
+  grabbed from the driver but never decoded
+- only the newest annotated frame is kept, and Tk picks it up
+  GUI_PREVIEW_FPS times a second into a single reused PhotoImage
+- the attendance table holds one page (GUI_PAGE_SIZE rows) at a time,
+  paged by (date, time, id) so later pages cost the same as the first
+
+OpenCV, face_recognition and the export code are imported on first use,
+so the login window opens without loading them.
+"""
+
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
 import os
 import csv
 import subprocess
 import sys
+import time
 import logging
 import re
-
-# Try to import bcrypt, fallback to hashlib if not available
-try:
-    import bcrypt
-    BCRYPT_AVAILABLE = True
-except ImportError:
-    import hashlib
-    BCRYPT_AVAILABLE = False
+import threading
+from contextlib import contextmanager
+from datetime import date
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from models import db, User, Attendance
+from passwords import hash_password, hash_rounds, needs_rehash, verify_password
+from database import create_db_app, upgrade_schema
 
 # Configuration
 BG_IMAGE = 'gui_page.jpeg'
 USER_ICON = 'user.png'
 LOCK_ICON = 'lock.png'
-CSV_FILE = 'attendance.csv'
-CREDENTIALS_FILE = 'teacher_credentials.csv'
+CREDENTIALS_FILE = 'teacher_credentials.csv'  # Login store of the old GUI, imported once
+GUI_RECOGNITION_FPS = float(os.getenv('GUI_RECOGNITION_FPS', 10))
+GUI_PREVIEW_FPS = float(os.getenv('GUI_PREVIEW_FPS', 15))
+GUI_PAGE_SIZE = int(os.getenv('GUI_PAGE_SIZE', 50))
+PREVIEW_SIZE = (640, 480)  # Box the camera preview is fitted into
+TABLE_REFRESH_MS = 5000  # Reload the first page this often to show new marks
+CLOSE_TIMEOUT = 30  # Seconds to wait on exit for the recognition thread (it may be building the gallery)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def hash_password(password):
-    """Hash password using bcrypt or fallback to SHA256"""
-    if BCRYPT_AVAILABLE:
-        return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
-    else:
-        return hashlib.sha256(password.encode()).hexdigest()
-
-def verify_password(password, hashed):
-    """Verify password against hash"""
-    if BCRYPT_AVAILABLE:
-        return bcrypt.checkpw(password.encode(), hashed.encode())
-    else:
-        return hashlib.sha256(password.encode()).hexdigest() == hashed
-
 def validate_input(username, password):
     """Validate username and password input"""
     if not username or not password:
@@ -58,50 +68,87 @@ def validate_input(username, password):
         return False
     return True
 
-def register_teacher(username, password):
-    try:
-        if not validate_input(username, password):
-            return False
-            
-        if not os.path.exists(CREDENTIALS_FILE):
-            with open(CREDENTIALS_FILE, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(['Username', 'PasswordHash'])
-
-        with open(CREDENTIALS_FILE, 'r') as f:
-            reader = csv.reader(f)
-            next(reader)  # Skip header
-            for row in reader:
-                if len(row) > 0 and row[0] == username:
-                    messagebox.showerror("Error", "Username already exists.")
-                    return False
-
-        hashed_pwd = hash_password(password)
-        with open(CREDENTIALS_FILE, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([username, hashed_pwd])
-        
-        logger.info(f"Teacher registered: {username}")
-        return True
-    except Exception as e:
-        logger.error(f"Registration error: {e}")
-        messagebox.showerror("Error", f"Registration failed: {e}")
-        return False
-
-def verify_login(username, password):
+def init_database(app):
+    """Create missing tables and bring over the old GUI's teachers; users are shared with the web app"""
+    with app.app_context():
+        try:
+            db.create_all()
+            upgrade_schema(db.engine)
+        except (OperationalError, ProgrammingError) as e:
+            # The web app created or upgraded the tables at the same moment
+            logger.debug(f"Concurrent schema creation: {e}")
+        try:
+            import_legacy_credentials()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Could not import {CREDENTIALS_FILE}: {e}")
+
+def import_legacy_credentials(path=CREDENTIALS_FILE):
+    """Add teachers registered through the old GUI to the users table, once
+
+    The CSV already holds bcrypt hashes, which are copied as they are. The
+    file is then renamed to <name>.imported so accounts deleted later don't
+    come back. Returns the number of users created.
+    """
+    if not os.path.exists(path):
+        return 0
+    created = 0
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Skip header
+        for row in reader:
+            if len(row) < 2 or not row[0].strip():
+                continue
+            username, password_hash = row[0].strip(), row[1].strip()
+            if hash_rounds(password_hash) is None:
+                # SHA-256 fallback hashes of the old GUI can't be verified any more
+                logger.warning(f"Not importing {username}: password not stored with bcrypt, please register again")
+                continue
+            if User.query.filter_by(username=username).first():
+                continue
+            db.session.add(User(username=username, password_hash=password_hash, role='teacher'))
+            try:
+                db.session.commit()
+                created += 1
+            except IntegrityError:
+                db.session.rollback()  # Imported by another process at the same moment
+    os.replace(path, f"{path}.imported")
+    logger.info(f"Imported {created} teachers from {path} (renamed to {path}.imported)")
+    return created
+
+@contextmanager
+def short_session():
+    """Session for one UI action
+
+    The Tk thread lives for the whole run; ending the transaction after each
+    action keeps it from holding an old read snapshot open between clicks.
+    """
     try:
-        if not os.path.exists(CREDENTIALS_FILE):
-            return False
-        with open(CREDENTIALS_FILE, 'r') as f:
-            reader = csv.reader(f)
-            next(reader)  # Skip header
-            for row in reader:
-                if len(row) >= 2 and row[0] == username:
-                    return verify_password(password, row[1])
-        return False
-    except Exception as e:
-        logger.error(f"Login verification error: {e}")
-        return False
+        yield db.session
+    finally:
+        db.session.remove()
+
+def check_credentials(password, password_hash):
+    """Verify a password (slow: bcrypt); returns (valid, upgraded hash or None)"""
+    if not verify_password(password, password_hash):
+        return False, None
+    return True, hash_password(password) if needs_rehash(password_hash) else None
+
+def fetch_attendance_page(after=None, name=None, day=None, page_size=GUI_PAGE_SIZE):
+    """One page of attendance rows, newest first, starting after the (date, time, id) key `after`
+
+    Returns (rows, has_more).
+    """
+    query = select(Attendance.id, Attendance.name, Attendance.date, Attendance.time, Attendance.confidence)
+    if name:
+        query = query.where(Attendance.name == name)
+    if day:
+        query = query.where(Attendance.date == day)
+    if after:
+        query = query.where(tuple_(Attendance.date, Attendance.time, Attendance.id) < tuple_(*after))
+    query = query.order_by(Attendance.date.desc(), Attendance.time.desc(), Attendance.id.desc())
+    rows = db.session.execute(query.limit(page_size + 1)).all()
+    return rows[:page_size], len(rows) > page_size
 
 def open_file_platform(filepath):
     """Open file using platform-specific command"""
@@ -117,18 +164,131 @@ def open_file_platform(filepath):
         messagebox.showerror("Error", f"Failed to open file: {e}")
 
 
+class RecognitionThread(threading.Thread):
+    """Camera + recognition loop off the Tk thread, keeping only the newest preview frame"""
+
+    def __init__(self, fps=GUI_RECOGNITION_FPS, preview_size=PREVIEW_SIZE):
+        super().__init__(name='gui-recognition', daemon=True)
+        self.interval = 1 / fps if fps > 0 else 0
+        self.preview_size = preview_size
+        self.status = "Loading face encodings..."
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._image = None
+        self._sequence = 0
+
+    def stop(self):
+        self._stop_event.set()
+
+    def latest(self, seen=0):
+        """(sequence, image) of the newest preview frame; image is None if nothing newer than `seen`"""
+        with self._lock:
+            if self._sequence == seen:
+                return seen, None
+            return self._sequence, self._image
+
+    def run(self):
+        try:
+            self._run()
+        except Exception as e:
+            logger.error(f"Camera error: {e}")
+            self.status = f"Camera error: {e}"
+
+    def _run(self):
+        # Heavy imports stay out of the login window's startup
+        import cv2
+        import face_attendance
+        from preprocessing import FRAME_SCALE, FramePreprocessor
+
+        face_attendance.load_known_faces()
+        face_attendance.refresh_session()
+        if self._stop_event.is_set():
+            self.status = "Camera stopped"
+            return
+
+        cap = cv2.VideoCapture(0)
+        try:
+            if not cap.isOpened():
+                self.status = "Failed to open camera. Check if webcam is connected."
+                logger.error(self.status)
+                return
+            self.status = f"Camera running ({len(face_attendance.gallery)} known faces)"
+            logger.info("Camera started in the desktop app.")
+            preprocessor = FramePreprocessor(FRAME_SCALE)
+            next_frame = 0.0
+            last_stats = last_session_check = time.monotonic()
+            low_quality = 0
+
+            while not self._stop_event.is_set():
+                now = time.monotonic()
+                if now < next_frame:
+                    # Throttled: take the frame off the driver's queue without decoding it
+                    if not cap.grab():
+                        self.status = "Failed to read from camera."
+                        break
+                    self.frames_skipped += 1
+                    continue
+                next_frame = now + self.interval
+
+                # Frame buffers are reused: the preview gets its own resized copy
+                ret, frame = preprocessor.read(cap)
+                if not ret:
+                    self.status = "Failed to read from camera."
+                    logger.error(self.status)
+                    break
+
+                if now - last_session_check > face_attendance.SESSION_REFRESH:
+                    face_attendance.refresh_session()
+                    last_session_check = now
+
+                low_quality += face_attendance.process_frame(frame, preprocessor)
+                self.frames_processed += 1
+                self._publish(cv2, frame)
+                # The web dashboard's stream keeps working while the desktop app owns the camera
+                if face_attendance.preview is not None and face_attendance.preview.due():
+                    with face_attendance.stage_timer.stage('preview'):
+                        face_attendance.preview.publish(frame)
+
+                if now - last_stats > face_attendance.STATS_INTERVAL:
+                    face_attendance.log_stats(low_quality)
+                    logger.info(f"Desktop preview: {self.frames_processed} frames recognized, "
+                                f"{self.frames_skipped} skipped by throttling")
+                    last_stats = now
+            else:
+                self.status = "Camera stopped"
+        finally:
+            cap.release()
+            if face_attendance.preview is not None:
+                face_attendance.preview.close()  # Lets a camera worker publish the stream
+            logger.info("Camera released.")
+
+    def _publish(self, cv2, frame):
+        height, width = frame.shape[:2]
+        scale = min(self.preview_size[0] / width, self.preview_size[1] / height)
+        size = (int(width * scale), int(height * scale))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        image = Image.fromarray(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+        with self._lock:
+            self._image = image
+            self._sequence += 1
+
+
 class FaceTrackApp:
-    def __init__(self, root):
+    def __init__(self, root, db_app):
         self.root = root
+        self.db_app = db_app
         self.root.title("FaceTrack - Teacher Login")
-        self.root.geometry("800x500")
-        self.root.resizable(False, False)
+        self.jobs = {}
+        self.recognizer = None
+        self.closing = False
 
         # Load images safely with fallback colors
         self.bg_img = None
         self.user_icon = None
         self.lock_icon = None
-        
+
         try:
             if os.path.exists(BG_IMAGE):
                 self.bg_img = ImageTk.PhotoImage(Image.open(BG_IMAGE).resize((800, 500)))
@@ -140,10 +300,56 @@ class FaceTrackApp:
             logger.warning(f"Could not load images: {e}")
             messagebox.showwarning("Warning", f"Some images could not be loaded. Using default interface.\n{e}")
 
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
         self.create_login_screen()
 
+    # Helpers -------------------------------------------------------------
+
+    def schedule(self, key, delay_ms, callback):
+        """root.after() that replaces any pending call under the same key"""
+        self.cancel(key)
+        self.jobs[key] = self.root.after(delay_ms, callback)
+
+    def cancel(self, key):
+        job = self.jobs.pop(key, None)
+        if job is not None:
+            self.root.after_cancel(job)
+
+    def run_in_background(self, work, done):
+        """Run work() on a thread and done(result, error) back on the Tk thread"""
+        outcome = {}
+
+        def target():
+            try:
+                outcome['result'] = work()
+            except Exception as e:
+                outcome['error'] = e
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+
+        def check():
+            if thread.is_alive():
+                self.root.after(50, check)
+            else:
+                done(outcome.get('result'), outcome.get('error'))
+
+        self.root.after(50, check)
+
+    def clear_screen(self):
+        for key in list(self.jobs):
+            self.cancel(key)
+        for widget in self.root.winfo_children():
+            widget.destroy()
+
+    # Login ---------------------------------------------------------------
+
     def create_login_screen(self):
+        self.stop_camera()
         self.clear_screen()
+        self.root.title("FaceTrack - Teacher Login")
+        self.root.geometry("800x500")
+        self.root.resizable(False, False)
 
         # Background image or color fallback
         if self.bg_img:
@@ -160,7 +366,7 @@ class FaceTrackApp:
             tk.Label(self.root, image=self.user_icon, bg="white").place(x=150, y=160)
         else:
             tk.Label(self.root, text="👤", font=("Helvetica", 16), bg="white").place(x=155, y=160)
-        
+
         self.username_entry = tk.Entry(self.root, font=("Arial", 14))
         self.username_entry.place(x=190, y=160, width=250)
 
@@ -169,74 +375,357 @@ class FaceTrackApp:
             tk.Label(self.root, image=self.lock_icon, bg="white").place(x=150, y=210)
         else:
             tk.Label(self.root, text="🔒", font=("Helvetica", 16), bg="white").place(x=155, y=210)
-        
+
         self.password_entry = tk.Entry(self.root, show='*', font=("Arial", 14))
         self.password_entry.place(x=190, y=210, width=250)
+        self.password_entry.bind('<Return>', lambda event: self.login())
 
-        tk.Button(self.root, text="Login", command=self.login, font=("Arial", 12), bg="#4CAF50", fg="white").place(x=190, y=260, width=100)
-        tk.Button(self.root, text="Register", command=self.register, font=("Arial", 12), bg="#2196F3", fg="white").place(x=340, y=260, width=100)
-
-    def create_dashboard(self, username):
-        self.clear_screen()
-
-        if self.bg_img:
-            bg_label = tk.Label(self.root, image=self.bg_img)
-            bg_label.place(x=0, y=0, relwidth=1, relheight=1)
-        else:
-            bg_label = tk.Label(self.root, bg="#f0f0f0")
-            bg_label.place(x=0, y=0, relwidth=1, relheight=1)
-
-        tk.Label(self.root, text=f"Welcome, {username}", font=("Helvetica", 20, "bold"), bg="white", fg="black").pack(pady=20)
+        self.login_button = tk.Button(self.root, text="Login", command=self.login, font=("Arial", 12), bg="#4CAF50", fg="white")
+        self.login_button.place(x=190, y=260, width=100)
+        self.register_button = tk.Button(self.root, text="Register", command=self.register, font=("Arial", 12), bg="#2196F3", fg="white")
+        self.register_button.place(x=340, y=260, width=100)
 
-        tk.Button(self.root, text="📷 Open Camera", command=self.open_camera, font=("Arial", 14), bg="#4CAF50", fg="white").pack(pady=10)
-        tk.Button(self.root, text="📁 Open Attendance CSV", command=self.open_csv, font=("Arial", 14), bg="#2196F3", fg="white").pack(pady=10)
-        tk.Button(self.root, text="🚪 Logout", command=self.create_login_screen, font=("Arial", 14), bg="#f44336", fg="white").pack(pady=10)
-
-    def clear_screen(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
+    def set_login_busy(self, busy):
+        state = tk.DISABLED if busy else tk.NORMAL
+        self.login_button.config(state=state)
+        self.register_button.config(state=state)
 
     def login(self):
         username = self.username_entry.get().strip()
         password = self.password_entry.get()
+        if not username or not password:
+            messagebox.showerror("Login Failed", "Username and password required.")
+            return
 
-        if verify_login(username, password):
-            logger.info(f"Login successful: {username}")
-            self.create_dashboard(username)
-        else:
-            logger.warning(f"Failed login attempt for: {username}")
-            messagebox.showerror("Login Failed", "Incorrect username or password.")
+        try:
+            with short_session():
+                user = User.query.filter_by(username=username).first()
+                password_hash = user.password_hash if user and user.is_teacher() else None
+        except Exception as e:
+            logger.error(f"Login error: {e}")
+            messagebox.showerror("Error", f"Login error: {e}")
+            return
+        if password_hash is None:
+            self.login_failed(username)
+            return
+
+        # bcrypt takes a noticeable moment: keep the window painting meanwhile
+        self.set_login_busy(True)
+        self.run_in_background(
+            lambda: check_credentials(password, password_hash),
+            lambda result, error: self.finish_login(username, result, error)
+        )
+
+    def finish_login(self, username, result, error):
+        self.set_login_busy(False)
+        if error is not None:
+            logger.error(f"Login error: {error}")
+            messagebox.showerror("Error", f"Login error: {error}")
+            return
+        valid, upgraded_hash = result
+        if not valid:
+            self.login_failed(username)
+            return
+        if upgraded_hash:
+            # Upgrade hashes made with an older bcrypt cost
+            try:
+                with short_session() as session:
+                    User.query.filter_by(username=username).update({'password_hash': upgraded_hash})
+                    session.commit()
+                logger.info(f"Password rehashed for {username}")
+            except Exception as e:
+                logger.warning(f"Could not upgrade password hash for {username}: {e}")
+        logger.info(f"Login successful: {username}")
+        self.create_dashboard(username)
+
+    def login_failed(self, username):
+        logger.warning(f"Failed login attempt for: {username}")
+        messagebox.showerror("Login Failed", "Incorrect username or password.")
 
     def register(self):
         username = self.username_entry.get().strip()
         password = self.password_entry.get()
-
-        if register_teacher(username, password):
-            messagebox.showinfo("Registered", "Registration successful. You can now log in.")
-            self.username_entry.delete(0, tk.END)
-            self.password_entry.delete(0, tk.END)
-
-    def open_camera(self):
+        if not validate_input(username, password):
+            return
         try:
-            logger.info("Opening camera application...")
-            subprocess.Popen([sys.executable, "face_attendance.py"])
+            with short_session():
+                exists = User.query.filter_by(username=username).first() is not None
         except Exception as e:
-            logger.error(f"Failed to open camera: {e}")
-            messagebox.showerror("Error", f"Failed to open camera: {e}")
-
-    def open_csv(self):
+            logger.error(f"Registration error: {e}")
+            messagebox.showerror("Error", f"Registration failed: {e}")
+            return
+        if exists:
+            messagebox.showerror("Error", "Username already exists.")
+            return
+
+        self.set_login_busy(True)
+        self.run_in_background(
+            lambda: hash_password(password),
+            lambda password_hash, error: self.finish_register(username, password_hash, error)
+        )
+
+    def finish_register(self, username, password_hash, error):
+        self.set_login_busy(False)
         try:
-            if os.path.exists(CSV_FILE):
-                open_file_platform(CSV_FILE)
-                logger.info("Opened attendance CSV file")
-            else:
-                messagebox.showwarning("Warning", "Attendance CSV file not found.")
+            if error is not None:
+                raise error
+            with short_session() as session:
+                session.add(User(username=username, password_hash=password_hash, role='teacher'))
+                session.commit()
+        except IntegrityError:
+            messagebox.showerror("Error", "Username already exists.")
+            return
         except Exception as e:
-            logger.error(f"Error opening CSV: {e}")
-            messagebox.showerror("Error", f"Failed to open CSV: {e}")
+            logger.error(f"Registration error: {e}")
+            messagebox.showerror("Error", f"Registration failed: {e}")
+            return
+        logger.info(f"Teacher registered: {username}")
+        messagebox.showinfo("Registered", "Registration successful. You can now log in.")
+        self.username_entry.delete(0, tk.END)
+        self.password_entry.delete(0, tk.END)
 
+    # Dashboard -----------------------------------------------------------
 
-if __name__ == "__main__":
+    def create_dashboard(self, username):
+        self.clear_screen()
+        self.root.title(f"FaceTrack - {username}")
+        self.root.geometry("1240x640")
+        self.root.resizable(True, True)
+
+        header = tk.Frame(self.root)
+        header.pack(fill=tk.X, padx=10, pady=10)
+        tk.Label(header, text=f"Welcome, {username}", font=("Helvetica", 20, "bold")).pack(side=tk.LEFT)
+        tk.Button(header, text="🚪 Logout", command=self.create_login_screen, font=("Arial", 12), bg="#f44336", fg="white").pack(side=tk.RIGHT)
+
+        body = tk.Frame(self.root)
+        body.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        self.create_camera_panel(body)
+        self.create_attendance_panel(body)
+
+    def create_camera_panel(self, parent):
+        panel = tk.Frame(parent)
+        panel.pack(side=tk.LEFT, fill=tk.Y, padx=(0, 10))
+
+        box = tk.Frame(panel, width=PREVIEW_SIZE[0], height=PREVIEW_SIZE[1], bg="black")
+        box.pack_propagate(False)
+        box.pack()
+        self.preview_label = tk.Label(box, text="Camera off", fg="white", bg="black", font=("Arial", 14))
+        self.preview_label.pack(expand=True)
+        self.preview_photo = None
+        self.preview_sequence = 0
+
+        controls = tk.Frame(panel)
+        controls.pack(fill=tk.X, pady=8)
+        self.camera_button = tk.Button(controls, text="📷 Start Camera", command=self.toggle_camera, font=("Arial", 14), bg="#4CAF50", fg="white")
+        self.camera_button.pack(side=tk.LEFT)
+        self.camera_status = tk.StringVar(value="")
+        tk.Label(controls, textvariable=self.camera_status, anchor='w').pack(side=tk.LEFT, fill=tk.X, padx=10)
+        if self.recognizer is not None:
+            # Still shutting down from before a logout: Start stays disabled until it has exited
+            self.camera_button.config(state=tk.DISABLED, text="Stopping...")
+            self.poll_preview()
+
+    def create_attendance_panel(self, parent):
+        panel = tk.Frame(parent)
+        panel.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        filters = tk.Frame(panel)
+        filters.pack(fill=tk.X)
+        tk.Label(filters, text="Name").pack(side=tk.LEFT)
+        self.name_filter = tk.Entry(filters, width=14)
+        self.name_filter.pack(side=tk.LEFT, padx=(4, 10))
+        tk.Label(filters, text="Date (YYYY-MM-DD)").pack(side=tk.LEFT)
+        self.date_filter = tk.Entry(filters, width=12)
+        self.date_filter.pack(side=tk.LEFT, padx=4)
+        for entry in (self.name_filter, self.date_filter):
+            entry.bind('<Return>', lambda event: self.apply_filters())
+        tk.Button(filters, text="Filter", command=self.apply_filters).pack(side=tk.LEFT, padx=4)
+        self.export_button = tk.Button(filters, text="📁 Export CSV", command=self.export_csv, bg="#2196F3", fg="white")
+        self.export_button.pack(side=tk.RIGHT)
+
+        table = tk.Frame(panel)
+        table.pack(fill=tk.BOTH, expand=True, pady=6)
+        columns = ('name', 'date', 'time', 'confidence')
+        self.tree = ttk.Treeview(table, columns=columns, show='headings', selectmode='browse')
+        for column, width in zip(columns, (180, 100, 90, 90)):
+            self.tree.heading(column, text=column.title())
+            self.tree.column(column, width=width, anchor='w')
+        scrollbar = ttk.Scrollbar(table, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        pager = tk.Frame(panel)
+        pager.pack(fill=tk.X)
+        self.prev_button = tk.Button(pager, text="◀ Newer", command=self.previous_page)
+        self.prev_button.pack(side=tk.LEFT)
+        self.page_label = tk.Label(pager, text="")
+        self.page_label.pack(side=tk.LEFT, expand=True)
+        self.next_button = tk.Button(pager, text="Older ▶", command=self.next_page)
+        self.next_button.pack(side=tk.RIGHT)
+
+        # Start key of every page visited, so "Newer" goes back without counting rows
+        self.page_keys = [None]
+        self.filters = (None, None)
+        self.last_key = None
+        self.load_page()
+
+    # Attendance table ----------------------------------------------------
+
+    def apply_filters(self):
+        name = self.name_filter.get().strip() or None
+        day = self.date_filter.get().strip() or None
+        if day:
+            try:
+                day = date.fromisoformat(day)
+            except ValueError:
+                messagebox.showerror("Invalid Date", "Use the format YYYY-MM-DD.")
+                return
+        self.filters = (name, day)
+        self.page_keys = [None]
+        self.load_page()
+
+    def next_page(self):
+        if self.last_key is not None:
+            self.page_keys.append(self.last_key)
+            self.load_page()
+
+    def previous_page(self):
+        if len(self.page_keys) > 1:
+            self.page_keys.pop()
+            self.load_page()
+
+    def load_page(self):
+        """Replace the table contents with the current page"""
+        name, day = self.filters
+        try:
+            with short_session():
+                rows, has_more = fetch_attendance_page(self.page_keys[-1], name, day)
+        except Exception as e:
+            logger.error(f"Error loading attendance: {e}")
+            self.page_label.config(text=f"Error loading attendance: {e}")
+            return
+
+        self.tree.delete(*self.tree.get_children())
+        for row in rows:
+            self.tree.insert('', tk.END, iid=str(row.id), values=(
+                row.name, row.date.isoformat(), row.time.strftime('%H:%M:%S'), f"{row.confidence or 0:.2f}"
+            ))
+        self.last_key = (rows[-1].date, rows[-1].time, rows[-1].id) if rows and has_more else None
+
+        page = len(self.page_keys)
+        self.page_label.config(text=f"Page {page}" if rows else "No attendance records")
+        self.prev_button.config(state=tk.NORMAL if page > 1 else tk.DISABLED)
+        self.next_button.config(state=tk.NORMAL if self.last_key else tk.DISABLED)
+
+        # New marks land on the first page; later pages only move when paged
+        if page == 1:
+            self.schedule('table', TABLE_REFRESH_MS, self.load_page)
+        else:
+            self.cancel('table')
+
+    def export_csv(self):
+        name, day = self.filters
+        from export_attendance import export_filename
+        path = filedialog.asksaveasfilename(
+            defaultextension='.csv', initialfile=export_filename('csv', day, day, name),
+            filetypes=[("CSV files", "*.csv")]
+        )
+        if not path:
+            return
+
+        def work():
+            # Imported here: it pulls in the archive readers the table doesn't need
+            from export_attendance import stream_export
+            with self.db_app.app_context():
+                with open(path, 'w', encoding='utf-8', newline='') as f:
+                    for part in stream_export('csv', day, day, name):
+                        f.write(part)
+
+        def done(result, error):
+            if self.export_button.winfo_exists():
+                self.export_button.config(state=tk.NORMAL)
+            if error is not None:
+                logger.error(f"Export error: {error}")
+                messagebox.showerror("Error", f"Export failed: {error}")
+                return
+            logger.info(f"Exported attendance to {path}")
+            if messagebox.askyesno("Exported", f"Attendance saved to {path}.\nOpen it now?"):
+                open_file_platform(path)
+
+        self.export_button.config(state=tk.DISABLED)
+        self.run_in_background(work, done)
+
+    # Camera --------------------------------------------------------------
+
+    def toggle_camera(self):
+        if self.recognizer is not None:
+            self.recognizer.stop()
+            self.camera_button.config(state=tk.DISABLED, text="Stopping...")
+            return
+        self.recognizer = RecognitionThread()
+        self.recognizer.start()
+        self.camera_button.config(text="⏹ Stop Camera", bg="#f44336")
+        self.poll_preview()
+
+    def poll_preview(self):
+        """Show the newest recognized frame, if any arrived since the last poll"""
+        recognizer = self.recognizer
+        if recognizer is None:
+            return
+        self.preview_sequence, image = recognizer.latest(self.preview_sequence)
+        if image is not None:
+            if self.preview_photo is not None and (self.preview_photo.width(), self.preview_photo.height()) == image.size:
+                self.preview_photo.paste(image)
+            else:
+                self.preview_photo = ImageTk.PhotoImage(image)
+                self.preview_label.config(image=self.preview_photo, text="")
+        self.camera_status.set(recognizer.status)
+
+        if recognizer.is_alive():
+            self.schedule('preview', int(1000 / GUI_PREVIEW_FPS), self.poll_preview)
+            return
+        # Thread finished: stopped by the user, or the camera failed
+        self.recognizer = None
+        self.camera_button.config(state=tk.NORMAL, text="📷 Start Camera", bg="#4CAF50")
+
+    def stop_camera(self):
+        """Ask the recognition thread to stop; the handle is kept until it has exited"""
+        if self.recognizer is not None:
+            self.recognizer.stop()
+
+    def close(self, deadline=None):
+        """Stop the camera, flush its outputs once the thread has exited, then quit"""
+        if deadline is None:
+            if self.closing:
+                return
+            self.closing = True
+            self.stop_camera()
+            self.root.withdraw()
+            deadline = time.monotonic() + CLOSE_TIMEOUT
+        if self.recognizer is not None and self.recognizer.is_alive():
+            if time.monotonic() < deadline:
+                self.root.after(100, lambda: self.close(deadline))
+                return
+            # Daemon thread: it ends with the process, but its outputs are left alone
+            logger.warning("Recognition thread did not stop in time; exiting without flushing its outputs")
+        else:
+            # Only if the camera pipeline was actually imported (it may have failed to load)
+            face_attendance = sys.modules.get('face_attendance')
+            if face_attendance is not None:
+                face_attendance.close_outputs()
+        self.root.destroy()
+
+
+def main():
+    db_app = create_db_app()
+    init_database(db_app)
+    # The Tk thread keeps one app context for its whole run
+    db_app.app_context().push()
     root = tk.Tk()
-    app = FaceTrackApp(root)
+    FaceTrackApp(root, db_app)
     root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
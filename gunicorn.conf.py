@@ -0,0 +1,26 @@
+"""
+Gunicorn configuration for Face Attendance System
+
+All settings can be overridden from the environment:
+    WEB_BIND     address to listen on (default 0.0.0.0:5000)
+    WEB_WORKERS  worker processes (default 2 x CPUs + 1, capped at 8)
+    WEB_THREADS  threads per worker (default 4)
+    WEB_TIMEOUT  seconds before a silent worker is restarted (default 60)
+"""
+
+import os
+import multiprocessing
+
+bind = os.getenv('WEB_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.getenv('WEB_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.getenv('WEB_TIMEOUT', 60))
+keepalive = 5
+
+# Create tables and seed users once in the master before forking workers
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('WEB_LOG_LEVEL', 'info')
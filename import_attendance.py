@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Bulk Attendance Import for Face Attendance System
+
+Loads historical attendance from CSV files such as the legacy
+attendance.csv (Name, Date, Time). The file is streamed row by row,
+malformed rows are skipped and reported, and valid rows are inserted in
+large batched transactions. Rows already present for the same person and
+day (unique_attendance_per_day) are skipped, so re-running an import is safe.
+
+Usage:
+    python import_attendance.py attendance.csv
+    python import_attendance.py legacy.csv --batch-size 10000 --rejects rejected.csv
+"""
+
+import csv
+import sys
+import time
+import argparse
+import logging
+from datetime import date, datetime
+from database import bulk_insert_attendance, create_db_app, upgrade_schema
+from models import db
+
+DEFAULT_BATCH_SIZE = 5000
+REQUIRED_COLUMNS = ('name', 'date', 'time')
+MAX_NAME_LENGTH = 120
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def parse_row(row, columns, today):
+    """Validate one CSV row, returning (values, None) or (None, error)"""
+    name = row[columns['name']].strip() if len(row) > columns['name'] else ''
+    raw_date = row[columns['date']].strip() if len(row) > columns['date'] else ''
+    raw_time = row[columns['time']].strip() if len(row) > columns['time'] else ''
+
+    if not name:
+        return None, "Missing name"
+    if len(name) > MAX_NAME_LENGTH:
+        return None, f"Name longer than {MAX_NAME_LENGTH} characters"
+    try:
+        day = date.fromisoformat(raw_date)
+    except ValueError:
+        return None, f"Invalid date: {raw_date!r}"
+    if day > today:
+        return None, f"Date in the future: {raw_date}"
+    try:
+        at = datetime.strptime(raw_time, '%H:%M:%S').time()
+    except ValueError:
+        try:
+            at = datetime.strptime(raw_time, '%H:%M').time()
+        except ValueError:
+            return None, f"Invalid time: {raw_time!r}"
+
+    confidence = 0.0
+    if 'confidence' in columns and len(row) > columns['confidence'] and row[columns['confidence']].strip():
+        try:
+            confidence = float(row[columns['confidence']])
+        except ValueError:
+            return None, f"Invalid confidence: {row[columns['confidence']]!r}"
+
+    return {'name': name, 'date': day, 'time': at, 'confidence': confidence}, None
+
+
+def read_header(reader):
+    """Map lower-cased column names to their index"""
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("CSV file is empty")
+    columns = {col.strip().lower(): i for i, col in enumerate(header)}
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f"CSV header is missing columns: {', '.join(missing)}")
+    return columns
+
+
+def import_csv(path, batch_size=DEFAULT_BATCH_SIZE, rejects_path=None):
+    """Stream a CSV file into the attendance table (must run inside an app context)
+
+    Returns a dict with counts of rows read, inserted, duplicates, blank and
+    rejected rows, plus elapsed seconds.
+    """
+    stats = {'read': 0, 'inserted': 0, 'duplicates': 0, 'blank': 0, 'rejected': 0}
+    today = date.today()
+    batch = []
+    rejects_file = rejects_writer = None
+
+    def flush():
+        inserted = bulk_insert_attendance(batch)
+        stats['inserted'] += inserted
+        stats['duplicates'] += len(batch) - inserted
+        batch.clear()
+
+    start = time.perf_counter()
+    try:
+        if rejects_path:
+            rejects_file = open(rejects_path, 'w', newline='')
+            rejects_writer = csv.writer(rejects_file)
+            rejects_writer.writerow(['Line', 'Error', 'Row'])
+
+        with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            columns = read_header(reader)
+            for row in reader:
+                if not any(cell.strip() for cell in row):
+                    stats['blank'] += 1
+                    continue
+                stats['read'] += 1
+                values, error = parse_row(row, columns, today)
+                if error:
+                    stats['rejected'] += 1
+                    logger.debug(f"Line {reader.line_num}: {error}")
+                    if rejects_writer:
+                        rejects_writer.writerow([reader.line_num, error, ','.join(row)])
+                    continue
+                batch.append(values)
+                if len(batch) >= batch_size:
+                    flush()
+            if batch:
+                flush()
+    finally:
+        if rejects_file:
+            rejects_file.close()
+
+    stats['elapsed'] = time.perf_counter() - start
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import attendance records from CSV')
+    parser.add_argument('csv_file', help='CSV with Name, Date (YYYY-MM-DD), Time (HH:MM[:SS]) columns')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per transaction')
+    parser.add_argument('--rejects', help='Write rejected rows and reasons to this CSV')
+    args = parser.parse_args()
+
+    app = create_db_app()
+
+    try:
+        with app.app_context():
+            # The web app may never have run against this database
+            db.create_all()
+            upgrade_schema(db.engine)
+            stats = import_csv(args.csv_file, args.batch_size, args.rejects)
+    except (OSError, ValueError) as e:
+        logger.error(f"Import failed: {e}")
+        return 1
+
+    elapsed = stats['elapsed']
+    rate = stats['read'] / elapsed if elapsed > 0 else 0
+    print("\n" + "="*70)
+    print("📥 ATTENDANCE IMPORT SUMMARY")
+    print("="*70)
+    print(f"  Rows read:        {stats['read']:10d}")
+    print(f"  Inserted:         {stats['inserted']:10d}")
+    print(f"  Duplicates:       {stats['duplicates']:10d}  (already marked that day)")
+    print(f"  Rejected:         {stats['rejected']:10d}" + (f"  (see {args.rejects})" if args.rejects and stats['rejected'] else ""))
+    print(f"  Blank lines:      {stats['blank']:10d}")
+    print(f"  Elapsed:          {elapsed:10.2f}s  ({rate:.0f} rows/sec)")
+    print("="*70 + "\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Blink-based Liveness Check for Face Attendance System
+
+A printed photo or a phone screen held up to the webcam matches as well as
+a real face. A real person blinks every few seconds, so a candidate is only
+accepted after a blink is seen: the eye aspect ratio (EAR) from the six
+eye landmarks drops below a threshold for a few frames and then recovers.
+
+The check is pure NumPy over landmark points; the caller computes the
+landmarks, and only for faces that already matched someone, so the extra
+cost is paid on a handful of frames per person rather than every frame.
+"""
+
+import time
+import numpy as np
+
+EAR_THRESHOLD = 0.21       # Eyes considered closed below this ratio
+MAX_BLINK_FRAMES = 8       # Longer "closures" are not blinks (e.g. a photo with closed eyes)
+TRACK_TIMEOUT = 3.0        # Seconds unseen before a person's track is reset
+VERIFIED_TTL = 300.0       # Seconds a passed check stays valid
+
+LIVE = 'live'
+PENDING = 'pending'
+
+
+def eye_aspect_ratio(eye):
+    """EAR of one eye given its six (x, y) landmarks in dlib order"""
+    p = np.asarray(eye, dtype=np.float64)
+    vertical = np.linalg.norm(p[1] - p[5]) + np.linalg.norm(p[2] - p[4])
+    horizontal = np.linalg.norm(p[0] - p[3])
+    if horizontal == 0:
+        return 0.0
+    return float(vertical / (2.0 * horizontal))
+
+
+class BlinkLivenessDetector:
+    """Track the EAR of each matched person and pass them after a blink"""
+
+    def __init__(self, ear_threshold=EAR_THRESHOLD, max_blink_frames=MAX_BLINK_FRAMES,
+                 track_timeout=TRACK_TIMEOUT, verified_ttl=VERIFIED_TTL):
+        self.ear_threshold = ear_threshold
+        self.max_blink_frames = max_blink_frames
+        self.track_timeout = track_timeout
+        self.verified_ttl = verified_ttl
+        self._tracks = {}    # name -> {'closed_frames', 'last_seen'}
+        self._verified = {}  # name -> verified_until
+
+    def is_verified(self, name, now=None):
+        """Check if a person passed recently, without doing any work"""
+        now = time.monotonic() if now is None else now
+        return self._verified.get(name, 0) > now
+
+    def update(self, name, landmarks, now=None):
+        """Feed one frame of landmarks for a matched person
+
+        landmarks is a face_recognition.face_landmarks() dict (needs
+        'left_eye' and 'right_eye'), or None if they couldn't be found.
+        Returns LIVE once a blink has been observed, otherwise PENDING.
+        """
+        now = time.monotonic() if now is None else now
+        if self.is_verified(name, now):
+            return LIVE
+
+        track = self._tracks.get(name)
+        if track is None or now - track['last_seen'] > self.track_timeout:
+            track = {'closed_frames': 0, 'last_seen': now}
+            self._tracks[name] = track
+        track['last_seen'] = now
+
+        if not landmarks or 'left_eye' not in landmarks or 'right_eye' not in landmarks:
+            return PENDING
+
+        ear = (eye_aspect_ratio(landmarks['left_eye']) + eye_aspect_ratio(landmarks['right_eye'])) / 2.0
+        if ear < self.ear_threshold:
+            track['closed_frames'] += 1
+            return PENDING
+
+        blinked = 0 < track['closed_frames'] <= self.max_blink_frames
+        track['closed_frames'] = 0
+        if blinked:
+            self._verified[name] = now + self.verified_ttl
+            self._tracks.pop(name, None)
+            return LIVE
+        return PENDING
+
+    def prune(self, now=None):
+        """Drop stale tracks and expired verifications"""
+        now = time.monotonic() if now is None else now
+        self._tracks = {n: t for n, t in self._tracks.items() if now - t['last_seen'] <= self.track_timeout}
+        self._verified = {n: until for n, until in self._verified.items() if until > now}
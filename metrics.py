@@ -0,0 +1,71 @@
+"""
+Per-stage latency tracking for the recognition loop
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Accumulate call counts and latency per named pipeline stage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}  # name -> [count, total_seconds, max_seconds]
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block under the given stage name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._lock:
+            entry = self._stages.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def summary(self):
+        """Return {stage: {'count', 'total_ms', 'avg_ms', 'max_ms'}}"""
+        with self._lock:
+            stages = {name: list(entry) for name, entry in self._stages.items()}
+        return {
+            name: {
+                'count': count,
+                'total_ms': round(total * 1000, 2),
+                'avg_ms': round(total / count * 1000, 2) if count else 0.0,
+                'max_ms': round(worst * 1000, 2),
+            }
+            for name, (count, total, worst) in stages.items()
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def log_summary(self, logger, title="Stage latency"):
+        """Log one line per stage"""
+        summary = self.summary()
+        if not summary:
+            return
+        logger.info(f"{title}:")
+        for name, s in summary.items():
+            logger.info(f"  {name:12} calls: {s['count']:6d} | avg: {s['avg_ms']:8.2f} ms | max: {s['max_ms']:8.2f} ms")
+
+
+def summary_delta(before, after):
+    """Per-stage counts and latency between two StageTimer.summary() results"""
+    delta = {}
+    for name, stage in after.items():
+        previous = before.get(name, {'count': 0, 'total_ms': 0.0})
+        count = stage['count'] - previous['count']
+        if count <= 0:
+            continue
+        total_ms = stage['total_ms'] - previous['total_ms']
+        delta[name] = {'count': count, 'total_ms': round(total_ms, 2), 'avg_ms': round(total_ms / count, 2)}
+    return delta
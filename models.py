@@ -4,7 +4,8 @@ Database Models for Face Attendance System
 
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-import bcrypt
+from sqlalchemy import text
+from passwords import hash_password, needs_rehash, verify_password
 
 db = SQLAlchemy()
 
@@ -22,14 +23,15 @@ class User(db.Model):
     
     def set_password(self, password):
         """Hash and set password"""
-        self.password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
         """Verify password"""
-        try:
-            return bcrypt.checkpw(password.encode(), self.password_hash.encode())
-        except:
-            return False
+        return verify_password(password, self.password_hash)
+    
+    def password_needs_rehash(self):
+        """Check if the stored hash uses an outdated bcrypt cost"""
+        return needs_rehash(self.password_hash)
     
     def is_admin(self):
         """Check if user is admin"""
@@ -59,11 +61,16 @@ class Attendance(db.Model):
     confidence = db.Column(db.Float, default=0.0)  # Face recognition confidence score
     photo_path = db.Column(db.String(255))  # Path to captured photo
     marked_by = db.Column(db.Integer, db.ForeignKey('users.id'))  # Which teacher marked it
+    schedule_id = db.Column(db.Integer, db.ForeignKey('class_schedules.id'), index=True)  # None = daily attendance
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Composite unique constraint: one person per day
+    schedule = db.relationship('ClassSchedule', lazy=True)
+    
+    # One daily record per person, and one per person per class session (schedule + date)
     __table_args__ = (
-        db.UniqueConstraint('name', 'date', name='unique_attendance_per_day'),
+        db.Index('unique_attendance_per_day', 'name', 'date', unique=True,
+                 sqlite_where=text('schedule_id IS NULL'), postgresql_where=text('schedule_id IS NULL')),
+        db.Index('unique_attendance_per_session', 'name', 'date', 'schedule_id', unique=True),
     )
     
     def to_dict(self):
@@ -74,10 +81,140 @@ class Attendance(db.Model):
             'time': self.time.isoformat(),
             'confidence': round(self.confidence, 2),
             'photo_path': self.photo_path,
+            'schedule_id': self.schedule_id,
+            'created_at': self.created_at.isoformat()
+        }
+
+
+class AttendanceArchive(db.Model):
+    """One month of attendance moved out of the attendance table into a compressed file"""
+    __tablename__ = 'attendance_archives'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Date, unique=True, nullable=False, index=True)  # First day of the month
+    path = db.Column(db.String(255), nullable=False)  # Relative to the archive directory
+    row_count = db.Column(db.Integer, default=0, nullable=False)
+    size_bytes = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'month': self.month.strftime('%Y-%m'),
+            'path': self.path,
+            'row_count': self.row_count,
+            'size_bytes': self.size_bytes,
+            'updated_at': self.updated_at.isoformat()
+        }
+
+
+class AttendanceDailyRollup(db.Model):
+    """Archived attendance counted per day and hour (daily trend, weekly totals, peak times)"""
+    __tablename__ = 'attendance_daily_rollups'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False, index=True)
+    hour = db.Column(db.Integer, nullable=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('date', 'hour', name='unique_daily_rollup'),
+    )
+
+
+class AttendanceMonthlyRollup(db.Model):
+    """Archived attendance counted per person and month (attendance by person)"""
+    __tablename__ = 'attendance_monthly_rollups'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Date, nullable=False, index=True)
+    name = db.Column(db.String(120), nullable=False, index=True)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('month', 'name', name='unique_monthly_rollup'),
+    )
+
+
+class ClassSection(db.Model):
+    """A class/section and the students enrolled in it"""
+    __tablename__ = 'class_sections'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(40), unique=True, nullable=False, index=True)  # e.g. CS101-A
+    name = db.Column(db.String(120), nullable=False)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    enrollments = db.relationship('Enrollment', backref='section', lazy=True, cascade='all, delete-orphan')
+    schedules = db.relationship('ClassSchedule', backref='section', lazy=True, cascade='all, delete-orphan')
+    
+    def roster(self):
+        """Names of enrolled students (dataset folder names)"""
+        return sorted(e.student_name for e in self.enrollments)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'code': self.code,
+            'name': self.name,
+            'teacher_id': self.teacher_id,
+            'roster': self.roster(),
+            'schedules': [s.to_dict() for s in self.schedules],
             'created_at': self.created_at.isoformat()
         }
 
 
+class Enrollment(db.Model):
+    """A student on a class roster"""
+    __tablename__ = 'enrollments'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    section_id = db.Column(db.Integer, db.ForeignKey('class_sections.id'), nullable=False, index=True)
+    student_name = db.Column(db.String(120), nullable=False, index=True)  # Matches Attendance.name
+    
+    __table_args__ = (
+        db.UniqueConstraint('section_id', 'student_name', name='unique_enrollment'),
+    )
+
+
+class ClassSchedule(db.Model):
+    """A weekly meeting of a class; one meeting on one date is a session"""
+    __tablename__ = 'class_schedules'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    section_id = db.Column(db.Integer, db.ForeignKey('class_sections.id'), nullable=False, index=True)
+    weekday = db.Column(db.Integer, nullable=False)  # 0 = Monday
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+    room = db.Column(db.String(80), index=True)  # Camera location
+    
+    @classmethod
+    def current(cls, now=None, room=None, section_id=None):
+        """The meeting in progress at `now`, optionally limited to a room or class"""
+        now = now or datetime.now()
+        query = cls.query.filter(
+            cls.weekday == now.weekday(),
+            cls.start_time <= now.time(),
+            cls.end_time > now.time()
+        )
+        if room:
+            query = query.filter(cls.room == room)
+        if section_id:
+            query = query.filter(cls.section_id == section_id)
+        return query.order_by(cls.start_time.desc()).first()
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'section_id': self.section_id,
+            'weekday': self.weekday,
+            'start_time': self.start_time.strftime('%H:%M'),
+            'end_time': self.end_time.strftime('%H:%M'),
+            'room': self.room
+        }
+
+
 class Dataset(db.Model):
     """Face dataset metadata"""
     __tablename__ = 'datasets'
@@ -0,0 +1,143 @@
+"""
+Password Hashing for Face Attendance System
+
+bcrypt is deliberately slow, so a burst of logins can pin every web worker
+thread. Hashing and verification therefore run on a small bounded thread
+pool (bcrypt releases the GIL while it works): at most HASH_WORKERS hashes
+run at once per process, up to HASH_QUEUE_LIMIT more wait, and anything
+beyond that is rejected immediately with PasswordHashingBusy instead of
+piling up. The bcrypt cost is configurable and existing hashes are
+upgraded transparently on the next successful login.
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', min(os.cpu_count() or 2, 4)))
+HASH_QUEUE_LIMIT = int(os.getenv('PASSWORD_HASH_QUEUE_LIMIT', 32))
+HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 15))
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+
+def hash_password(password, rounds=None):
+    """Hash a password with bcrypt at the configured cost"""
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds or BCRYPT_ROUNDS)).decode()
+
+
+def verify_password(password, hashed):
+    """Verify a password against a bcrypt hash"""
+    try:
+        return bcrypt.checkpw(password.encode(), hashed.encode())
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+
+def hash_rounds(hashed):
+    """Extract the cost factor from a bcrypt hash ("$2b$12$..."), or None"""
+    try:
+        return int(hashed.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(hashed):
+    """Check if a hash was made with a different cost than BCRYPT_ROUNDS"""
+    rounds = hash_rounds(hashed)
+    return rounds is not None and rounds != BCRYPT_ROUNDS
+
+
+class HashingPool:
+    """Bounded thread pool for password hashing with queueing metrics"""
+
+    def __init__(self, workers=HASH_WORKERS, queue_limit=HASH_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'rejected': 0,
+            'running': 0,
+            'queued': 0,
+            'max_queued': 0,
+            'total_wait': 0.0,
+            'total_run': 0.0,
+        }
+
+    def _get_executor(self):
+        # Created lazily so importing models never starts threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='pwhash')
+            return self._executor
+
+    def run(self, fn, *args, timeout=HASH_TIMEOUT):
+        """Run fn(*args) on the pool and wait for the result"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise PasswordHashingBusy("Too many password operations in progress")
+
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self._stats['submitted'] += 1
+            self._stats['queued'] += 1
+            self._stats['max_queued'] = max(self._stats['max_queued'], self._stats['queued'])
+
+        def task():
+            started_at = time.perf_counter()
+            with self._lock:
+                self._stats['queued'] -= 1
+                self._stats['running'] += 1
+                self._stats['total_wait'] += started_at - submitted_at
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._stats['running'] -= 1
+                    self._stats['completed'] += 1
+                    self._stats['total_run'] += time.perf_counter() - started_at
+                self._slots.release()
+
+        try:
+            future = self._get_executor().submit(task)
+        except Exception:
+            with self._lock:
+                self._stats['queued'] -= 1
+            self._slots.release()
+            raise
+        return future.result(timeout=timeout)
+
+    def stats(self):
+        """Snapshot of queue depth and average wait/run times"""
+        with self._lock:
+            stats = dict(self._stats)
+        completed = stats['completed'] or 1
+        return {
+            'workers': self.workers,
+            'queue_limit': self.queue_limit,
+            'bcrypt_rounds': BCRYPT_ROUNDS,
+            'submitted': stats['submitted'],
+            'completed': stats['completed'],
+            'rejected': stats['rejected'],
+            'running': stats['running'],
+            'queued': stats['queued'],
+            'max_queued': stats['max_queued'],
+            'avg_wait_ms': round(stats['total_wait'] / completed * 1000, 2),
+            'avg_run_ms': round(stats['total_run'] / completed * 1000, 2),
+        }
+
+
+hashing_pool = HashingPool()
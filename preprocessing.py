@@ -0,0 +1,56 @@
+"""
+Frame Preprocessing for Face Attendance System
+
+Every camera frame is read, downscaled for detection and converted to RGB
+for face_recognition. Done naively that allocates three new images per
+frame (about 7 MB at 1080p), 30 times a second. FramePreprocessor keeps
+one buffer for each and has OpenCV write into them (`dst=`), so after the
+first frame the loop allocates nothing for preprocessing.
+
+The RGB buffer is C-contiguous uint8, which dlib accepts without making
+its own copy (a channel-reversed view like frame[:, :, ::-1] would be
+copied on every call).
+
+The returned arrays are overwritten by the next frame: anything that must
+outlive the frame (e.g. snapshot crops) has to be copied.
+"""
+
+import cv2
+import numpy as np
+
+FRAME_SCALE = 4  # Detection runs on a 1/4 size frame
+
+
+class FramePreprocessor:
+    """Camera read, downscale and BGR->RGB conversion into reused buffers"""
+
+    def __init__(self, scale=FRAME_SCALE):
+        self.scale = scale
+        self.frame = None      # Full resolution BGR, filled by read()
+        self.small = None      # Downscaled BGR
+        self.rgb_small = None  # Downscaled RGB, what face_recognition sees
+
+    def small_size(self, shape):
+        """(width, height) of the detection frame, rounded like cv2.resize with fx/fy"""
+        height, width = shape[:2]
+        return max(round(width / self.scale), 1), max(round(height / self.scale), 1)
+
+    def _ensure_buffers(self, shape):
+        width, height = self.small_size(shape)
+        if self.small is None or self.small.shape[:2] != (height, width):
+            self.small = np.empty((height, width, 3), dtype=np.uint8)
+            self.rgb_small = np.empty((height, width, 3), dtype=np.uint8)
+
+    def read(self, cap):
+        """Read the next frame from a cv2.VideoCapture into the reused frame buffer"""
+        ok, frame = cap.read(self.frame) if self.frame is not None else cap.read()
+        if ok:
+            self.frame = frame  # Same object after the first frame, unless the resolution changed
+        return ok, frame
+
+    def process(self, frame):
+        """Downscaled RGB copy of a BGR frame, written into the reused buffers"""
+        self._ensure_buffers(frame.shape)
+        cv2.resize(frame, (self.small.shape[1], self.small.shape[0]), dst=self.small)
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2RGB, dst=self.rgb_small)
+        return self.rgb_small
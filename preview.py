@@ -0,0 +1,333 @@
+"""
+Live Camera Preview for Face Attendance System
+
+The camera worker and the web server are separate processes, so the
+annotated frames are shared through a small memory-mapped ring buffer
+(data/preview/stream.bin):
+
+- PreviewPublisher (camera side) downscales an annotated frame to
+  PREVIEW_MAX_SIDE and JPEG-encodes it at most PREVIEW_FPS times a second,
+  independent of how fast recognition runs, and writes it to the next slot.
+- PreviewHub (web side, one per process) has a single thread that copies
+  each new frame out of the ring, wraps it in its multipart header once and
+  wakes every /api/camera/stream viewer.
+
+Each frame is encoded once no matter how many people watch; a viewer only
+costs a socket write. Readers check the slot sequence before and after
+copying, so a slot overwritten mid-read is skipped, never served torn.
+The publisher holds an exclusive lock on the ring file: a second camera
+process (e.g. the desktop app next to a headless worker) skips publishing
+instead of overwriting the first one's frames.
+
+OpenCV is imported only by the publisher, so the web server can serve the
+stream without loading it.
+"""
+
+import os
+import mmap
+import time
+import struct
+import logging
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: publishers are not serialized
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PREVIEW_PATH = os.getenv('PREVIEW_PATH', os.path.join(BASE_DIR, 'data', 'preview', 'stream.bin'))
+PREVIEW_ENABLED = os.getenv('PREVIEW_STREAM', '1') == '1'
+PREVIEW_FPS = float(os.getenv('PREVIEW_FPS', 5))
+PREVIEW_MAX_SIDE = int(os.getenv('PREVIEW_MAX_SIDE', 640))           # Pixels, longest side
+PREVIEW_QUALITY = int(os.getenv('PREVIEW_QUALITY', 70))
+PREVIEW_SLOTS = 4
+PREVIEW_SLOT_BYTES = int(os.getenv('PREVIEW_SLOT_BYTES', 256 * 1024))  # Larger frames are dropped
+PREVIEW_STALE = 5.0  # Seconds without a frame before the camera counts as stopped
+PREVIEW_MAX_VIEWERS = int(os.getenv('PREVIEW_MAX_VIEWERS', 2))       # Per web process; each holds a thread
+PREVIEW_MAX_STREAM = int(os.getenv('PREVIEW_MAX_STREAM', 600))       # Seconds before a viewer must reconnect
+BOUNDARY = 'frame'
+
+# Header: magic, version, slots, slot size, latest sequence number
+HEADER = struct.Struct('<4sIIIQ')
+# Slot: sequence number, publish time (epoch seconds), JPEG length
+SLOT_HEADER = struct.Struct('<QdI')
+MAGIC = b'FAPV'
+VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+def ring_size(slots=PREVIEW_SLOTS, slot_bytes=PREVIEW_SLOT_BYTES):
+    return HEADER.size + slots * (SLOT_HEADER.size + slot_bytes)
+
+
+def slot_offset(index, slot_bytes):
+    return HEADER.size + index * (SLOT_HEADER.size + slot_bytes)
+
+
+class PreviewPublisher:
+    """Encode annotated frames at a capped rate and publish them to the ring buffer"""
+
+    def __init__(self, path=PREVIEW_PATH, fps=PREVIEW_FPS, max_side=PREVIEW_MAX_SIDE,
+                 quality=PREVIEW_QUALITY, slots=PREVIEW_SLOTS, slot_bytes=PREVIEW_SLOT_BYTES):
+        self.path = path
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.max_side = max_side
+        self.quality = quality
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._map = None
+        self._fd = None  # Kept open while we hold the publisher lock
+        self._retry_at = 0.0
+        self._seq = 0
+        self._next_publish = 0.0
+        self._stats = {'published': 0, 'oversized': 0, 'bytes': 0, 'encode_ms': 0.0, 'blocked': 0}
+
+    def _open(self):
+        """Lock and map the ring file; False if another process is publishing"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        size = ring_size(self.slots, self.slot_bytes)
+        # Reuse the file in place so web processes that already mapped it keep seeing new frames
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                if not self._stats['blocked']:
+                    logger.warning(f"Another camera process is publishing the preview to {self.path}; "
+                                   "this one won't (retrying every few seconds)")
+                return False
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+        magic, version, slots, slot_bytes, seq = HEADER.unpack_from(self._map, 0)
+        if (magic, version, slots, slot_bytes) == (MAGIC, VERSION, self.slots, self.slot_bytes):
+            self._seq = seq  # Keep counting so readers see the restart as new frames
+        HEADER.pack_into(self._map, 0, MAGIC, VERSION, self.slots, self.slot_bytes, self._seq)
+        return True
+
+    def _acquire(self):
+        """Map the ring on first use; while another publisher holds it, retry every PREVIEW_STALE seconds"""
+        if self._map is not None:
+            return True
+        now = time.monotonic()
+        if now < self._retry_at:
+            return False
+        if self._open():
+            return True
+        self._retry_at = now + PREVIEW_STALE
+        return False
+
+    def due(self):
+        """True when the next preview frame should be published"""
+        return time.monotonic() >= self._next_publish
+
+    def publish(self, frame):
+        """Downscale, encode and publish one BGR frame if a preview frame is due"""
+        if not self.due():
+            return False
+        import cv2
+
+        self._next_publish = time.monotonic() + self.interval
+        if not self._acquire():
+            self._stats['blocked'] += 1
+            return False
+        start = time.perf_counter()
+        height, width = frame.shape[:2]
+        scale = self.max_side / max(height, width)
+        if scale < 1:
+            frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        ok, data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        self._stats['encode_ms'] += (time.perf_counter() - start) * 1000
+        if not ok:
+            return False
+        if len(data) > self.slot_bytes:
+            self._stats['oversized'] += 1
+            return False
+        self.write(data.tobytes())
+        return True
+
+    def write(self, jpeg):
+        """Write an encoded frame to the next slot, then advance the latest sequence"""
+        if not self._acquire():
+            self._stats['blocked'] += 1
+            return False
+        seq = self._seq + 1
+        offset = slot_offset(seq % self.slots, self.slot_bytes)
+        # Invalidate the slot first so a reader copying it notices the overwrite
+        SLOT_HEADER.pack_into(self._map, offset, 0, 0.0, 0)
+        self._map[offset + SLOT_HEADER.size:offset + SLOT_HEADER.size + len(jpeg)] = jpeg
+        SLOT_HEADER.pack_into(self._map, offset, seq, time.time(), len(jpeg))
+        HEADER.pack_into(self._map, 0, MAGIC, VERSION, self.slots, self.slot_bytes, seq)
+        self._seq = seq
+        self._stats['published'] += 1
+        self._stats['bytes'] += len(jpeg)
+        return True
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._fd is not None:
+            os.close(self._fd)  # Releases the publisher lock
+            self._fd = None
+
+    def stats(self):
+        published = self._stats['published'] or 1
+        return {
+            'published': self._stats['published'],
+            'oversized': self._stats['oversized'],
+            'blocked': self._stats['blocked'],
+            'avg_kb': round(self._stats['bytes'] / published / 1024, 1),
+            'avg_encode_ms': round(self._stats['encode_ms'] / published, 2),
+        }
+
+
+def read_latest(buffer):
+    """(seq, published_at, jpeg) of the newest complete frame in a ring buffer, or None"""
+    if len(buffer) < HEADER.size:
+        return None
+    magic, version, slots, slot_bytes, seq = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION or seq == 0 or len(buffer) < ring_size(slots, slot_bytes):
+        return None
+    offset = slot_offset(seq % slots, slot_bytes)
+    slot_seq, published_at, length = SLOT_HEADER.unpack_from(buffer, offset)
+    if slot_seq != seq or length > slot_bytes:
+        return None
+    jpeg = bytes(buffer[offset + SLOT_HEADER.size:offset + SLOT_HEADER.size + length])
+    if SLOT_HEADER.unpack_from(buffer, offset)[0] != seq:
+        return None  # Overwritten while copying
+    return seq, published_at, jpeg
+
+
+def frame_part(jpeg):
+    """One multipart/x-mixed-replace part, built once and sent to every viewer"""
+    header = (f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+              f"Content-Length: {len(jpeg)}\r\n\r\n").encode()
+    return header + jpeg + b"\r\n"
+
+
+class PreviewHub:
+    """Per-process fan-out of the newest preview frame to all stream viewers"""
+
+    def __init__(self, path=PREVIEW_PATH, fps=PREVIEW_FPS, max_viewers=PREVIEW_MAX_VIEWERS):
+        self.path = path
+        self.poll_interval = 1.0 / (2 * fps) if fps > 0 else 0.1
+        self.max_viewers = max_viewers
+        self._map = None
+        self._inode = None
+        self._condition = threading.Condition()
+        self._seq = 0
+        self._published_at = 0.0
+        self._part = None
+        self._viewers = 0
+        self._thread = None
+        self._stats = {'frames': 0, 'sent': 0, 'rejected': 0}
+
+    def _ensure_started(self):
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='preview-hub', daemon=True)
+                self._thread.start()
+
+    def _remap(self):
+        """Map the ring file, again if the camera recreated it"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        if self._map is None or stat.st_ino != self._inode or len(self._map) != stat.st_size:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            if stat.st_size < HEADER.size:
+                return None
+            with open(self.path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), stat.st_size, access=mmap.ACCESS_READ)
+            self._inode = stat.st_ino
+        return self._map
+
+    def poll(self):
+        """Pick up a new frame from the ring buffer, if the camera published one"""
+        buffer = self._remap()
+        latest = read_latest(buffer) if buffer is not None else None
+        if latest is None or latest[0] == self._seq:
+            return False
+        seq, published_at, jpeg = latest
+        part = frame_part(jpeg)
+        with self._condition:
+            self._seq, self._published_at, self._part = seq, published_at, part
+            self._stats['frames'] += 1
+            self._condition.notify_all()
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except (OSError, ValueError) as e:
+                logger.warning(f"Preview read failed: {e}")
+                self._map = None
+            time.sleep(self.poll_interval)
+
+    def live(self):
+        """True if the camera published a frame recently"""
+        self._ensure_started()
+        if not self._part:
+            self.poll()
+        with self._condition:
+            return self._part is not None and time.time() - self._published_at < PREVIEW_STALE
+
+    def acquire_viewer(self):
+        with self._condition:
+            if self._viewers >= self.max_viewers:
+                self._stats['rejected'] += 1
+                return False
+            self._viewers += 1
+            return True
+
+    def release_viewer(self):
+        with self._condition:
+            self._viewers -= 1
+
+    def frames(self, max_seconds=PREVIEW_MAX_STREAM):
+        """Yield multipart parts as new frames arrive; ends when the camera stops"""
+        self._ensure_started()
+        deadline = time.monotonic() + max_seconds
+        last_seq = 0
+        while time.monotonic() < deadline:
+            with self._condition:
+                if self._seq == last_seq:
+                    self._condition.wait(PREVIEW_STALE)
+                if self._seq == last_seq:
+                    return  # Camera stopped publishing
+                last_seq, part = self._seq, self._part
+                self._stats['sent'] += 1
+            yield part
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats['viewers'] = self._viewers
+            stats['live'] = self._part is not None and time.time() - self._published_at < PREVIEW_STALE
+        return stats
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    """Per-process hub, created after gunicorn forks its workers"""
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = PreviewHub()
+        return _hub
@@ -0,0 +1,273 @@
+"""
+On-demand Sampling Profiler for Face Attendance System
+
+When a kiosk slows down, start a profile on the live process instead of
+restarting it under a debugger. A background thread wakes every
+PROFILE_INTERVAL_MS, reads every thread's current Python stack with
+sys._current_frames() and counts identical stacks. Nothing is hooked into
+the profiled code, so overhead is one stack walk per thread per sample and
+the process runs normally in between.
+
+Each run writes two files to data/profiles/:
+- <label>-<pid>-<time>.folded: collapsed stacks ("thread;outer;...;inner count"),
+  ready for flamegraph.pl or speedscope
+- <label>-<pid>-<time>.json: sample counts, the hottest functions and the
+  per-stage latency (detect, encode, match, db_write, ...) recorded by the
+  process's StageTimer during the run
+
+Trigger a run:
+- camera worker: `kill -USR1 <pid>` (pid in data/profiles/camera.pid), or
+  POST /api/admin/profile {"target": "camera"} which does the same
+- web worker: POST /api/admin/profile {"target": "web"} profiles the worker
+  that receives the request
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+
+from metrics import summary_delta
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'data', 'profiles'))
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+PROFILE_SECONDS = float(os.getenv('PROFILE_SECONDS', 10))
+PROFILE_MAX_SECONDS = 300
+PROFILE_TOP_FUNCTIONS = 25
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is already running in this process"""
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def collapse(frame):
+    """Stack as 'outermost;...;innermost'"""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class SamplingProfiler:
+    """Periodically sample all thread stacks for a fixed duration"""
+
+    def __init__(self, label, stage_timer=None, interval_ms=PROFILE_INTERVAL_MS, output_dir=PROFILE_DIR):
+        self.label = label
+        self.stage_timer = stage_timer
+        self.interval = interval_ms / 1000
+        self.output_dir = output_dir
+        self._lock = threading.Lock()
+        self._thread = None
+        self.last_result = None
+
+    def running(self):
+        with self._lock:
+            return self._thread is not None
+
+    def start(self, seconds=PROFILE_SECONDS):
+        """Profile for `seconds` in the background; returns the output path prefix"""
+        seconds = min(max(float(seconds), 0.1), PROFILE_MAX_SECONDS)
+        with self._lock:
+            if self._thread is not None:
+                raise ProfilerBusy("A profile is already running")
+            prefix = os.path.join(self.output_dir, f"{self.label}-{os.getpid()}-{datetime.now():%Y%m%d-%H%M%S}")
+            self._thread = threading.Thread(target=self._run, args=(seconds, prefix), name='sampling-profiler', daemon=True)
+            self._thread.start()
+        logger.info(f"Profiling {self.label} for {seconds:.0f}s -> {prefix}.folded")
+        return prefix
+
+    def sample(self, seconds):
+        """Collect (stack counts, samples taken, elapsed seconds) for `seconds`"""
+        own = threading.get_ident()
+        names = {}
+        stacks = Counter()
+        samples = 0
+        start = time.perf_counter()
+        deadline = start + seconds
+        while time.perf_counter() < deadline:
+            frames = sys._current_frames()
+            if len(names) != len(frames):
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident != own:
+                    stacks[f"{names.get(ident, ident)};{collapse(frame)}"] += 1
+            del frames  # Don't keep other threads' frames alive between samples
+            samples += 1
+            time.sleep(self.interval)
+        return stacks, samples, time.perf_counter() - start
+
+    def _run(self, seconds, prefix):
+        try:
+            stages_before = self.stage_timer.summary() if self.stage_timer else {}
+            stacks, samples, elapsed = self.sample(seconds)
+            stages = summary_delta(stages_before, self.stage_timer.summary()) if self.stage_timer else {}
+            self.last_result = write_profile(prefix, stacks, samples, elapsed, stages, self.label)
+            logger.info(f"Profile written: {prefix}.folded ({samples} samples in {elapsed:.1f}s)")
+        except Exception as e:
+            logger.error(f"Profiling failed: {e}")
+        finally:
+            with self._lock:
+                self._thread = None
+
+
+def hottest_functions(stacks, top=PROFILE_TOP_FUNCTIONS):
+    """Functions by samples spent in them (self) and under them (total)"""
+    own, total = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')[1:]  # Drop the thread name
+        if not frames:
+            continue
+        own[frames[-1]] += count
+        for label in set(frames):
+            total[label] += count
+    return [{'function': label, 'self': count, 'total': total[label]} for label, count in own.most_common(top)]
+
+
+def write_profile(prefix, stacks, samples, elapsed, stages, label):
+    """Write the collapsed stacks and the JSON summary; returns the summary"""
+    os.makedirs(os.path.dirname(prefix), exist_ok=True)
+    with open(f"{prefix}.folded", 'w') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+    threads = Counter()
+    for stack, count in stacks.items():
+        threads[stack.split(';', 1)[0]] += count
+    summary = {
+        'label': label,
+        'pid': os.getpid(),
+        'started': datetime.fromtimestamp(time.time() - elapsed).isoformat(timespec='seconds'),
+        'seconds': round(elapsed, 2),
+        'samples': samples,
+        'sample_rate_hz': round(samples / elapsed, 1) if elapsed else 0.0,
+        'threads': dict(threads.most_common()),
+        'stages': stages,
+        'hottest': hottest_functions(stacks),
+        'folded': os.path.basename(f"{prefix}.folded"),
+    }
+    with open(f"{prefix}.json", 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+# Triggering across processes --------------------------------------------
+
+def pid_path(label):
+    return os.path.join(PROFILE_DIR, f"{label}.pid")
+
+
+def request_path(label):
+    return os.path.join(PROFILE_DIR, f"{label}.request")
+
+
+def start_requested(profiler):
+    """Start `profiler` for the duration in its request file (written by signal_profile)"""
+    seconds = PROFILE_SECONDS
+    try:
+        with open(request_path(profiler.label)) as f:
+            seconds = float(json.load(f).get('seconds', seconds))
+        os.remove(request_path(profiler.label))
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        profiler.start(seconds)
+    except ProfilerBusy:
+        logger.warning("Profile requested while one is already running; ignored")
+
+
+def install_signal_handler(profiler, signum=getattr(signal, 'SIGUSR1', None)):
+    """Start `profiler` on signal and publish this process's pid; False where unsupported
+
+    The handler only writes a byte to a pipe. A watcher thread reads it and
+    starts the profile, because taking the profiler's lock or logging inside
+    the handler deadlocks if the interrupted code was holding that lock.
+    """
+    if signum is None:
+        return False
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(write_fd, False)
+
+    def handle(received, frame):
+        try:
+            os.write(write_fd, b'\0')
+        except OSError:
+            pass  # Pipe full: a start is already pending
+
+    def watch():
+        while True:
+            os.read(read_fd, 64)  # Signals arriving together start one profile
+            start_requested(profiler)
+
+    threading.Thread(target=watch, name='profile-signal', daemon=True).start()
+    signal.signal(signum, handle)
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(pid_path(profiler.label), 'w') as f:
+        f.write(str(os.getpid()))
+    return True
+
+
+def remove_pid_file(label):
+    try:
+        os.remove(pid_path(label))
+    except OSError:
+        pass
+
+
+def signal_profile(label, seconds=PROFILE_SECONDS):
+    """Ask another process (by its pid file) to profile itself; returns its pid
+
+    Raises LookupError if the process isn't running and NotImplementedError
+    where signals aren't available (Windows).
+    """
+    if not hasattr(signal, 'SIGUSR1'):
+        raise NotImplementedError("Profiling another process needs SIGUSR1 (not available on this platform)")
+    try:
+        with open(pid_path(label)) as f:
+            pid = int(f.read().strip())
+        os.kill(pid, 0)
+    except (OSError, ValueError):
+        raise LookupError(f"No running {label} process")
+    with open(request_path(label), 'w') as f:
+        json.dump({'seconds': seconds}, f)
+    os.kill(pid, signal.SIGUSR1)
+    return pid
+
+
+def list_profiles(profile_dir=PROFILE_DIR):
+    """Finished profiles, newest first"""
+    if not os.path.isdir(profile_dir):
+        return []
+    profiles = []
+    for name in os.listdir(profile_dir):
+        if name.endswith(('.folded', '.json')):
+            stat = os.stat(os.path.join(profile_dir, name))
+            profiles.append({'name': name, 'size_bytes': stat.st_size,
+                             'modified': datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds')})
+    return sorted(profiles, key=lambda p: p['modified'], reverse=True)
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler(label='web', stage_timer=None):
+    """Per-process profiler for the web workers"""
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = SamplingProfiler(label, stage_timer=stage_timer)
+        return _profiler
@@ -0,0 +1,275 @@
+"""
+Recognition Service for Face Attendance System
+
+Kiosks and phones post face images to /api/recognize instead of running
+dlib themselves. Requests from every web thread go through one
+RecognitionBatcher per process: a worker thread waits for the first image,
+keeps collecting until RECOGNIZE_MAX_BATCH images are queued or
+RECOGNIZE_MAX_WAIT_MS has passed, then detects and encodes the whole batch
+and matches every face against the gallery with one matrix product.
+Only one thread touches dlib at a time, and the queue is bounded so
+overload is answered with "busy" instead of piling up.
+
+The batcher only ever opens galleries that are already built. When
+dataset/ changes, `gallery.py build` is started as a separate process
+(one at a time across workers) and the previous gallery keeps answering
+until the new one is published.
+
+face_recognition and the gallery are loaded on first use, so importing the
+web app stays cheap.
+"""
+
+import os
+import sys
+import time
+import queue
+import logging
+import threading
+import subprocess
+from concurrent.futures import Future
+import numpy as np
+
+from metrics import StageTimer
+
+CONFIDENCE_THRESHOLD = 0.6  # Same as face_attendance.py
+RECOGNIZE_MAX_BATCH = int(os.getenv('RECOGNIZE_MAX_BATCH', 16))         # Images per batch
+RECOGNIZE_MAX_WAIT_MS = float(os.getenv('RECOGNIZE_MAX_WAIT_MS', 10))   # Wait for more images after the first
+RECOGNIZE_QUEUE_LIMIT = int(os.getenv('RECOGNIZE_QUEUE_LIMIT', 64))     # Queued images before "busy"
+RECOGNIZE_TIMEOUT = float(os.getenv('RECOGNIZE_TIMEOUT', 30))
+RECOGNIZE_MAX_IMAGES = int(os.getenv('RECOGNIZE_MAX_IMAGES', 16))       # Per request
+RECOGNIZE_MAX_SIDE = int(os.getenv('RECOGNIZE_MAX_SIDE', 1024))         # Uploads are downscaled to this
+DETECTION_MODEL = os.getenv('RECOGNIZE_DETECTION_MODEL', 'hog')         # 'cnn' batches detection on GPU
+GALLERY_REFRESH = 60  # Seconds between checks for a changed dataset
+GALLERY_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gallery.py')
+
+logger = logging.getLogger(__name__)
+
+
+class RecognitionBusy(Exception):
+    """Raised when the recognition queue is full"""
+
+
+class GalleryNotReady(Exception):
+    """Raised when no gallery has been built yet (a build is running)"""
+
+
+def recognition_available():
+    """Check if face_recognition is installed, without importing it"""
+    from importlib.util import find_spec
+    return find_spec('face_recognition') is not None
+
+
+def decode_image(stream, max_side=RECOGNIZE_MAX_SIDE):
+    """Decode an uploaded image to an RGB array no larger than max_side"""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        image = Image.open(stream)
+        # JPEG can decode straight to a smaller size, much cheaper than resizing after
+        image.draft('RGB', (max_side, max_side))
+        image = image.convert('RGB')
+    except (UnidentifiedImageError, OSError) as e:
+        raise ValueError(f"Not a valid image: {e}")
+    image.thumbnail((max_side, max_side))
+    return np.asarray(image)
+
+
+class RecognitionBatcher:
+    """Group images from concurrent requests into batches for one worker thread"""
+
+    def __init__(self, max_batch=RECOGNIZE_MAX_BATCH, max_wait_ms=RECOGNIZE_MAX_WAIT_MS,
+                 queue_limit=RECOGNIZE_QUEUE_LIMIT, threshold=CONFIDENCE_THRESHOLD):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.threshold = threshold
+        self._queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(queue_limit)
+        self._lock = threading.Lock()
+        self._dlib_lock = threading.Lock()  # dlib models are shared, one caller at a time
+        self._thread = None
+        self._gallery = None
+        self._gallery_checked = 0.0
+        self._gallery_lock = threading.Lock()
+        self._build = None
+        self.stage_timer = StageTimer()
+        self._stats = {'requests': 0, 'images': 0, 'batches': 0, 'faces': 0, 'rejected': 0, 'max_batch_seen': 0}
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='recognize-batcher', daemon=True)
+                self._thread.start()
+
+    def gallery(self):
+        """The newest built gallery; a changed dataset is rebuilt in the background meanwhile
+
+        Never encodes anything itself, so it is safe to call from request
+        threads. Raises GalleryNotReady until the first gallery exists.
+        """
+        from gallery import DATASET_DIR, GALLERY_DIR, dataset_fingerprint, open_gallery
+
+        now = time.monotonic()
+        with self._gallery_lock:
+            current = self._gallery
+            if current is not None and now - self._gallery_checked <= GALLERY_REFRESH:
+                return current
+            self._gallery_checked = now
+
+        path = os.path.join(GALLERY_DIR, dataset_fingerprint(DATASET_DIR))
+        if current is None or current.path != path:
+            if os.path.isfile(os.path.join(path, 'meta.json')):
+                gallery = open_gallery(path)
+                with self._gallery_lock:
+                    self._gallery = current = gallery
+                logger.info(f"Recognition gallery opened: {len(gallery)} encodings ({os.path.basename(path)})")
+            else:
+                self._start_build()
+        if current is None:
+            raise GalleryNotReady("The face gallery is being built")
+        return current
+
+    def _start_build(self):
+        """Run `gallery.py build` in its own process unless this worker already started one"""
+        with self._gallery_lock:
+            if self._build is not None and self._build.poll() is None:
+                return
+            logger.info("Dataset changed: building the gallery in the background, "
+                        "the previous gallery keeps serving until it is ready")
+            self._build = subprocess.Popen([sys.executable, GALLERY_SCRIPT, 'build'],
+                                           cwd=os.path.dirname(GALLERY_SCRIPT))
+
+    def submit(self, images):
+        """Queue images and return one Future per image"""
+        acquired = 0
+        for _ in images:
+            if not self._slots.acquire(blocking=False):
+                for _ in range(acquired):
+                    self._slots.release()
+                with self._lock:
+                    self._stats['rejected'] += 1
+                raise RecognitionBusy("Too many images waiting for recognition")
+            acquired += 1
+
+        self._ensure_started()
+        futures = []
+        for image in images:
+            future = Future()
+            self._queue.put((image, future))
+            futures.append(future)
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['images'] += len(images)
+        return futures
+
+    def recognize(self, images, timeout=RECOGNIZE_TIMEOUT):
+        """Recognize faces in each image through the batcher"""
+        self.gallery()  # Fail fast with GalleryNotReady instead of queueing
+        futures = self.submit(images)
+        deadline = time.monotonic() + timeout
+        return [f.result(timeout=max(deadline - time.monotonic(), 0)) for f in futures]
+
+    def recognize_direct(self, images):
+        """Recognize faces without batching (one request at a time), for comparison"""
+        gallery = self.gallery()
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['images'] += len(images)
+        with self._dlib_lock:
+            return self._process(images, gallery)
+
+    def _collect(self):
+        """Block for the first image, then gather more until the batch is full or the wait is over"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            images = [image for image, _ in batch]
+            try:
+                # Looked up before taking the dlib lock: opening a gallery can touch the disk
+                gallery = self.gallery()
+                with self._dlib_lock:
+                    results = self._process(images, gallery)
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"Recognition batch of {len(batch)} failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._slots.release()
+
+    def _process(self, images, gallery):
+        """Detect, encode and match faces in a list of RGB images"""
+        import face_recognition
+
+        with self.stage_timer.stage('detect'):
+            if DETECTION_MODEL == 'cnn' and len({image.shape for image in images}) == 1:
+                locations = face_recognition.batch_face_locations(images, number_of_times_to_upsample=0,
+                                                                  batch_size=len(images))
+            else:
+                locations = [face_recognition.face_locations(image, model=DETECTION_MODEL) for image in images]
+
+        with self.stage_timer.stage('encode'):
+            encodings = [face_recognition.face_encodings(image, known_face_locations=boxes)
+                         for image, boxes in zip(images, locations)]
+
+        # One matrix match for every face in the batch
+        flat = [encoding for per_image in encodings for encoding in per_image]
+        with self.stage_timer.stage('match'):
+            rows, distances = gallery.best_matches(flat)
+
+        results = []
+        face_index = 0
+        for boxes in locations:
+            faces = []
+            for box in boxes:
+                distance = float(distances[face_index])
+                known = len(gallery) > 0 and distance < self.threshold
+                faces.append({
+                    'box': [int(v) for v in box],  # top, right, bottom, left
+                    'name': gallery.name_at(rows[face_index]) if known else None,
+                    'distance': round(distance, 4) if len(gallery) else None,
+                    'confidence': round(1 - distance, 4) if known else 0.0,
+                })
+                face_index += 1
+            results.append({'faces': faces, 'batch_size': len(images)})
+
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['faces'] += len(flat)
+            self._stats['max_batch_seen'] = max(self._stats['max_batch_seen'], len(images))
+        return results
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['avg_batch'] = round(stats['images'] / stats['batches'], 2) if stats['batches'] else 0.0
+        stats['queued'] = self._queue.qsize()
+        stats['stages'] = self.stage_timer.summary()
+        return stats
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """Per-process batcher, created after gunicorn forks its workers"""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = RecognitionBatcher()
+        return _batcher
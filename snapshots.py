@@ -0,0 +1,181 @@
+"""
+Attendance Snapshots for Face Attendance System
+
+When a face is marked present, the camera loop hands a copy of the face
+crop to SnapshotWriter and moves on. A background thread JPEG-encodes it
+(capped in pixels and bytes), writes it with a small thumbnail under
+data/snapshots/YYYY/MM/DD/ and fills Attendance.photo_path, so a disputed
+mark has an evidence image without adding encode or disk latency to the
+frame loop. If the queue is full the snapshot is dropped, never the frame.
+
+This module imports OpenCV lazily so the web server can use the path
+helpers without loading it.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', os.path.join(BASE_DIR, 'data', 'snapshots'))
+SNAPSHOT_ENABLED = os.getenv('SNAPSHOTS', '1') == '1'
+SNAPSHOT_MAX_SIDE = int(os.getenv('SNAPSHOT_MAX_SIDE', 320))          # Pixels, longest side
+SNAPSHOT_MAX_BYTES = int(os.getenv('SNAPSHOT_MAX_BYTES', 48 * 1024))  # JPEG quality is lowered to fit
+SNAPSHOT_QUALITY = 85
+SNAPSHOT_MIN_QUALITY = 40
+THUMBNAIL_SIDE = 96
+SNAPSHOT_QUEUE_SIZE = int(os.getenv('SNAPSHOT_QUEUE_SIZE', 32))
+SNAPSHOT_MARGIN = 0.25  # Extra context around the face box, as a fraction of its size
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_relpath(record_id, day, thumbnail=False):
+    """Path relative to SNAPSHOT_DIR, sharded by date"""
+    suffix = '_thumb' if thumbnail else ''
+    return f"{day:%Y/%m/%d}/{record_id}{suffix}.jpg"
+
+
+def thumbnail_relpath(photo_path):
+    """Thumbnail path stored next to a snapshot"""
+    root, ext = os.path.splitext(photo_path)
+    return f"{root}_thumb{ext}"
+
+
+def face_crop(frame, box, margin=SNAPSHOT_MARGIN):
+    """Copy of the face box plus a margin, clipped to the frame"""
+    top, right, bottom, left = box
+    pad_y, pad_x = int((bottom - top) * margin), int((right - left) * margin)
+    height, width = frame.shape[:2]
+    top, bottom = max(top - pad_y, 0), min(bottom + pad_y, height)
+    left, right = max(left - pad_x, 0), min(right + pad_x, width)
+    if bottom <= top or right <= left:
+        return None
+    # Copy: the frame buffer is reused by the next cap.read()
+    return frame[top:bottom, left:right].copy()
+
+
+def encode_jpeg(image, max_side=SNAPSHOT_MAX_SIDE, max_bytes=SNAPSHOT_MAX_BYTES):
+    """Downscale to max_side and JPEG-encode, lowering quality until it fits max_bytes"""
+    import cv2
+
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    if scale < 1:
+        image = cv2.resize(image, (max(int(width * scale), 1), max(int(height * scale), 1)),
+                           interpolation=cv2.INTER_AREA)
+    quality = SNAPSHOT_QUALITY
+    while True:
+        ok, data = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        if len(data) <= max_bytes or quality <= SNAPSHOT_MIN_QUALITY:
+            return data.tobytes()
+        quality -= 15
+
+
+def write_file(path, data):
+    """Write atomically so the web server never serves a partial JPEG"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class SnapshotWriter:
+    """Background thread that stores face crops and links them to attendance rows"""
+
+    def __init__(self, app, snapshot_dir=SNAPSHOT_DIR, queue_size=SNAPSHOT_QUEUE_SIZE):
+        self.app = app
+        self.snapshot_dir = snapshot_dir
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {'submitted': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'bytes': 0, 'total_ms': 0.0}
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='snapshot-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, record_id, day, crop):
+        """Queue a crop for an attendance row; never blocks the caller"""
+        if crop is None:
+            return False
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((record_id, day, crop))
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+            logger.warning(f"Snapshot queue full, dropped snapshot for attendance #{record_id}")
+            return False
+        with self._lock:
+            self._stats['submitted'] += 1
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._store(*item)
+            finally:
+                self._queue.task_done()
+
+    def _store(self, record_id, day, crop):
+        from sqlalchemy import update
+        from models import db, Attendance
+
+        start = time.perf_counter()
+        try:
+            photo_path = snapshot_relpath(record_id, day)
+            data = encode_jpeg(crop)
+            write_file(os.path.join(self.snapshot_dir, photo_path), data)
+            write_file(os.path.join(self.snapshot_dir, thumbnail_relpath(photo_path)),
+                       encode_jpeg(crop, max_side=THUMBNAIL_SIDE))
+            with self.app.app_context():
+                db.session.execute(
+                    update(Attendance).where(Attendance.id == record_id).values(photo_path=photo_path)
+                )
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Failed to store snapshot for attendance #{record_id}: {e}")
+            with self._lock:
+                self._stats['failed'] += 1
+            return
+        with self._lock:
+            self._stats['written'] += 1
+            self._stats['bytes'] += len(data)
+            self._stats['total_ms'] += (time.perf_counter() - start) * 1000
+
+    def close(self, timeout=5.0):
+        """Flush queued snapshots and stop the thread"""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("Snapshot queue did not drain, some snapshots were not saved")
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        written = stats['written'] or 1
+        return {
+            'submitted': stats['submitted'],
+            'written': stats['written'],
+            'dropped': stats['dropped'],
+            'failed': stats['failed'],
+            'queued': self._queue.qsize(),
+            'avg_kb': round(stats['bytes'] / written / 1024, 1),
+            'avg_ms': round(stats['total_ms'] / written, 2),
+        }
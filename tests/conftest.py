@@ -0,0 +1,56 @@
+"""
+Shared fixtures for the Face Attendance System tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db  # noqa: E402
+from database import create_db_app  # noqa: E402
+
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    """URL of a fresh SQLite file"""
+    return f"sqlite:///{tmp_path / 'attendance.db'}"
+
+
+@pytest.fixture
+def db_app(sqlite_url):
+    """Bare database app on an empty SQLite file with the current schema"""
+    app = create_db_app(sqlite_url)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def web_app(sqlite_url):
+    """Dashboard app on an empty SQLite file, with a clean per-process user cache"""
+    import app as app_module
+
+    app = app_module.create_app(sqlite_url)
+    app.config['TESTING'] = True
+    app_module._user_cache.clear()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+    app_module._user_cache.clear()
+
+
+@pytest.fixture
+def log_in():
+    """Give a test client a session for a user without going through bcrypt"""
+    def log_in(client, user):
+        with client.session_transaction() as sess:
+            sess['username'] = user.username
+            sess['user_id'] = user.id
+    return log_in
@@ -0,0 +1,89 @@
+"""
+Tests for the per-process user cache behind the role checks in app.py
+"""
+
+import pytest
+
+import app as app_module
+from models import db, User
+
+
+def call(app, client, method, url, **kwargs):
+    """One request in its own app context, so g (and the user cached on it) starts empty"""
+    with app.app_context():
+        return client.open(url, method=method, **kwargs)
+
+
+@pytest.fixture
+def users(web_app):
+    admin = User(username='admin', password_hash='x', role='admin')
+    teacher = User(username='teacher', password_hash='x', role='teacher')
+    db.session.add_all([admin, teacher])
+    db.session.commit()
+    return admin, teacher
+
+
+@pytest.fixture
+def clients(web_app, users, log_in):
+    admin_client, teacher_client = web_app.test_client(), web_app.test_client()
+    log_in(admin_client, users[0])
+    log_in(teacher_client, users[1])
+    return admin_client, teacher_client
+
+
+def test_role_change_clears_cached_user(web_app, clients, users):
+    admin_client, teacher_client = clients
+    teacher_id = users[1].id
+    assert call(web_app, teacher_client, 'GET', '/api/analytics').status_code == 200
+    assert teacher_id in app_module._user_cache
+
+    response = call(web_app, admin_client, 'PUT', f'/api/admin/users/{teacher_id}', json={'role': 'student'})
+    assert response.get_json()['success']
+    assert teacher_id not in app_module._user_cache
+    assert call(web_app, teacher_client, 'GET', '/api/analytics').status_code == 403
+
+
+def test_deleted_user_loses_access(web_app, clients, users):
+    admin_client, teacher_client = clients
+    teacher_id = users[1].id
+    assert call(web_app, teacher_client, 'GET', '/api/analytics').status_code == 200
+
+    assert call(web_app, admin_client, 'DELETE', f'/api/admin/users/{teacher_id}').get_json()['success']
+    assert teacher_id not in app_module._user_cache
+    assert call(web_app, teacher_client, 'GET', '/api/analytics').status_code == 403
+
+
+def test_cached_user_survives_within_ttl(web_app, clients, users):
+    _, teacher_client = clients
+    assert call(web_app, teacher_client, 'GET', '/api/analytics').status_code == 200
+    # Changed behind the app's back (e.g. by another worker): served from the cache
+    db.session.get(User, users[1].id).role = 'student'
+    db.session.commit()
+    assert call(web_app, teacher_client, 'GET', '/api/analytics').status_code == 200
+
+    app_module._user_cache[users[1].id] = (0, app_module._user_cache[users[1].id][1])  # TTL elapsed
+    assert call(web_app, teacher_client, 'GET', '/api/analytics').status_code == 403
+
+
+def test_legacy_session_is_upgraded_once(web_app, users):
+    client = web_app.test_client()
+    with client.session_transaction() as sess:
+        sess['username'] = 'teacher'  # Sessions from before user ids were stored
+
+    response = call(web_app, client, 'GET', '/api/analytics')
+    assert response.status_code == 200
+    assert 'Set-Cookie' in response.headers
+    with client.session_transaction() as sess:
+        assert sess['user_id'] == users[1].id
+
+    # An upgraded session is not rewritten on later requests
+    app_module._user_cache.clear()
+    assert 'Set-Cookie' not in call(web_app, client, 'GET', '/api/analytics').headers
+
+
+def test_session_for_another_username_is_rejected(web_app, users):
+    client = web_app.test_client()
+    with client.session_transaction() as sess:
+        sess['username'] = 'someone_else'
+        sess['user_id'] = users[1].id
+    assert call(web_app, client, 'GET', '/api/analytics').status_code == 403
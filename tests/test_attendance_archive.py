@@ -0,0 +1,122 @@
+"""
+Tests for attendance_archive.py and the archive-aware dashboard reads
+"""
+
+import os
+import csv
+from datetime import date, time, timedelta
+
+import pytest
+
+import attendance_archive
+from attendance_archive import archive_month, archived_person_counts
+from database import bulk_insert_attendance
+from import_attendance import import_csv
+from models import db, Attendance, AttendanceArchive, User
+
+JANUARY = date(2025, 1, 1)
+ARCHIVED_ROWS = [
+    ('alice', date(2025, 1, 6), time(9, 0)),
+    ('bob', date(2025, 1, 6), time(9, 15)),
+    ('alice', date(2025, 1, 20), time(10, 5)),
+    ('carol', date(2025, 1, 21), time(14, 30)),
+]
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    path = tmp_path / 'archive'
+    monkeypatch.setattr(attendance_archive, 'ARCHIVE_DIR', str(path))
+    return str(path)
+
+
+@pytest.fixture
+def client(web_app, log_in):
+    teacher = User(username='teacher', password_hash='x', role='teacher')
+    db.session.add(teacher)
+    db.session.commit()
+    client = web_app.test_client()
+    log_in(client, teacher)
+    return client
+
+
+def add_rows(rows):
+    bulk_insert_attendance([{'name': n, 'date': d, 'time': t} for n, d, t in rows])
+
+
+def dashboard_figures(client):
+    """Everything the dashboard shows that archived rows feed into"""
+    stats = client.get('/api/stats').get_json()
+    analytics = client.get('/api/analytics?days=3650').get_json()
+    export = client.get('/api/attendance/export').get_data(as_text=True)
+    return {
+        'total': stats['total_attendance_records'],
+        'people': stats['unique_people'],
+        'daily': analytics['daily_trend'],
+        'by_person': analytics['attendance_by_person'],
+        'hours': analytics['peak_times'],
+        'exported': len(export.strip().splitlines()) - 1,
+    }
+
+
+def test_archived_month_reads_the_same(client, archive_dir):
+    add_rows(ARCHIVED_ROWS + [('alice', date.today(), time(8, 0))])
+    before = dashboard_figures(client)
+
+    assert archive_month(JANUARY, archive_dir) == 4
+    assert Attendance.query.count() == 1
+    assert dashboard_figures(client) == before
+    assert before['total'] == 5 and before['exported'] == 5
+
+
+def test_partial_month_person_counts(db_app, archive_dir):
+    add_rows(ARCHIVED_ROWS)
+    archive_month(JANUARY, archive_dir)
+    assert archived_person_counts() == {'alice': 2, 'bob': 1, 'carol': 1}
+    assert archived_person_counts(date(2025, 1, 15)) == {'alice': 1, 'carol': 1}
+    assert archived_person_counts(date(2025, 1, 1), date(2025, 1, 6)) == {'alice': 1, 'bob': 1}
+
+
+def test_late_row_is_merged_into_archived_month(client, archive_dir):
+    add_rows(ARCHIVED_ROWS)
+    archive_month(JANUARY, archive_dir)
+    add_rows([('dave', date(2025, 1, 28), time(11, 0))])
+
+    assert archive_month(JANUARY, archive_dir) == 1
+    archive = AttendanceArchive.query.filter_by(month=JANUARY).one()
+    assert archive.row_count == 5
+    assert os.listdir(archive_dir) == [archive.path]
+    figures = dashboard_figures(client)
+    assert figures['total'] == figures['exported'] == 5
+    assert {'name': 'dave', 'count': 1} in figures['by_person']
+
+
+def test_reimport_after_archiving_is_not_counted_twice(client, archive_dir, tmp_path):
+    legacy = tmp_path / 'attendance.csv'
+    with open(legacy, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Name', 'Date', 'Time'])
+        writer.writerows([(n, d.isoformat(), t.isoformat()) for n, d, t in ARCHIVED_ROWS])
+
+    assert import_csv(str(legacy))['inserted'] == 4
+    archive_month(JANUARY, archive_dir)
+    before = dashboard_figures(client)
+    archive = AttendanceArchive.query.filter_by(month=JANUARY).one()
+    path = archive.path
+
+    # The unique indexes no longer see archived rows, so they go back in...
+    assert import_csv(str(legacy))['inserted'] == 4
+    # ...and re-archiving drops them instead of appending them
+    assert archive_month(JANUARY, archive_dir) == 0
+    assert Attendance.query.count() == 0
+    db.session.refresh(archive)
+    assert (archive.path, archive.row_count) == (path, 4)
+    assert dashboard_figures(client) == before
+    assert sum(p['count'] for p in before['by_person']) == 4
+
+
+def test_nothing_to_archive(db_app, archive_dir):
+    add_rows([('alice', JANUARY + timedelta(days=40), time(9, 0))])
+    assert archive_month(JANUARY, archive_dir) == 0
+    assert AttendanceArchive.query.count() == 0
+    assert os.listdir(archive_dir) == []
@@ -0,0 +1,20 @@
+"""
+Tests for export_attendance.py
+"""
+
+import sys
+from datetime import date
+
+import export_attendance
+from export_attendance import export_filename
+
+
+def test_export_filename_strips_unsafe_names():
+    assert export_filename('csv', None, None, 'bob"; x=/../') == 'attendance_bob_x.csv'
+    assert export_filename('csv', None, None, '"') == 'attendance.csv'
+    assert export_filename('parquet', date(2026, 1, 1), None, 'alice') == 'attendance_alice_2026-01-01_to_today.parquet'
+
+
+def test_parquet_to_stdout_is_rejected(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['export_attendance.py', '-o', '-', '--format', 'parquet'])
+    assert export_attendance.main() == 1
@@ -0,0 +1,42 @@
+"""
+Tests for gallery.py pruning
+"""
+
+import os
+import time
+
+import numpy as np
+
+from gallery import prune_galleries, write_gallery
+
+
+def build(root, fingerprint, dtype='float32', quantization='none'):
+    encodings = np.random.default_rng(0).normal(size=(4, 128))
+    return write_gallery(str(root), fingerprint, encodings, ['a', 'a', 'b', 'b'], dtype, quantization)
+
+
+def test_prune_keeps_other_settings_and_removes_older_datasets(tmp_path):
+    old = build(tmp_path, 'old')
+    half = build(tmp_path, 'half', dtype='float16')
+    int8 = build(tmp_path, 'int8', quantization='int8')
+    past = time.time() - 60
+    os.utime(os.path.join(old, 'meta.json'), (past, past))
+    build(tmp_path, 'new')
+
+    prune_galleries(str(tmp_path), keep='new')
+    assert sorted(os.listdir(tmp_path)) == ['half', 'int8', 'new']
+    assert os.path.isdir(half) and os.path.isdir(int8)
+
+
+def test_prune_removes_only_stale_temp_dirs(tmp_path):
+    build(tmp_path, 'new')
+    stale = tmp_path / '.dead-abc'
+    fresh = tmp_path / '.building-def'
+    stale.mkdir()
+    fresh.mkdir()
+    past = time.time() - 2 * 3600
+    os.utime(stale, (past, past))
+
+    prune_galleries(str(tmp_path), keep='new')
+    assert not stale.exists()
+    assert fresh.exists()
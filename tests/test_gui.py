@@ -0,0 +1,34 @@
+"""
+Tests for the desktop app's database helpers in gui.py
+"""
+
+import os
+
+from models import User
+from passwords import hash_password, verify_password
+from gui import import_legacy_credentials
+
+
+def test_import_legacy_credentials_once(db_app, tmp_path):
+    path = tmp_path / 'teacher_credentials.csv'
+    bcrypt_hash = hash_password('secret1', rounds=4)
+    path.write_text(
+        "Username,PasswordHash\n"
+        f"demo_teacher,{bcrypt_hash}\n"
+        "old_sha,5e884898da28047151d0e56f8dc6292773603d0d6aabbdd62a11ef721d1542d8\n"
+        "existing,$2b$04$abcdefghijklmnopqrstuu5Ue3/9hJ4hB0pTQ3ZlJc2D6iC0PfRm\n"
+    )
+    User.query.session.add(User(username='existing', password_hash='kept', role='admin'))
+    User.query.session.commit()
+
+    assert import_legacy_credentials(str(path)) == 1
+    teacher = User.query.filter_by(username='demo_teacher').one()
+    assert teacher.role == 'teacher'
+    assert verify_password('secret1', teacher.password_hash)
+    assert User.query.filter_by(username='old_sha').first() is None
+    assert User.query.filter_by(username='existing').one().password_hash == 'kept'
+
+    # Renamed so the import never runs again
+    assert not path.exists()
+    assert os.path.exists(f"{path}.imported")
+    assert import_legacy_credentials(str(path)) == 0
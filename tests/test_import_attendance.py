@@ -0,0 +1,51 @@
+"""
+Tests for import_attendance.py
+"""
+
+import sys
+
+import import_attendance
+from import_attendance import import_csv
+from models import db, Attendance
+from database import create_db_app
+
+LEGACY_CSV = """Name,Date,Time
+alice,2025-01-06,09:00:00
+bob,2025-01-06,09:15
+alice,2025-01-06,10:00:00
+
+carol,2025-13-01,09:00:00
+,2025-01-06,09:00:00
+dave,2025-01-06,noon
+  ,  ,  
+"""
+
+
+def test_import_counts(db_app, tmp_path):
+    path = tmp_path / 'attendance.csv'
+    path.write_text(LEGACY_CSV)
+    rejects = tmp_path / 'rejects.csv'
+
+    stats = import_csv(str(path), batch_size=2, rejects_path=str(rejects))
+    assert {k: stats[k] for k in ('read', 'inserted', 'duplicates', 'rejected', 'blank')} == \
+        {'read': 6, 'inserted': 2, 'duplicates': 1, 'rejected': 3, 'blank': 2}
+    assert len(rejects.read_text().strip().splitlines()) == 4  # Header + 3 rows
+
+    # Re-running inserts nothing new
+    stats = import_csv(str(path))
+    assert (stats['inserted'], stats['duplicates']) == (0, 3)
+    assert Attendance.query.count() == 2
+
+
+def test_main_creates_schema(tmp_path, sqlite_url, monkeypatch):
+    path = tmp_path / 'attendance.csv'
+    path.write_text(LEGACY_CSV)
+    monkeypatch.setenv('DATABASE_URL', sqlite_url)
+    monkeypatch.setattr(sys, 'argv', ['import_attendance.py', str(path)])
+    assert import_attendance.main() == 0
+
+    app = create_db_app(sqlite_url)
+    with app.app_context():
+        assert Attendance.query.count() == 2
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,94 @@
+"""
+Tests for migrate_db.py (SQLite to SQLite, standing in for PostgreSQL)
+"""
+
+import sqlite3
+from datetime import date, time
+
+from sqlalchemy import create_engine, func, select
+
+from models import db, User, Attendance
+from migrate_db import migrate
+
+
+def populate(app):
+    """A few users and attendance rows in the source database"""
+    with app.app_context():
+        teacher = User(username='teacher1', password_hash='x', role='teacher')
+        db.session.add(teacher)
+        db.session.flush()
+        for day in range(1, 6):
+            db.session.add(Attendance(name='alice', date=date(2026, 3, day), time=time(9, day),
+                                      confidence=0.7, marked_by=teacher.id))
+        db.session.commit()
+
+
+def count_rows(url, table):
+    engine = create_engine(url)
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(table)).scalar()
+    finally:
+        engine.dispose()
+
+
+def test_migrate_copies_and_verifies(db_app, sqlite_url, tmp_path):
+    populate(db_app)
+    target_url = f"sqlite:///{tmp_path / 'target.db'}"
+
+    assert migrate(sqlite_url, target_url, batch_size=2, verify=True)
+    assert count_rows(target_url, Attendance.__table__) == 5
+    assert count_rows(target_url, User.__table__) == 1
+
+
+def test_migrate_rerun_skips_existing_rows(db_app, sqlite_url, tmp_path):
+    populate(db_app)
+    target_url = f"sqlite:///{tmp_path / 'target.db'}"
+    assert migrate(sqlite_url, target_url, verify=True)
+
+    # An interrupted or repeated copy is re-run over the rows already there
+    with db_app.app_context():
+        db.session.add(Attendance(name='bob', date=date(2026, 3, 9), time=time(10, 0)))
+        db.session.commit()
+    assert migrate(sqlite_url, target_url, batch_size=2, verify=True)
+    assert count_rows(target_url, Attendance.__table__) == 6
+
+
+BASELINE_SCHEMA = [
+    """CREATE TABLE users (
+        id INTEGER NOT NULL, username VARCHAR(120) NOT NULL, password_hash VARCHAR(255) NOT NULL,
+        role VARCHAR(20) NOT NULL, created_at DATETIME, PRIMARY KEY (id))""",
+    """CREATE TABLE datasets (
+        id INTEGER NOT NULL, name VARCHAR(120) NOT NULL, image_count INTEGER,
+        encoding_hash VARCHAR(255), last_updated DATETIME, PRIMARY KEY (id))""",
+    """CREATE TABLE attendance (
+        id INTEGER NOT NULL, name VARCHAR(120) NOT NULL, date DATE NOT NULL, time TIME NOT NULL,
+        confidence FLOAT, photo_path VARCHAR(255), marked_by INTEGER, created_at DATETIME,
+        PRIMARY KEY (id), CONSTRAINT unique_attendance_per_day UNIQUE (name, date),
+        FOREIGN KEY(marked_by) REFERENCES users (id))""",
+    "INSERT INTO users (id, username, password_hash, role) VALUES (1, 'admin', 'x', 'admin')",
+    "INSERT INTO attendance (id, name, date, time, confidence, marked_by) VALUES (1, 'alice', '2026-03-02', '09:00:00.000000', 0.8, 1)",
+    "INSERT INTO attendance (id, name, date, time, confidence, marked_by) VALUES (2, 'bob', '2026-03-02', '09:01:00.000000', 0.7, 1)",
+]
+
+
+def test_migrate_baseline_schema_source(tmp_path):
+    """Databases created before classes and archives existed still migrate"""
+    source = tmp_path / 'baseline.db'
+    conn = sqlite3.connect(source)
+    for statement in BASELINE_SCHEMA:
+        conn.execute(statement)
+    conn.commit()
+    conn.close()
+    target_url = f"sqlite:///{tmp_path / 'target.db'}"
+
+    assert migrate(f"sqlite:///{source}", target_url, verify=True)
+    assert count_rows(target_url, Attendance.__table__) == 2
+    engine = create_engine(target_url)
+    with engine.connect() as conn:
+        assert conn.execute(select(Attendance.schedule_id)).scalars().all() == [None, None]
+    engine.dispose()
+    # The source is only read, never upgraded
+    conn = sqlite3.connect(source)
+    assert 'class_sections' not in {r[0] for r in conn.execute("SELECT name FROM sqlite_master")}
+    conn.close()
@@ -0,0 +1,30 @@
+"""
+Tests for the preview ring buffer in preview.py
+"""
+
+import pytest
+
+import preview
+from preview import PreviewPublisher, read_latest
+
+
+def latest_frame(path):
+    with open(path, 'rb') as f:
+        return read_latest(f.read())[2]
+
+
+@pytest.mark.skipif(preview.fcntl is None, reason="publisher lock needs fcntl")
+def test_second_publisher_skips_until_first_closes(tmp_path):
+    path = str(tmp_path / 'stream.bin')
+    first, second = PreviewPublisher(path=path, fps=0), PreviewPublisher(path=path, fps=0)
+
+    assert first.write(b'first')
+    assert not second.write(b'second')
+    assert latest_frame(path) == b'first'
+    assert second.stats()['blocked'] == 1
+
+    first.close()
+    second._retry_at = 0.0  # Skip the retry delay
+    assert second.write(b'second')
+    assert latest_frame(path) == b'second'
+    second.close()
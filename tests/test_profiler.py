@@ -0,0 +1,45 @@
+"""
+Tests for the signal trigger in profiler.py
+"""
+
+import os
+import signal
+import threading
+
+import pytest
+
+import profiler
+from profiler import install_signal_handler, signal_profile
+
+pytestmark = pytest.mark.skipif(not hasattr(signal, 'SIGUSR1'), reason='needs SIGUSR1')
+
+
+class RecordingProfiler:
+    label = 'test'
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.calls = []
+
+    def start(self, seconds):
+        self.calls.append((seconds, threading.current_thread().name))
+        self.started.set()
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, 'PROFILE_DIR', str(tmp_path))
+    previous = signal.getsignal(signal.SIGUSR1)
+    yield tmp_path
+    signal.signal(signal.SIGUSR1, previous)
+
+
+def test_signal_starts_profile_off_the_handler(profile_dir):
+    recorder = RecordingProfiler()
+    assert install_signal_handler(recorder)
+    assert (profile_dir / 'test.pid').read_text() == str(os.getpid())
+
+    assert signal_profile('test', seconds=3) == os.getpid()
+    assert recorder.started.wait(5)
+    assert recorder.calls == [(3.0, 'profile-signal')]
+    assert not (profile_dir / 'test.request').exists()
@@ -0,0 +1,64 @@
+"""
+Tests for the gallery handling in recognition_service.py
+"""
+
+import numpy as np
+import pytest
+
+import gallery as gallery_module
+import recognition_service
+from gallery import dataset_fingerprint, write_gallery
+from recognition_service import GalleryNotReady, RecognitionBatcher
+
+
+class FakeBuild:
+    """Stands in for the `gallery.py build` process"""
+    started = []
+
+    def __init__(self, args, **kwargs):
+        FakeBuild.started.append(args)
+
+    def poll(self):
+        return None  # Still running
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    dataset_dir = tmp_path / 'dataset'
+    (dataset_dir / 'alice').mkdir(parents=True)
+    (dataset_dir / 'alice' / '1.jpg').write_bytes(b'x')
+    monkeypatch.setattr(gallery_module, 'DATASET_DIR', str(dataset_dir))
+    monkeypatch.setattr(gallery_module, 'GALLERY_DIR', str(tmp_path / 'gallery'))
+    monkeypatch.setattr(recognition_service.subprocess, 'Popen', FakeBuild)
+    FakeBuild.started = []
+    return dataset_dir
+
+
+def publish(dataset_dir, gallery_root):
+    encodings = np.random.default_rng(0).normal(size=(2, 128))
+    return write_gallery(gallery_root, dataset_fingerprint(str(dataset_dir)), encodings, ['alice', 'alice'])
+
+
+def test_no_gallery_starts_one_background_build(dataset):
+    batcher = RecognitionBatcher()
+    for _ in range(3):
+        with pytest.raises(GalleryNotReady):
+            batcher.gallery()
+    assert len(FakeBuild.started) == 1
+    assert FakeBuild.started[0][-1] == 'build'
+
+
+def test_changed_dataset_keeps_serving_previous_gallery(dataset):
+    path = publish(dataset, gallery_module.GALLERY_DIR)
+    batcher = RecognitionBatcher()
+    assert batcher.gallery().path == path
+    assert FakeBuild.started == []
+
+    (dataset / 'alice' / '2.jpg').write_bytes(b'y')
+    batcher._gallery_checked = 0.0  # Refresh interval elapsed
+    assert batcher.gallery().path == path
+    assert len(FakeBuild.started) == 1
+
+    new_path = publish(dataset, gallery_module.GALLERY_DIR)
+    batcher._gallery_checked = 0.0
+    assert batcher.gallery().path == new_path
@@ -0,0 +1,399 @@
+"""
+Unknown Face Clustering for Face Attendance System
+
+Faces that match nobody in the gallery used to be encoded, labelled
+"Unknown" and forgotten. UnknownFaceTracker keeps them instead:
+
+- Every unknown encoding is compared with the centroids of recent unknown
+  clusters in one vectorized distance computation. A close one is updated
+  in place (running mean), so a repeat visitor is "seen before" without
+  scanning anything but this small cache; otherwise a new cluster starts.
+- The cache has a fixed capacity and clusters expire UNKNOWN_FACE_TTL
+  seconds after they were last seen. Compaction (every STATS_INTERVAL in
+  the camera loop) drops expired clusters, merges clusters whose centroids
+  have drifted together and packs the arrays so scans stay contiguous.
+- A few face crops per cluster are saved under data/unknown/<cluster>/,
+  and clusters seen at least MIN_SIGHTINGS times are listed in
+  data/unknown/clusters.json for admins. They stay reviewable after they
+  leave the cache, for REVIEW_RETENTION_DAYS.
+
+Admins review clusters in the web app and enroll them in bulk: the saved
+crops are copied into dataset/<name>/ (the gallery picks them up on the
+next rebuild), so nobody has to dig through raw footage. Enrolled and
+dismissed clusters are listed in resolved.json, which the camera reads at
+its next compaction.
+
+The web server uses only the file helpers at the bottom, and imports this
+module inside the admin routes so NumPy stays out of its startup.
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UNKNOWN_DIR = os.getenv('UNKNOWN_FACES_DIR', os.path.join(BASE_DIR, 'data', 'unknown'))
+UNKNOWN_ENABLED = os.getenv('UNKNOWN_FACES', '1') == '1'
+UNKNOWN_TTL = float(os.getenv('UNKNOWN_FACE_TTL', 900))                   # Seconds after the last sighting
+UNKNOWN_CAPACITY = int(os.getenv('UNKNOWN_FACE_CAPACITY', 512))           # Clusters held in memory
+CLUSTER_THRESHOLD = float(os.getenv('UNKNOWN_CLUSTER_THRESHOLD', 0.5))    # Tighter than recognition (0.6)
+MERGE_THRESHOLD = CLUSTER_THRESHOLD * 0.75  # Centroids this close describe the same face
+MIN_SIGHTINGS = 3        # Frames before a cluster is shown for review; fewer is usually noise
+MAX_SAMPLES = 5          # Face crops kept per cluster
+SAMPLE_INTERVAL = 10.0   # Seconds between crops of the same cluster
+VISIT_GAP = 60.0         # Seconds unseen before a sighting counts as a new visit
+REVIEW_RETENTION_DAYS = 7
+ENCODING_DIM = 128
+CLUSTERS_FILE = 'clusters.json'
+RESOLVED_FILE = 'resolved.json'
+CENTROIDS_FILE = 'centroids.npz'
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownFaceCache:
+    """Fixed-capacity centroids of recent unknown faces, matched in one vectorized pass"""
+
+    def __init__(self, capacity=UNKNOWN_CAPACITY, threshold=CLUSTER_THRESHOLD, ttl=UNKNOWN_TTL):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.centroids = np.zeros((capacity, ENCODING_DIM), dtype=np.float32)
+        self.counts = np.zeros(capacity, dtype=np.int64)     # Frames seen
+        self.visits = np.zeros(capacity, dtype=np.int64)
+        self.first_seen = np.zeros(capacity, dtype=np.float64)
+        self.last_seen = np.zeros(capacity, dtype=np.float64)
+        self.uids = [None] * capacity
+        self.size = 0  # Slots [0, size) are in use; compaction keeps them packed
+        self.evicted = []  # Clusters pushed out by capacity, collected at the next compaction
+
+    def __len__(self):
+        return self.size
+
+    def nearest(self, encoding):
+        """(slot, distance) of the closest cluster, or (None, None) if empty"""
+        if not self.size:
+            return None, None
+        distances = np.linalg.norm(self.centroids[:self.size] - encoding, axis=1)
+        slot = int(np.argmin(distances))
+        return slot, float(distances[slot])
+
+    def observe(self, encoding, now=None):
+        """Add a sighting; returns (slot, is_new_cluster)"""
+        now = now or time.time()
+        encoding = np.asarray(encoding, dtype=np.float32)
+        slot, distance = self.nearest(encoding)
+        if slot is not None and distance < self.threshold:
+            self.counts[slot] += 1
+            # Running mean keeps the centroid at the average of all sightings
+            self.centroids[slot] += (encoding - self.centroids[slot]) / self.counts[slot]
+            if now - self.last_seen[slot] > VISIT_GAP:
+                self.visits[slot] += 1
+            self.last_seen[slot] = now
+            return slot, False
+
+        if self.size == self.capacity:
+            oldest = int(np.argmin(self.last_seen[:self.size]))
+            self.evicted.append(self.describe(oldest, centroid=True))
+            self._remove([oldest])
+        slot = self.size
+        self.size += 1
+        self.centroids[slot] = encoding
+        self.counts[slot] = 1
+        self.visits[slot] = 1
+        self.first_seen[slot] = self.last_seen[slot] = now
+        self.uids[slot] = uuid.uuid4().hex[:12]
+        return slot, True
+
+    def _remove(self, slots):
+        """Drop slots and pack the remaining clusters to the front"""
+        drop = set(slots)
+        keep = [i for i in range(self.size) if i not in drop]
+        count = len(keep)
+        for array in (self.centroids, self.counts, self.visits, self.first_seen, self.last_seen):
+            array[:count] = array[keep]
+        uids = [self.uids[i] for i in keep]
+        self.uids[:count] = uids
+        self.uids[count:self.size] = [None] * (self.size - count)
+        self.size = count
+
+    def merge_close(self):
+        """Merge clusters whose centroids are within MERGE_THRESHOLD; returns [(kept_uid, merged_uid)]"""
+        if self.size < 2:
+            return []
+        centroids = self.centroids[:self.size]
+        squared = np.einsum('ij,ij->i', centroids, centroids)
+        distances = np.sqrt(np.maximum(squared[:, None] + squared[None, :] - 2 * centroids @ centroids.T, 0))
+        np.fill_diagonal(distances, np.inf)
+
+        merged = []
+        absorbed = set()
+        for i in np.argsort(-self.counts[:self.size]):  # Biggest clusters absorb smaller ones
+            if i in absorbed:
+                continue
+            for j in np.flatnonzero(distances[i] < MERGE_THRESHOLD):
+                if j in absorbed or j == i:
+                    continue
+                total = self.counts[i] + self.counts[j]
+                self.centroids[i] = (self.centroids[i] * self.counts[i] + self.centroids[j] * self.counts[j]) / total
+                self.counts[i] = total
+                self.visits[i] += self.visits[j]
+                self.first_seen[i] = min(self.first_seen[i], self.first_seen[j])
+                self.last_seen[i] = max(self.last_seen[i], self.last_seen[j])
+                absorbed.add(int(j))
+                distances[:, j] = np.inf
+                merged.append((self.uids[i], self.uids[j]))
+        self._remove(absorbed)
+        return merged
+
+    def compact(self, now=None, resolved=()):
+        """Expire, drop resolved and merge clusters; returns (expired clusters, merged pairs)"""
+        now = now or time.time()
+        resolved = set(resolved)
+        dropped = {i for i in range(self.size) if self.uids[i] in resolved}
+        expired = [int(i) for i in np.flatnonzero(now - self.last_seen[:self.size] > self.ttl) if i not in dropped]
+        gone = [self.describe(i, centroid=True) for i in expired] + [c for c in self.evicted if c['id'] not in resolved]
+        self.evicted = []
+        self._remove(dropped | set(expired))
+        return gone, self.merge_close()
+
+    def describe(self, slot, centroid=False):
+        cluster = {
+            'id': self.uids[slot],
+            'sightings': int(self.counts[slot]),
+            'visits': int(self.visits[slot]),
+            'first_seen': float(self.first_seen[slot]),
+            'last_seen': float(self.last_seen[slot]),
+        }
+        if centroid:
+            cluster['centroid'] = self.centroids[slot].copy()
+        return cluster
+
+    def restore(self, slot, cluster, centroid):
+        """Continue an earlier cluster in `slot`, which holds one new sighting"""
+        count = cluster['sightings']
+        self.centroids[slot] = (centroid * count + self.centroids[slot]) / (count + 1)
+        self.counts[slot] += count
+        self.visits[slot] = cluster['visits'] + 1
+        self.first_seen[slot] = cluster['first_seen']
+        self.uids[slot] = cluster['id']
+
+
+class UnknownFaceTracker:
+    """Unknown face cache plus the on-disk review list and sample crops"""
+
+    def __init__(self, directory=UNKNOWN_DIR, cache=None):
+        self.directory = directory
+        self.cache = cache if cache is not None else UnknownFaceCache()
+        self.reviews = {c['id']: c for c in load_clusters(directory)}  # Clusters no longer in the cache
+        self.review_centroids = load_centroids(directory)
+        self._review_matrix = None  # (ids, stacked centroids), rebuilt when reviews change
+        self._last_sample = {}
+
+    def observe(self, encoding, crop=None, now=None):
+        """Record an unknown face; returns its cluster description
+
+        `crop` may be a callable returning the face crop, so it is only
+        copied when a sample is actually saved.
+        """
+        now = now or time.time()
+        slot, is_new = self.cache.observe(encoding, now)
+        if is_new and self.reviews:
+            self._reactivate(slot, encoding)
+        if self.cache.evicted:
+            self._retire(self.cache.evicted)
+            self.cache.evicted = []
+        cluster = self.cache.describe(slot)
+        if crop is not None and self._sample_due(cluster, now):
+            image = crop() if callable(crop) else crop
+            if image is not None:
+                self._save_sample(cluster['id'], image)
+                self._last_sample[cluster['id']] = now
+        return cluster
+
+    def _reactivate(self, slot, encoding):
+        """Resume a reviewable cluster that left the cache if this face belongs to it"""
+        if self._review_matrix is None:
+            ids = [cid for cid in self.reviews if cid in self.review_centroids]
+            matrix = np.array([self.review_centroids[cid] for cid in ids], dtype=np.float32).reshape(-1, ENCODING_DIM)
+            self._review_matrix = (ids, matrix)
+        ids, matrix = self._review_matrix
+        if not ids:
+            return
+        distances = np.linalg.norm(matrix - np.asarray(encoding, dtype=np.float32), axis=1)
+        best = int(np.argmin(distances))
+        if distances[best] < self.cache.threshold:
+            cluster_id = ids[best]
+            self.cache.restore(slot, self.reviews.pop(cluster_id), self.review_centroids.pop(cluster_id))
+            self._review_matrix = None
+
+    def _retire(self, clusters):
+        """Keep clusters that left the cache for review (and for _reactivate), drop noise"""
+        for cluster in clusters:
+            cluster_id = cluster['id']
+            centroid = cluster.pop('centroid')
+            if cluster['sightings'] >= MIN_SIGHTINGS:
+                self.review_centroids[cluster_id] = centroid
+                self.reviews[cluster_id] = cluster
+            else:
+                shutil.rmtree(os.path.join(self.directory, cluster_id), ignore_errors=True)
+            self._last_sample.pop(cluster_id, None)
+        self._review_matrix = None
+
+    def _sample_due(self, cluster, now):
+        if cluster['sightings'] < MIN_SIGHTINGS:
+            return False
+        if now - self._last_sample.get(cluster['id'], 0) < SAMPLE_INTERVAL:
+            return False
+        return len(sample_files(self.directory, cluster['id'])) < MAX_SAMPLES
+
+    def _save_sample(self, cluster_id, image):
+        from snapshots import encode_jpeg, write_file
+
+        try:
+            path = os.path.join(self.directory, cluster_id, f"{int(time.time() * 1000)}.jpg")
+            write_file(path, encode_jpeg(image))
+        except Exception as e:
+            logger.warning(f"Could not save unknown face sample: {e}")
+
+    def compact(self, now=None):
+        """Periodic maintenance: apply admin decisions, expire, merge and publish the review list"""
+        now = now or time.time()
+        resolved = load_resolved(self.directory)
+        for cluster_id in resolved:
+            self.reviews.pop(cluster_id, None)
+            self.review_centroids.pop(cluster_id, None)
+            folder = os.path.join(self.directory, cluster_id)
+            if os.path.isdir(folder):  # A sample saved after the admin's decision
+                shutil.rmtree(folder, ignore_errors=True)
+
+        expired, merged = self.cache.compact(now, resolved)
+        self._retire(expired)
+        for kept, absorbed in merged:
+            move_samples(self.directory, absorbed, kept)
+            self._last_sample.pop(absorbed, None)
+
+        cutoff = now - REVIEW_RETENTION_DAYS * 86400
+        for cluster_id, cluster in list(self.reviews.items()):
+            if cluster['last_seen'] < cutoff:
+                del self.reviews[cluster_id]
+                self.review_centroids.pop(cluster_id, None)
+                shutil.rmtree(os.path.join(self.directory, cluster_id), ignore_errors=True)
+
+        active = [self.cache.describe(i, centroid=True) for i in range(len(self.cache))]
+        active = [c for c in active if c['sightings'] >= MIN_SIGHTINGS]
+        centroids = dict(self.review_centroids)
+        centroids.update((c['id'], c.pop('centroid')) for c in active)  # So a restart can resume them too
+        clusters = [dict(c, active=True) for c in active]
+        clusters += [dict(c, active=False) for c in self.reviews.values()]
+        save_clusters(self.directory, clusters)
+        save_centroids(self.directory, centroids)
+        self._review_matrix = None
+        return {'cached': len(self.cache), 'expired': len(expired), 'merged': len(merged), 'reviewable': len(clusters)}
+
+
+# File helpers shared with the web server --------------------------------
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def load_clusters(directory=UNKNOWN_DIR):
+    """Clusters published by the camera for review, most seen first"""
+    return read_json(os.path.join(directory, CLUSTERS_FILE), {'clusters': []})['clusters']
+
+
+def save_clusters(directory, clusters):
+    clusters = sorted(clusters, key=lambda c: c['sightings'], reverse=True)
+    write_json(os.path.join(directory, CLUSTERS_FILE), {'updated': time.time(), 'clusters': clusters})
+
+
+def load_centroids(directory):
+    """{cluster id: centroid} of reviewable clusters that left the camera's cache"""
+    try:
+        with np.load(os.path.join(directory, CENTROIDS_FILE)) as data:
+            return dict(zip(data['ids'].tolist(), data['centroids']))
+    except (OSError, KeyError, ValueError):
+        return {}
+
+
+def save_centroids(directory, centroids):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, CENTROIDS_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    ids = list(centroids)
+    matrix = np.array([centroids[cid] for cid in ids], dtype=np.float32).reshape(-1, ENCODING_DIM)
+    np.savez(tmp_path, ids=np.array(ids, dtype=str), centroids=matrix)
+    os.replace(tmp_path, path)
+
+
+def load_resolved(directory=UNKNOWN_DIR):
+    """{cluster id: time resolved} for clusters an admin enrolled or dismissed"""
+    return read_json(os.path.join(directory, RESOLVED_FILE), {})
+
+
+def sample_files(directory, cluster_id):
+    """Saved crops of a cluster, oldest first"""
+    folder = os.path.join(directory, cluster_id)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(name for name in os.listdir(folder) if name.endswith('.jpg'))
+
+
+def move_samples(directory, source_id, target_id):
+    source = os.path.join(directory, source_id)
+    if not os.path.isdir(source):
+        return
+    target = os.path.join(directory, target_id)
+    os.makedirs(target, exist_ok=True)
+    for name in sample_files(directory, source_id):
+        os.replace(os.path.join(source, name), os.path.join(target, name))
+    shutil.rmtree(source, ignore_errors=True)
+
+
+def resolve_clusters(cluster_ids, directory=UNKNOWN_DIR):
+    """Mark clusters as handled so the camera drops them"""
+    now = time.time()
+    resolved = load_resolved(directory)
+    # Forget decisions old enough that the camera cannot still hold the cluster
+    horizon = now - max(UNKNOWN_TTL, REVIEW_RETENTION_DAYS * 86400) * 2
+    resolved = {cid: at for cid, at in resolved.items() if at > horizon}
+    resolved.update({cid: now for cid in cluster_ids})
+    write_json(os.path.join(directory, RESOLVED_FILE), resolved)
+    for cluster_id in cluster_ids:
+        shutil.rmtree(os.path.join(directory, cluster_id), ignore_errors=True)
+
+
+def enroll_clusters(assignments, dataset_dir, directory=UNKNOWN_DIR):
+    """Copy the crops of each cluster into dataset/<name>/; returns {cluster id: images copied}
+
+    `assignments` maps cluster ids to person names. Clusters are resolved
+    afterwards, so they disappear from review and from the camera's cache.
+    """
+    copied = {}
+    for cluster_id, name in assignments.items():
+        person_dir = os.path.join(dataset_dir, name)
+        os.makedirs(person_dir, exist_ok=True)
+        copied[cluster_id] = 0
+        for sample in sample_files(directory, cluster_id):
+            shutil.copy2(os.path.join(directory, cluster_id, sample),
+                         os.path.join(person_dir, f"unknown_{cluster_id}_{sample}"))
+            copied[cluster_id] += 1
+    resolve_clusters(list(assignments), directory)
+    return copied
@@ -0,0 +1,11 @@
+"""
+WSGI entry point for running the web application under a production server
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+    waitress-serve --threads=8 --port=5000 wsgi:application   # Windows
+"""
+
+from app import create_app, init_db
+
+application = create_app()
+init_db(application)